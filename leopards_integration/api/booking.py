@@ -1,15 +1,24 @@
-import json
 import frappe
 from frappe import _
 
 from leopards_integration.services.shipment_builder import (
     build_leopards_shipment,
     build_book_packet_payload,
+    compact_json,
+    is_single_write_booking,
+    persist_shipment,
+    record_failed_booking,
 )
-from leopards_integration.utils.leopards_client import (
-    book_packet,
-    LeopardsAPIError,
+from leopards_integration.services.booking_guard import (
+    book_packet_idempotent,
+    booking_lock,
+    find_booked_shipment,
+    find_remote_booking,
+    last_failed_booking,
 )
+from leopards_integration.services.booking_writeback import write_back_bookings
+from leopards_integration.utils import metrics
+from leopards_integration.utils.leopards_client import LeopardsAPIError
 
 
 @frappe.whitelist()
@@ -17,52 +26,150 @@ def book_from_delivery_note(delivery_note):
     if not delivery_note:
         frappe.throw("delivery_note is required")
 
+    return _book(
+        delivery_note,
+        lambda insert: build_leopards_shipment(delivery_note, insert=insert),
+        build_book_packet_payload,
+    )
+
+
+def book_prepared_shipment(delivery_note, shipment, payload, write_back=True, limiter=None):
+    """
+    Book a shipment already built in memory by build_leopards_shipments()
+    (bulk booking); same lock / idempotency / recovery as a single booking.
+    With write_back=False the caller stamps the Delivery Note itself
+    (write_back_bookings, batched). Every bookPacket attempt takes a token
+    from `limiter`.
+    """
+    def create_shipment(insert):
+        if insert:
+            shipment.insert(ignore_permissions=True)
+        return shipment
+
+    return _book(delivery_note, create_shipment, lambda shipment: payload, write_back, limiter)
+
+
+def _book(delivery_note, create_shipment, build_payload, write_back=True, limiter=None):
+    """
+    One booking attempt; outcome and DB query count go to utils.metrics.
+    """
+    with metrics.count_queries() as counter:
+        try:
+            result = _book_once(delivery_note, create_shipment, build_payload, write_back, limiter)
+        except Exception:
+            metrics.inc("leopards_bookings_total", outcome="failed")
+            raise
+
+    metrics.inc("leopards_bookings_total", outcome=result.pop("outcome"))
+    metrics.observe(
+        "leopards_booking_db_queries", counter["queries"], buckets=metrics.QUERY_BUCKETS
+    )
+    return result
+
+
+def _book_once(delivery_note, create_shipment, build_payload, write_back=True, limiter=None):
+    """
+    Default: Draft shipment inserted before the API call, saved once more
+    with the result. Single-write mode (Leopards Settings) keeps the
+    shipment in memory and persists it exactly once, Booked or Failed.
+    """
+    single_write = is_single_write_booking()
     shipment = None
 
     try:
-        # 1. Create Shipment (Draft forever)
-        shipment = build_leopards_shipment(delivery_note)
+        with booking_lock(delivery_note):
+            # 0. Idempotency: already booked → return the existing CN
+            booked = find_booked_shipment(delivery_note)
+            if booked:
+                # The DN may never have been stamped (e.g. interrupted job)
+                if write_back and frappe.db.get_value(
+                    "Delivery Note", delivery_note, "custom_leopards_booking_status"
+                ) != "Booked":
+                    write_back_bookings([{
+                        "delivery_note": delivery_note,
+                        "cn_number": booked.cn_number,
+                        "slip_link": booked.slip_link,
+                    }])
+
+                return {
+                    "status": "Booked",
+                    "cn_number": booked.cn_number,
+                    "slip_link": booked.slip_link,
+                    "shipment": booked.name,
+                    "outcome": "existing",
+                }
+
+            # A previous attempt may have failed AFTER Leopards booked it
+            recovered = None
+            failed_since = last_failed_booking(delivery_note)
+            if failed_since:
+                try:
+                    recovered = find_remote_booking(delivery_note, since=failed_since)
+                except Exception:
+                    # Unknown whether Leopards has it → never risk a second CN
+                    frappe.log_error(
+                        title="Leopards Booking Check Failed",
+                        message=f"{delivery_note}\n{frappe.get_traceback()}",
+                    )
+                    return {
+                        "status": "Unverified",
+                        "cn_number": None,
+                        "slip_link": None,
+                        "shipment": None,
+                        "message": _(
+                            "Could not check Leopards for an earlier booking of {0}. "
+                            "Not booked again; please retry later."
+                        ).format(delivery_note),
+                        "outcome": "unverified",
+                    }
+
+            # 1. Create Shipment (Draft forever)
+            shipment = create_shipment(not single_write)
 
-        # 2. Build payload
-        payload = build_book_packet_payload(shipment)
+            # 2. Build payload
+            payload = build_payload(shipment)
 
-        # 3. Call Leopards
-        response = book_packet(payload)
+            # 3. Call Leopards (retries transient errors safely). The stored
+            # request marks the shipment as sent (see last_failed_booking)
+            if not recovered:
+                shipment.request_payload = compact_json(payload)
+            response = recovered or book_packet_idempotent(payload, limiter=limiter)
 
-        shipment.response_payload = json.dumps(response, indent=2)
+            shipment.response_payload = compact_json(response)
 
-        cn_number = response.get("track_number")
-        slip_link = response.get("slip_link")
+            cn_number = response.get("track_number")
+            slip_link = response.get("slip_link")
 
-        if not cn_number:
-            raise LeopardsAPIError(f"track_number missing: {response}")
+            if not cn_number:
+                raise LeopardsAPIError(f"track_number missing: {response}")
 
-        # 4. Update Shipment
-        shipment.cn_number = str(cn_number)
-        shipment.slip_link = str(slip_link or "")
-        shipment.booking_status = "Booked"
-        shipment.last_error = ""
-        shipment.save(ignore_permissions=True)
+            # 4. Update Shipment
+            shipment.cn_number = str(cn_number)
+            shipment.slip_link = str(slip_link or "")
+            shipment.booking_status = "Booked"
+            shipment.last_error = ""
+            persist_shipment(shipment)
 
-        # 5. Update Delivery Note
-        dn = frappe.get_doc("Delivery Note", delivery_note)
-        dn.custom_leopards_consignment_number = shipment.cn_number
-        dn.custom_leopards_slip_link = shipment.slip_link
-        dn.custom_leopards_booking_status = "Booked"
-        dn.custom_leopards_last_tracking_status = "Booked"
-        dn.save(ignore_permissions=True)
+            # 5. Update Delivery Note (fields only, no reload / save)
+            if write_back:
+                write_back_bookings([{
+                    "delivery_note": delivery_note,
+                    "cn_number": shipment.cn_number,
+                    "slip_link": shipment.slip_link,
+                }])
 
-        return {
-            "status": "Booked",
-            "cn_number": shipment.cn_number,
-            "slip_link": shipment.slip_link,
-            "shipment": shipment.name,
-        }
+            return {
+                "status": "Booked",
+                "cn_number": shipment.cn_number,
+                "slip_link": shipment.slip_link,
+                "shipment": shipment.name,
+                "outcome": "recovered" if recovered else "booked",
+            }
 
     except Exception as e:
+        # No trace without a shipment: lock refused (another booking runs)
+        # or the shipment could not be built
         if shipment:
-            shipment.booking_status = "Failed"
-            shipment.last_error = str(e)[:240]
-            shipment.save(ignore_permissions=True)
+            record_failed_booking(delivery_note, e, shipment)
 
         frappe.throw(_("Leopards booking failed: {0}").format(str(e)))
@@ -1,6 +1,13 @@
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import frappe
-from leopards_integration.api.booking import book_from_delivery_note
+from leopards_integration.api.booking import book_prepared_shipment
+from leopards_integration.services.booking_writeback import write_back_bookings
+from leopards_integration.services.shipment_builder import build_leopards_shipments, record_failed_booking
+from leopards_integration.utils import metrics
+from leopards_integration.utils.leopards_client import _get_settings
+from leopards_integration.utils.rate_limiter import TokenBucket
 
 
 @frappe.whitelist()
@@ -30,9 +37,107 @@ def bulk_book_delivery_notes(delivery_notes):
     }
 
 
-def bulk_book_delivery_notes_job(delivery_notes, user):
+DEFAULT_BOOKING_CONCURRENCY = 4
+DEFAULT_BOOKING_RATE = 2.0
+DEFAULT_BOOKING_BURST = 4
+
+# Booked Delivery Notes stamped per write-back while the pool still runs
+WRITE_BACK_CHUNK = 20
+
+
+def _booking_limits(concurrency=None, rate=None, burst=None):
     """
-    Background worker job
+    (concurrency, rate/sec, burst) from Leopards Settings; explicit
+    arguments win (benchmarks).
+    """
+    settings = _get_settings()
+
+    def _num(value, fieldname, default, cast):
+        try:
+            value = cast(value or settings.get(fieldname) or 0)
+        except (TypeError, ValueError):
+            value = 0
+        return value if value > 0 else default
+
+    return (
+        _num(concurrency, "booking_concurrency", DEFAULT_BOOKING_CONCURRENCY, int),
+        _num(rate, "booking_rate_limit", DEFAULT_BOOKING_RATE, float),
+        _num(burst, "booking_rate_burst", DEFAULT_BOOKING_BURST, float),
+    )
+
+
+def _connect_worker(site, sites_path, user, connections, lock):
+    """
+    Pool initializer: ONE site connection per worker thread, reused for
+    every booking on it (frappe.local is thread-local). The connection is
+    recorded so the job can close it at pool shutdown.
+    """
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    frappe.set_user(user)
+
+    with lock:
+        connections.append(frappe.local.db)
+
+
+def _close_connections(connections):
+    for db in connections:
+        try:
+            db.close()
+        except Exception:
+            pass
+
+
+def _book_in_thread(dn_name, prepared, limiter):
+    """
+    Book ONE prebuilt shipment on the worker thread's site connection.
+    """
+    try:
+        # 🔒 API THROTTLE: every bookPacket attempt, retries included, takes
+        # a token from the bucket shared by all threads
+        res = book_prepared_shipment(
+            dn_name, prepared.shipment, prepared.payload, write_back=False, limiter=limiter
+        )
+
+        if res.get("status") != "Booked":
+            return "skipped", {
+                "dn": dn_name,
+                "reason": res.get("message") or res.get("status"),
+            }, None
+
+        return "booked", {
+            "dn": dn_name,
+            "cn": res.get("cn_number") or "",
+        }, res
+
+    except Exception:
+        frappe.log_error(
+            title="Leopards Bulk Booking Failed",
+            message=f"{dn_name}\n{frappe.get_traceback()}",
+        )
+
+        return "failed", {
+            "dn": dn_name,
+            "error": "See Error Log",
+        }, None
+
+    finally:
+        # Keep Failed shipments + Error Log, same as the sequential job did
+        frappe.db.commit()
+
+
+@metrics.job_metrics("bulk_booking")
+def bulk_book_delivery_notes_job(delivery_notes, user, concurrency=None, rate=None, burst=None):
+    """
+    Background worker job.
+
+    Eligibility is checked with one query and all shipments + payloads are
+    built up front from prefetched rows (build_leopards_shipments), then
+    booked by a bounded thread pool throttled by a token bucket
+    (Leopards Settings → Booking Concurrency / Rate Limit / Burst).
+    Booked Delivery Notes are written back in chunks of WRITE_BACK_CHUNK
+    as results arrive, and whatever is left in a finally block, so an
+    interrupted job never leaves Leopards-booked parcels on unbooked DNs.
     """
     frappe.set_user(user)
 
@@ -42,47 +147,124 @@ def bulk_book_delivery_notes_job(delivery_notes, user):
         "failed": [],
     }
 
-    for dn_name in delivery_notes:
-        try:
-            dn = frappe.get_doc("Delivery Note", dn_name)
+    state = {
+        d.name: d
+        for d in frappe.get_all(
+            "Delivery Note",
+            filters={"name": ["in", list(delivery_notes)]},
+            fields=["name", "docstatus", "custom_leopards_booking_status"],
+        )
+    }
 
-            if dn.docstatus != 1:
-                results["skipped"].append({
-                    "dn": dn_name,
-                    "reason": "Not submitted",
-                })
-                continue
+    to_book = []
 
-            if (dn.get("custom_leopards_booking_status") or "") == "Booked":
-                results["skipped"].append({
-                    "dn": dn_name,
-                    "reason": "Already booked",
-                })
-                continue
+    for dn_name in delivery_notes:
+        dn = state.get(dn_name)
 
-            # 🔒 API THROTTLE (MANDATORY)
-            time.sleep(1)
+        if not dn:
+            results["failed"].append({
+                "dn": dn_name,
+                "error": "Delivery Note not found",
+            })
+            continue
 
-            res = book_from_delivery_note(dn_name)
+        if dn.docstatus != 1:
+            results["skipped"].append({
+                "dn": dn_name,
+                "reason": "Not submitted",
+            })
+            continue
 
-            results["booked"].append({
+        if (dn.get("custom_leopards_booking_status") or "") == "Booked":
+            results["skipped"].append({
                 "dn": dn_name,
-                "cn": res.get("cn_number") or "",
+                "reason": "Already booked",
             })
+            continue
 
-        except Exception:
+        to_book.append(dn_name)
+
+    built = build_leopards_shipments(to_book) if to_book else {}
+    prepared = {}
+
+    for dn_name in to_book:
+        outcome = built[dn_name]
+
+        if isinstance(outcome, Exception):
             frappe.log_error(
                 title="Leopards Bulk Booking Failed",
-                message=f"{dn_name}\n{frappe.get_traceback()}",
+                message=f"{dn_name}\n{outcome}",
             )
-
+            # Same failure trace as a single booking
+            try:
+                record_failed_booking(dn_name, outcome)
+            except Exception:
+                frappe.log_error(
+                    title="Leopards Bulk Booking Failed",
+                    message=f"{dn_name}: could not record the failure\n{frappe.get_traceback()}",
+                )
             results["failed"].append({
                 "dn": dn_name,
-                "error": "See Error Log",
+                "error": str(outcome)[:240],
             })
+            continue
+
+        prepared[dn_name] = outcome
+
+    frappe.db.commit()
+
+    if prepared:
+        concurrency, rate, burst = _booking_limits(concurrency, rate, burst)
+        limiter = TokenBucket(rate, burst)
+
+        connections = []
+        initargs = (
+            frappe.local.site,
+            frappe.local.sites_path,
+            user,
+            connections,
+            threading.Lock(),
+        )
+
+        booked = []
+
+        def _flush_booked():
+            if booked:
+                write_back_bookings(booked)
+                frappe.db.commit()
+                booked.clear()
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=min(concurrency, len(prepared)),
+                initializer=_connect_worker,
+                initargs=initargs,
+            ) as pool:
+                futures = [
+                    pool.submit(_book_in_thread, dn_name, prepared[dn_name], limiter)
+                    for dn_name in prepared
+                ]
+
+                for future in as_completed(futures):
+                    bucket, row, res = future.result()
+                    results[bucket].append(row)
+                    if res:
+                        booked.append({
+                            "delivery_note": row["dn"],
+                            "cn_number": res.get("cn_number"),
+                            "slip_link": res.get("slip_link"),
+                        })
+
+                    if len(booked) >= WRITE_BACK_CHUNK:
+                        _flush_booked()
+        finally:
+            _flush_booked()
+            _close_connections(connections)
 
     frappe.publish_realtime(
         event="leopards_bulk_booking_done",
         message=results,
         user=user,
-    )
\ No newline at end of file
+    )
+
+    return results
@@ -1,10 +1,53 @@
+import os
+
 import frappe
+from frappe.utils import cint
+
+from leopards_integration.services.label_bundle import build_label_bundle, bundle_path, read_bundle_meta
+
+
+def _label_rows(delivery_notes) -> dict:
+    """
+    {dn: {"dn", "cn", "url"}} for every selected DN with a slip, in two queries:
+    booked Leopards Shipments first, Delivery Note custom field as fallback.
+    """
+    labels = {}
+
+    for s in frappe.get_all(
+        "Leopards Shipment",
+        filters={
+            "delivery_note": ["in", delivery_notes],
+            "booking_status": "Booked",
+        },
+        fields=["delivery_note", "slip_link", "cn_number"],
+        order_by="modified desc",
+    ):
+        if s.slip_link and s.delivery_note not in labels:
+            labels[s.delivery_note] = {"dn": s.delivery_note, "cn": s.cn_number or "", "url": s.slip_link}
+
+    missing = [dn for dn in delivery_notes if dn not in labels]
+
+    if missing:
+        for d in frappe.get_all(
+            "Delivery Note",
+            filters={"name": ["in", missing]},
+            fields=["name", "custom_leopards_slip_link", "custom_leopards_consignment_number"],
+        ):
+            if d.custom_leopards_slip_link:
+                labels[d.name] = {
+                    "dn": d.name,
+                    "cn": d.custom_leopards_consignment_number or "",
+                    "url": d.custom_leopards_slip_link,
+                }
+
+    return labels
 
 
 @frappe.whitelist()
-def bulk_print_leopards_labels(delivery_notes):
+def bulk_print_leopards_labels(delivery_notes, merge=0):
     """
-    Returns printable Leopards label URLs for given Delivery Notes
+    Returns printable Leopards label URLs for given Delivery Notes.
+    With `merge`, also one merged PDF bundle (cached by CN set).
     """
 
     if isinstance(delivery_notes, str):
@@ -13,31 +56,58 @@ def bulk_print_leopards_labels(delivery_notes):
     if not delivery_notes:
         frappe.throw("No Delivery Notes selected")
 
+    labels = _label_rows(delivery_notes)
+
     urls = []
     skipped = []
+    selected = []
 
     for dn_name in delivery_notes:
-        # 1️⃣ Find shipment by Delivery Note
-        shipment = frappe.db.get_value(
-            "Leopards Shipment",
-            {"delivery_note": dn_name, "booking_status": "Booked"},
-            ["slip_link", "cn_number"],
-            as_dict=True,
-        )
-
-        if shipment and shipment.slip_link:
-            urls.append(shipment.slip_link)
-            continue
-
-        # 2️⃣ Fallback: Delivery Note custom field (if you keep it)
-        dn = frappe.get_doc("Delivery Note", dn_name)
-        if dn.get("custom_leopards_slip_link"):
-            urls.append(dn.custom_leopards_slip_link)
+        row = labels.get(dn_name)
+        if not row:
+            skipped.append(dn_name)
             continue
 
-        skipped.append(dn_name)
+        urls.append(row["url"])
+        selected.append(row)
 
-    return {
+    result = {
         "urls": urls,
         "skipped": skipped,
-    }
\ No newline at end of file
+    }
+
+    if cint(merge) and selected:
+        bundle = build_label_bundle(selected)
+        result["unmerged"] = bundle["unmerged"]
+
+        if bundle["key"]:
+            result["bundle_url"] = (
+                "/api/method/leopards_integration.api.bulk_print.download_label_bundle"
+                f"?key={bundle['key']}"
+            )
+
+    return result
+
+
+@frappe.whitelist()
+def download_label_bundle(key):
+    """
+    Stream a merged label bundle built by bulk_print_leopards_labels.
+    Labels carry customer addresses and phone numbers, so the user needs
+    read permission on every Delivery Note in the bundle.
+    """
+    path = bundle_path(key)
+    meta = read_bundle_meta(key)
+
+    if not meta or not os.path.exists(path):
+        frappe.throw("Label bundle not found or expired. Print the labels again.")
+
+    for dn in meta["delivery_notes"]:
+        if not frappe.has_permission("Delivery Note", "read", dn):
+            frappe.throw("Not permitted to download this label bundle.", frappe.PermissionError)
+
+    with open(path, "rb") as f:
+        frappe.local.response.filecontent = f.read()
+
+    frappe.local.response.filename = f"leopards-labels-{key[:10]}.pdf"
+    frappe.local.response.type = "pdf"
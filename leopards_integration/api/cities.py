@@ -1,10 +1,60 @@
+import time
+
 import frappe
 from frappe import _
+from frappe.utils import cint
 
+from leopards_integration.services.city_index import invalidate_city_index
+from leopards_integration.utils import metrics
+from leopards_integration.utils.bulk import bulk_insert_docs, bulk_update
 from leopards_integration.utils.leopards_client import get_all_cities
 
+CITY_FIELDS = ("city_name", "allow_as_origin", "allow_as_destination", "is_active")
+
+
+def _flag(value) -> int:
+    return 1 if str(value or "0") in ("1", "true", "True") else 0
+
+
+def _parse_city_rows(rows) -> dict:
+    """
+    {city_id: {city_name, allow_as_origin, allow_as_destination, is_active}}
+    """
+    incoming = {}
+
+    for r in rows:
+        # Support BOTH response shapes
+        city_id = str(
+            r.get("id")
+            or r.get("city_id")
+            or ""
+        ).strip()
+
+        city_name = str(
+            r.get("name")
+            or r.get("city_name")
+            or ""
+        ).strip()
+
+        if not city_id or not city_name:
+            continue
+
+        incoming[city_id] = {
+            "city_name": city_name,
+            "allow_as_origin": _flag(r.get("allow_as_origin")),
+            "allow_as_destination": _flag(r.get("allow_as_destination")),
+            "is_active": 1,
+        }
+
+    return incoming
+
+
+def _ms(since) -> float:
+    return round((time.monotonic() - since) * 1000, 2)
+
 
 @frappe.whitelist()
+@metrics.job_metrics("city_sync")
 def sync_leopards_cities():
     """
     Sync Leopards cities into DocType `Leopards City`.
@@ -12,8 +62,14 @@ def sync_leopards_cities():
     Handles BOTH known Leopards response formats:
       - city_list (official docs)
       - data      (older / alternate responses)
+
+    Diff-based: existing cities are loaded once, then only inserted,
+    changed and deactivated (missing from the API) rows are written,
+    with multi-row INSERT / UPDATE statements.
     """
+    started = time.monotonic()
     resp = get_all_cities()
+    api_ms = _ms(started)
 
     # ------------------------------------------------------------------
     # Leopards RESPONSE NORMALIZATION (CRITICAL FIX)
@@ -32,53 +88,81 @@ def sync_leopards_cities():
             "message": "City API reachable but returned empty list.",
         }
 
-    upserted = 0
-    seen_ids = set()
+    # ------------------------------------------------------------------
+    # DIFF
+    # ------------------------------------------------------------------
+    diff_started = time.monotonic()
 
-    for r in rows:
-        # Support BOTH response shapes
-        city_id = str(
-            r.get("id")
-            or r.get("city_id")
-            or ""
-        ).strip()
+    incoming = _parse_city_rows(rows)
 
-        city_name = str(
-            r.get("name")
-            or r.get("city_name")
-            or ""
-        ).strip()
+    existing = {
+        d.name: d
+        for d in frappe.get_all(
+            "Leopards City",
+            fields=["name", *CITY_FIELDS],
+            limit_page_length=0,
+        )
+    }
 
-        if not city_id or not city_name:
-            continue
+    inserted = []
+    changed = {}
+    unchanged = 0
 
-        seen_ids.add(city_id)
+    for city_id, values in incoming.items():
+        current = existing.get(city_id)
 
-        allow_origin = 1 if str(r.get("allow_as_origin") or "0") in ("1", "true", "True") else 0
-        allow_dest = 1 if str(r.get("allow_as_destination") or "0") in ("1", "true", "True") else 0
+        if not current:
+            inserted.append({"name": city_id, "city_id": city_id, **values})
+            continue
 
-        if frappe.db.exists("Leopards City", city_id):
-            doc = frappe.get_doc("Leopards City", city_id)
-            doc.city_name = city_name
-            doc.allow_as_origin = allow_origin
-            doc.allow_as_destination = allow_dest
-            doc.is_active = 1
-            doc.save(ignore_permissions=True)
+        delta = {
+            f: v
+            for f, v in values.items()
+            if (cint(current[f]) if f != "city_name" else current[f]) != v
+        }
+
+        if delta:
+            changed[city_id] = delta
         else:
-            doc = frappe.new_doc("Leopards City")
-            doc.city_id = city_id   # autoname = field:city_id
-            doc.city_name = city_name
-            doc.allow_as_origin = allow_origin
-            doc.allow_as_destination = allow_dest
-            doc.is_active = 1
-            doc.insert(ignore_permissions=True)
+            unchanged += 1
+
+    deactivated = {
+        name: {"is_active": 0}
+        for name, d in existing.items()
+        if name not in incoming and cint(d.is_active)
+    }
+
+    diff_ms = _ms(diff_started)
 
-        upserted += 1
+    # ------------------------------------------------------------------
+    # WRITE (changes only)
+    # ------------------------------------------------------------------
+    write_started = time.monotonic()
+
+    bulk_insert_docs("Leopards City", inserted)
+    bulk_update("Leopards City", changed)
+    bulk_update("Leopards City", deactivated)
+
+    # Rebuild the in-memory city index on every worker (after the commit)
+    if inserted or changed or deactivated:
+        invalidate_city_index()
 
     frappe.db.commit()
 
+    write_ms = _ms(write_started)
+
     return {
         "status": "success",
-        "upserted": upserted,
+        "upserted": len(inserted) + len(changed),
+        "inserted": len(inserted),
+        "updated": len(changed),
+        "unchanged": unchanged,
+        "deactivated": len(deactivated),
         "total_from_api": len(rows),
+        "timing": {
+            "api_ms": api_ms,
+            "diff_ms": diff_ms,
+            "write_ms": write_ms,
+            "total_ms": _ms(started),
+        },
     }
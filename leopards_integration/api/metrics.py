@@ -0,0 +1,51 @@
+import frappe
+from frappe.utils import now_datetime
+from werkzeug.wrappers import Response
+
+from leopards_integration.utils.metrics import (
+    read_metrics,
+    render_prometheus,
+    reset_metrics,
+    summarize,
+)
+
+
+@frappe.whitelist()
+def prometheus():
+    """
+    Prometheus text endpoint for this site's Leopards metrics.
+    Scrape with an API key/secret of a System Manager user.
+    """
+    frappe.only_for("System Manager")
+
+    return Response(
+        render_prometheus(read_metrics()),
+        mimetype="text/plain; version=0.0.4",
+        charset="utf-8",
+    )
+
+
+@frappe.whitelist()
+def refresh_metrics_summary():
+    """
+    Rebuild the Leopards Metrics Summary table from the live counters.
+    Runs hourly from the scheduler; also callable from the form.
+    """
+    if frappe.session.user != "Administrator":
+        frappe.only_for("System Manager")
+
+    summary = frappe.get_single("Leopards Metrics Summary")
+    summary.last_refreshed = now_datetime()
+    summary.set("metrics", summarize(read_metrics()))
+    summary.save(ignore_permissions=True)
+    frappe.db.commit()
+
+    return {"rows": len(summary.metrics)}
+
+
+@frappe.whitelist()
+def reset():
+    frappe.only_for("System Manager")
+
+    reset_metrics()
+    return refresh_metrics_summary()
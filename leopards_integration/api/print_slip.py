@@ -1,6 +1,11 @@
+import os
+
 import frappe
 import requests
-from leopards_integration.utils.leopards_client import print_cn
+from frappe.utils import cint
+from leopards_integration.utils import metrics
+from leopards_integration.utils.bulk import bulk_update, chunked
+from leopards_integration.utils.leopards_client import get_cached_settings, print_cn
 
 
 @frappe.whitelist()
@@ -60,3 +65,199 @@ def generate_packing_slip(shipment_name):
         return {"status": "success", "type": "html"}
 
     frappe.throw("Unsupported packing slip format returned by Leopards.")
+
+
+# -------------------------------------------------------
+# Bulk packing slips (many CNs per printCN call)
+# -------------------------------------------------------
+
+DEFAULT_PRINT_BATCH_SIZE = 50
+
+
+def _print_batch_size() -> int:
+    return cint(get_cached_settings().get("print_batch_size")) or DEFAULT_PRINT_BATCH_SIZE
+
+
+@frappe.whitelist()
+def bulk_generate_packing_slips(shipments=None):
+    """
+    Queue packing-slip generation for the given Leopards Shipments
+    (or, for System Managers, every booked shipment still without a slip).
+    """
+    frappe.has_permission("Leopards Shipment", "write", throw=True)
+
+    if isinstance(shipments, str):
+        shipments = frappe.parse_json(shipments)
+
+    if not shipments:
+        frappe.only_for("System Manager")
+
+    frappe.enqueue(
+        method="leopards_integration.api.print_slip.bulk_generate_packing_slips_job",
+        queue="long",
+        timeout=3600,
+        shipments=shipments or None,
+        user=frappe.session.user,
+    )
+
+    return {"status": "queued"}
+
+
+def _pending_shipments(shipments=None):
+    """
+    ONE query: booked shipments with a CN whose slip is not generated yet.
+    """
+    filters = {
+        "booking_status": "Booked",
+        "cn_number": ["is", "set"],
+        "slip_generated": 0,
+    }
+    if shipments:
+        filters["name"] = ["in", shipments]
+
+    return frappe.get_all(
+        "Leopards Shipment",
+        filters=filters,
+        fields=["name", "cn_number"],
+        order_by="creation asc",
+        limit_page_length=0,
+    )
+
+
+def _per_cn_slips(resp) -> dict:
+    """
+    {cn: {"print_url" | "html"}} when printCN answers per CN
+    (list under slip_list / data); empty for one combined document.
+    """
+    rows = resp.get("slip_list") or resp.get("data")
+    if not isinstance(rows, list):
+        return {}
+
+    slips = {}
+    for r in rows:
+        if not isinstance(r, dict):
+            continue
+        cn = str(r.get("cn_number") or r.get("track_number") or "").strip()
+        if cn:
+            slips[cn] = r
+    return slips
+
+
+def _attach(shipment, written, file_url=None, file_name=None, content=None) -> str:
+    """
+    File attached to the shipment through the File controller; returns
+    its file_url. URLs of files whose content was saved go to `written`.
+    """
+    file = frappe.get_doc({
+        "doctype": "File",
+        "file_url": file_url,
+        "file_name": file_name,
+        "content": content,
+        "attached_to_doctype": "Leopards Shipment",
+        "attached_to_name": shipment,
+        "is_private": 0,
+    })
+    file.insert(ignore_permissions=True)
+
+    if content:
+        written.append(file.file_url)
+
+    return file.file_url
+
+
+def _store_batch(batch, resp, written) -> dict:
+    """
+    Attach slips for one printCN batch. Returns {shipment: file_url}.
+    """
+    per_cn = _per_cn_slips(resp)
+    stored = {}
+
+    # One combined HTML document for the whole batch → saved once,
+    # then attached to every shipment by URL
+    if not per_cn and resp.get("html") and not resp.get("print_url"):
+        file_url = None
+        for s in batch:
+            if file_url:
+                stored[s.name] = _attach(s.name, written, file_url=file_url)
+            else:
+                file_url = stored[s.name] = _attach(
+                    s.name,
+                    written,
+                    file_name=f"leopards-slips-{frappe.generate_hash(length=10)}.html",
+                    content=resp["html"],
+                )
+        return stored
+
+    for s in batch:
+        slip = per_cn.get(s.cn_number) or (resp if not per_cn else None)
+        if not slip:
+            continue
+
+        if slip.get("print_url"):
+            stored[s.name] = _attach(s.name, written, file_url=slip["print_url"])
+        elif slip.get("html") and per_cn:
+            stored[s.name] = _attach(
+                s.name, written, file_name=f"{s.cn_number}.html", content=slip["html"]
+            )
+
+    return stored
+
+
+def _discard_files(file_urls):
+    """
+    After a rollback: delete saved slip files no File record points to.
+    """
+    for file_url in set(file_urls):
+        if frappe.db.exists("File", {"file_url": file_url}):
+            continue
+
+        path = frappe.get_site_path("public", file_url.lstrip("/"))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@metrics.job_metrics("packing_slips")
+def bulk_generate_packing_slips_job(shipments=None, user=None):
+    """
+    printCN for many CNs per call → File records through the File
+    controller → slip_generated / packing_slip set with one UPDATE per
+    batch. Files saved by a batch that rolls back are removed again.
+    """
+    pending = _pending_shipments(shipments)
+    generated = 0
+    failed = []
+
+    for batch in chunked(pending, _print_batch_size()):
+        written = []
+
+        try:
+            resp = print_cn([s.cn_number for s in batch])
+            stored = _store_batch(batch, resp, written)
+
+            bulk_update("Leopards Shipment", {
+                name: {"packing_slip": file_url, "slip_generated": 1}
+                for name, file_url in stored.items()
+            })
+
+            frappe.db.commit()
+            generated += len(stored)
+            failed.extend(s.name for s in batch if s.name not in stored)
+
+        except Exception:
+            frappe.db.rollback()
+            _discard_files(written)
+            frappe.log_error(
+                title="Leopards Bulk Packing Slip Failed",
+                message=f"{[s.name for s in batch]}\n{frappe.get_traceback()}",
+            )
+            failed.extend(s.name for s in batch)
+
+    result = {"generated": generated, "failed": failed, "total": len(pending)}
+
+    frappe.publish_realtime(
+        event="leopards_packing_slips_done",
+        message=result,
+        user=user,
+    )
+
+    return result
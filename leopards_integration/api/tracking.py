@@ -1,75 +1,226 @@
-import requests
+import hashlib
+
 import frappe
+from frappe.utils import get_datetime
 from leopards_integration.utils.leopards_client import (
     _get_settings,
     _get_api_password,
     _resolve_base_url,
+    get_cached_settings,
+    get_http_client,
     LeopardsAPIError,
 )
+from leopards_integration.utils import metrics
+from leopards_integration.utils.circuit_breaker import get_circuit_breaker
+from leopards_integration.services.status_taxonomy import DELIVERED, classify_status
 
 
-DELIVERED_KEYWORDS = {
-    "delivered",
-    "shipment delivered",
-    "consignment delivered",
-}
+def _is_delivered(status_text: str) -> bool:
+    return classify_status(status_text) == DELIVERED
 
 
-def _is_delivered(status_text: str) -> bool:
-    if not status_text:
-        return False
-    s = status_text.lower()
-    return any(k in s for k in DELIVERED_KEYWORDS)
+DEFAULT_TRACKING_BATCH_SIZE = 50
 
 
-def fetch_leopards_tracking(cn: str) -> str:
+def get_tracking_batch_size(settings=None) -> int:
     """
-    Fetch current tracking status from Leopards.
-    Best-effort: NEVER raises for API instability.
+    CNs per trackBookedPacket request (Leopards Settings → Tracking Batch Size).
+    """
+    settings = settings or get_cached_settings()
+    try:
+        size = int(settings.get("tracking_batch_size") or 0)
+    except (TypeError, ValueError):
+        size = 0
+    return size if size > 0 else DEFAULT_TRACKING_BATCH_SIZE
+
+
+def _packet_status(packet) -> str:
+    """
+    Status of one packet from trackBookedPacket or getBookedPacketLastStatus
+    - both the poll and the reconcile path read it through here.
+    """
+    return (
+        packet.get("current_status")
+        or packet.get("booked_packet_status")
+        or packet.get("status")
+        or "Pending"
+    )
+
+
+def packet_timeline(packet) -> list:
+    """
+    The packet's "Tracking Detail" scans, oldest first:
+      [frappe._dict(status, event_time, reason)]
+    Scans without a parseable courier timestamp are skipped.
+    """
+    timeline = []
+
+    for scan in (packet or {}).get("Tracking Detail") or []:
+        status = str(scan.get("Status") or scan.get("status") or "").strip()
+        stamp = scan.get("Activity_datetime") or scan.get("activity_datetime")
+        if not status or not stamp:
+            continue
+
+        try:
+            event_time = get_datetime(stamp)
+        except Exception:
+            continue
+
+        timeline.append(frappe._dict(
+            status=status,
+            event_time=event_time,
+            reason=str(scan.get("Reason") or scan.get("reason") or "").strip(),
+        ))
+
+    timeline.sort(key=lambda e: e.event_time)
+    return timeline
+
+
+def event_hash(cn, event) -> str:
+    """
+    Content hash of one scan - used as the Leopards Tracking Event name,
+    so the same scan is only ever stored once.
+    """
+    key = "|".join((
+        str(cn).strip(),
+        event.status,
+        event.event_time.strftime("%Y-%m-%d %H:%M:%S"),
+        event.reason or "",
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _clean_cns(cns) -> list:
+    return list(dict.fromkeys(str(c).strip() for c in cns if c and str(c).strip()))
+
+
+def get_tracking_request(settings=None):
+    """
+    Everything a trackBookedPacket call needs, resolved up front:
+      (client, url, api_key, api_password, breaker)
+    Lets worker threads / asyncio executors call post_tracking_request
+    without touching frappe.local.
+    """
+    settings = settings or _get_settings()
+
+    return (
+        get_http_client(settings),
+        f"{_resolve_base_url(settings)}/api/trackBookedPacket/format/json/",
+        settings.api_key,
+        _get_api_password(settings),
+        get_circuit_breaker("trackBookedPacket", settings),
+    )
+
+
+def post_tracking_request(request, cns) -> dict:
     """
+    ONE trackBookedPacket call for many CNs (no frappe access).
 
-    settings = _get_settings()
-    base_url = _resolve_base_url(settings)
-    api_password = _get_api_password(settings)
+    Returns {cn: packet} for every CN present in `packet_list`, mapped back
+    by track number. Raises LeopardsAPIError when the call itself fails,
+    so callers can tell "no answer" apart from "no change".
+    """
 
-    url = f"{base_url}/api/trackBookedPacket/format/json/"
+    client, url, api_key, api_password, breaker = request
+
+    cns = _clean_cns(cns)
+    if not cns:
+        return {}
 
     payload = {
-        "api_key": settings.api_key,
+        "api_key": api_key,
         "api_password": api_password,
-        "track_numbers": [cn],
+        "track_numbers": cns,
     }
 
     try:
-        resp = requests.post(
+        resp = client.post(
+            "trackBookedPacket",
             url,
+            breaker=breaker,
             json=payload,
-            timeout=30,
             headers={"User-Agent": "ERPNext-Leopards-Tracking"},
         )
-    except Exception:
-        return "Pending"
+    except Exception as e:
+        raise LeopardsAPIError(f"Tracking API error: {e}")
 
-    # Leopards tracking API is unstable → treat as pending
     if resp.status_code != 200:
-        return "Pending"
+        raise LeopardsAPIError(f"Tracking HTTP {resp.status_code}")
 
     try:
         data = resp.json()
     except Exception:
-        return "Pending"
+        raise LeopardsAPIError("Tracking invalid JSON")
 
     if str(data.get("status")) != "1":
-        return "Pending"
+        raise LeopardsAPIError(f"Tracking failed: {data.get('error') or data}")
 
     packets = data.get("packet_list") or []
-    if not packets:
-        return "Pending"
+    wanted = set(cns)
+    result = {}
 
-    latest = packets[0]
+    for packet in packets:
+        cn = str(
+            packet.get("track_number")
+            or packet.get("cn_number")
+            or ""
+        ).strip()
 
-    return (
-        latest.get("current_status")
-        or latest.get("status")
-        or "Pending"
-    )
+        if cn in wanted:
+            result[cn] = packet
+
+    # Single-CN call: older responses may omit track_number
+    if len(cns) == 1 and packets and not result:
+        result[cns[0]] = packets[0]
+
+    return result
+
+
+def fetch_tracking_packets(cns) -> dict:
+    """
+    {cn: packet} for many CNs in ONE trackBookedPacket call.
+    Raises LeopardsAPIError on failure (see post_tracking_request).
+    """
+    cns = _clean_cns(cns)
+    if not cns:
+        return {}
+
+    return post_tracking_request(get_tracking_request(), cns)
+
+
+def fetch_leopards_tracking_batch(cns) -> dict:
+    """
+    Fetch current tracking status for many CNs in ONE trackBookedPacket call.
+
+    Returns {cn: status}; CNs missing from the response are "Pending".
+    Best-effort: NEVER raises for API instability (whole batch → "Pending").
+    """
+
+    cns = _clean_cns(cns)
+    result = {cn: "Pending" for cn in cns}
+
+    # Leopards tracking API is unstable → treat as pending
+    try:
+        packets = fetch_tracking_packets(cns)
+    except Exception as e:
+        metrics.inc("leopards_tracking_pending_total", len(cns), reason=type(e).__name__)
+        return result
+
+    for cn, packet in packets.items():
+        result[cn] = _packet_status(packet)
+
+    missing = len(cns) - len(packets)
+    if missing > 0:
+        metrics.inc("leopards_tracking_pending_total", missing, reason="missing_from_response")
+
+    return result
+
+
+def fetch_leopards_tracking(cn: str) -> str:
+    """
+    Fetch current tracking status from Leopards.
+    Best-effort: NEVER raises for API instability.
+    """
+
+    cn = str(cn or "").strip()
+    return fetch_leopards_tracking_batch([cn]).get(cn, "Pending")
@@ -1,64 +1,321 @@
 import frappe
-from frappe.utils import now_datetime
-from leopards_integration.api.tracking import (
-    fetch_leopards_tracking,
-    _is_delivered,
+from frappe import _
+from frappe.utils import add_days, cint, getdate, now_datetime, nowdate
+from leopards_integration.api.tracking import _packet_status
+from leopards_integration.services.status_reconcile import (
+    StatusReconciler,
+    booking_windows,
+    earliest_active_booking_date,
 )
+from leopards_integration.services.tracking_engine import (
+    TrackingEngine,
+    new_snapshot_row,
+    new_timeline_events,
+)
+from leopards_integration.utils import metrics
+from leopards_integration.utils.bulk import bulk_insert_docs
+
+
+BACKFILL_CURSOR_KEY = "leopards_tracking_backfill_cursor"
+BACKFILL_WINDOW_KEY = "leopards_tracking_backfill_window"
+BACKFILL_JOB_ID = "leopards_tracking_backfill"
+BACKFILL_EVENT = "leopards_tracking_backfill_progress"
+DEFAULT_PAGE_SIZE = 500
+
+# Snapshots per backfill run, as before the job was streamed; 0 = no limit
+DEFAULT_BACKFILL_LIMIT = 200
+
+RECONCILE_JOB_ID = "leopards_status_reconcile"
+RECONCILE_EVENT = "leopards_status_reconcile_progress"
+
+# Longest booking-date range one manual reconcile may cover
+MAX_RECONCILE_DAYS = 90
 
 
 @frappe.whitelist()
-def backfill_leopards_tracking(limit=200):
+def backfill_leopards_tracking(limit=DEFAULT_BACKFILL_LIMIT, page_size=DEFAULT_PAGE_SIZE, reset=0):
     """
-    ONE-TIME backfill.
-    Never fails due to Leopards API instability.
+    ONE-TIME backfill (background) of up to `limit` snapshots (0 = all).
+    Resumes from the last committed page unless `reset` is set.
+    Progress is published on `leopards_tracking_backfill_progress`.
     """
+    frappe.only_for("System Manager")
+
+    if cint(reset):
+        frappe.db.set_global(BACKFILL_CURSOR_KEY, "")
+        frappe.db.set_global(BACKFILL_WINDOW_KEY, "")
 
-    dns = frappe.get_all(
-        "Delivery Note",
-        filters={
-            "custom_leopards_booking_status": "Booked",
-            "custom_leopards_consignment_number": ["is", "set"],
-        },
-        fields=["name", "custom_leopards_consignment_number"],
-        limit=int(limit),
+    frappe.enqueue(
+        method="leopards_integration.api.tracking_backfill.backfill_leopards_tracking_job",
+        queue="long",
+        timeout=6 * 3600,
+        job_id=BACKFILL_JOB_ID,
+        deduplicate=True,
+        limit=cint(limit) or None,
+        page_size=cint(page_size) or DEFAULT_PAGE_SIZE,
+        user=frappe.session.user,
     )
 
-    created = 0
-    skipped = 0
-
-    for d in dns:
-        if frappe.db.exists(
-            "Leopards Shipment Tracking",
-            {"delivery_note": d.name},
-        ):
-            skipped += 1
-            continue
-
-        # Best-effort tracking
-        try:
-            status = fetch_leopards_tracking(
-                d.custom_leopards_consignment_number
-            )
-        except Exception:
-            status = "Pending"
+    return {
+        "status": "queued",
+        "resume_from": frappe.db.get_global(BACKFILL_CURSOR_KEY) or None,
+        "resume_window": frappe.db.get_global(BACKFILL_WINDOW_KEY) or None,
+    }
 
-        delivered = _is_delivered(status)
 
-        frappe.get_doc({
-            "doctype": "Leopards Shipment Tracking",
-            "delivery_note": d.name,
-            "cn_number": d.custom_leopards_consignment_number,
-            "current_status": status,
-            "last_updated": now_datetime(),
-            "is_delivered": delivered,
-        }).insert(ignore_permissions=True)
+@frappe.whitelist()
+def reconcile_leopards_tracking(from_date=None, to_date=None):
+    """
+    Date-range status reconcile (background), see StatusReconciler.
+    Defaults to the booking dates that still have an active parcel, at
+    most MAX_RECONCILE_DAYS back from `to_date` (default: today).
+    Progress is published on `leopards_status_reconcile_progress`.
+    """
+    frappe.only_for("System Manager")
 
-        created += 1
+    to_date = getdate(to_date or nowdate())
+    if from_date:
+        from_date = getdate(from_date)
+    else:
+        earliest = earliest_active_booking_date()
+        from_date = earliest and max(
+            getdate(earliest), getdate(add_days(to_date, 1 - MAX_RECONCILE_DAYS))
+        )
 
-    frappe.db.commit()
+    if from_date and from_date > to_date:
+        frappe.throw(_("From Date must be on or before To Date"))
 
-    return {
-        "created": created,
-        "skipped_existing": skipped,
-        "total_seen": len(dns),
+    if from_date and (to_date - from_date).days + 1 > MAX_RECONCILE_DAYS:
+        frappe.throw(
+            _("Reconcile at most {0} days of bookings at a time").format(MAX_RECONCILE_DAYS)
+        )
+
+    if not from_date:
+        return {"status": "nothing to reconcile"}
+
+    frappe.enqueue(
+        method="leopards_integration.api.tracking_backfill.reconcile_leopards_tracking_job",
+        queue="long",
+        timeout=6 * 3600,
+        job_id=RECONCILE_JOB_ID,
+        deduplicate=True,
+        from_date=str(from_date),
+        to_date=str(to_date),
+        user=frappe.session.user,
+    )
+
+    return {"status": "queued", "from_date": str(from_date), "to_date": str(to_date)}
+
+
+def nightly_leopards_reconcile():
+    """
+    Scheduler entry (nightly): full reconcile on the long queue.
+    """
+    frappe.enqueue(
+        method="leopards_integration.api.tracking_backfill.reconcile_leopards_tracking_job",
+        queue="long",
+        timeout=6 * 3600,
+        job_id=RECONCILE_JOB_ID,
+        deduplicate=True,
+    )
+
+
+@metrics.job_metrics("status_reconcile")
+def reconcile_leopards_tracking_job(from_date=None, to_date=None, user=None):
+    """
+    Pull last statuses window by window and apply only the diffs to
+    existing snapshots. Nothing to do when no parcel is active.
+    """
+
+    from_date = from_date or earliest_active_booking_date()
+    if not from_date:
+        result = {"windows": 0, "done": True}
+        frappe.publish_realtime(event=RECONCILE_EVENT, message=result, user=user)
+        return result
+
+    def _progress(start, end, stats):
+        frappe.publish_realtime(
+            event=RECONCILE_EVENT,
+            message={**stats, "window": f"{start} - {end}", "done": False},
+            user=user,
+        )
+
+    result = {
+        **StatusReconciler().run(from_date, to_date, on_window=_progress),
+        "done": True,
     }
+
+    frappe.publish_realtime(event=RECONCILE_EVENT, message=result, user=user)
+
+    return result
+
+
+def _next_page(cursor, page_size):
+    """
+    Keyset page of booked Delivery Notes WITHOUT a tracking snapshot
+    (single anti-join, no per-DN exists check).
+    """
+    return frappe.db.sql(
+        """
+        SELECT dn.name, dn.custom_leopards_consignment_number AS cn_number
+        FROM `tabDelivery Note` dn
+        LEFT JOIN `tabLeopards Shipment Tracking` t
+            ON t.delivery_note = dn.name
+        WHERE dn.custom_leopards_booking_status = 'Booked'
+          AND IFNULL(dn.custom_leopards_consignment_number, '') != ''
+          AND dn.name > %(cursor)s
+          AND t.name IS NULL
+        ORDER BY dn.name
+        LIMIT %(page_size)s
+        """,
+        {"cursor": cursor or "", "page_size": int(page_size)},
+        as_dict=True,
+    )
+
+
+def _track_page(dns, engine) -> dict:
+    """
+    {cn: packet} for a page through the tracking engine's fetch stage.
+    Never fails (CNs without an answer are missing → "Pending").
+    """
+    packets = engine.fetch_packets([d.cn_number for d in dns])
+    return {d.cn_number: packets.get(str(d.cn_number).strip()) for d in dns}
+
+
+@metrics.job_metrics("tracking_backfill")
+def backfill_leopards_tracking_job(limit=None, page_size=DEFAULT_PAGE_SIZE, user=None):
+    """
+    1. Date-range pass: booking-date windows from the oldest booked
+       Delivery Note without a snapshot → one getBookedPacketLastStatus
+       call each → bulk INSERT snapshots for matched DNs → persist window
+       cursor → commit → publish progress
+    2. Per-CN pass for whatever Leopards did not report by date: stream
+       Delivery Notes page by page:
+         anti-join page → batched tracking → bulk INSERT snapshots
+         + their courier scans → persist cursor → commit → publish progress
+
+    A restarted job continues from the persisted cursors. `limit` is
+    checked between windows, so the date-range pass may overshoot it by
+    up to one window.
+    """
+
+    created = _backfill_by_date(limit, user)
+
+    cursor = frappe.db.get_global(BACKFILL_CURSOR_KEY) or ""
+    engine = TrackingEngine()
+    pages = 0
+
+    while True:
+        size = int(page_size)
+        if limit:
+            size = min(size, int(limit) - created)
+            if size <= 0:
+                break
+
+        dns = _next_page(cursor, size)
+        if not dns:
+            # Pass complete: the next run starts from the first name again,
+            # so DNs booked since then are not skipped
+            cursor = ""
+            frappe.db.set_global(BACKFILL_CURSOR_KEY, cursor)
+            frappe.db.commit()
+            break
+
+        packets = _track_page(dns, engine)
+        now = now_datetime()
+
+        rows = []
+        events = []
+        for d in dns:
+            packet = packets.get(d.cn_number)
+            status = _packet_status(packet) if packet else "Pending"
+            scans = new_timeline_events(frappe._dict(cn_number=d.cn_number), packet) if packet else []
+
+            rows.append(new_snapshot_row(d.name, d.cn_number, status, now, scans))
+            events.extend(
+                {
+                    "name": scan.name,
+                    "delivery_note": d.name,
+                    "cn_number": d.cn_number,
+                    "status_text": scan.status,
+                    "reason": scan.reason,
+                    "event_time": scan.event_time,
+                    "source": "Leopards API",
+                }
+                for scan in scans
+            )
+
+        bulk_insert_docs("Leopards Shipment Tracking", rows)
+        bulk_insert_docs("Leopards Tracking Event", events, ignore_duplicates=True)
+
+        cursor = dns[-1].name
+        frappe.db.set_global(BACKFILL_CURSOR_KEY, cursor)
+        frappe.db.commit()
+
+        created += len(rows)
+        pages += 1
+
+        frappe.publish_realtime(
+            event=BACKFILL_EVENT,
+            message={"created": created, "pages": pages, "cursor": cursor, "done": False},
+            user=user,
+        )
+
+    result = {"created": created, "pages": pages, "cursor": cursor or None, "done": True}
+
+    frappe.publish_realtime(event=BACKFILL_EVENT, message=result, user=user)
+
+    return result
+
+
+def _earliest_unsynced_booking_date():
+    return frappe.db.sql(
+        """
+        SELECT MIN(dn.posting_date)
+        FROM `tabDelivery Note` dn
+        LEFT JOIN `tabLeopards Shipment Tracking` t
+            ON t.delivery_note = dn.name
+        WHERE dn.custom_leopards_booking_status = 'Booked'
+          AND IFNULL(dn.custom_leopards_consignment_number, '') != ''
+          AND t.name IS NULL
+        """
+    )[0][0]
+
+
+def _backfill_by_date(limit, user) -> int:
+    """
+    Date-range pass of the backfill; returns snapshots created.
+    """
+    start = frappe.db.get_global(BACKFILL_WINDOW_KEY) or _earliest_unsynced_booking_date()
+    if not start or getdate(start) > getdate(nowdate()):
+        return 0
+
+    reconciler = StatusReconciler(create_missing=True)
+
+    for window_start, window_end in booking_windows(start, nowdate(), reconciler.window_days):
+        if limit and reconciler.stats["created"] >= int(limit):
+            break
+
+        reconciler.reconcile_window(window_start, window_end)
+        if reconciler.stats["failed_windows"]:
+            # Keep the cursor here; the per-CN pass covers the rest
+            break
+
+        frappe.db.set_global(BACKFILL_WINDOW_KEY, str(add_days(window_end, 1)))
+        frappe.db.commit()
+
+        frappe.publish_realtime(
+            event=BACKFILL_EVENT,
+            message={
+                "created": reconciler.stats["created"],
+                "window": f"{window_start} - {window_end}",
+                "done": False,
+            },
+            user=user,
+        )
+    else:
+        # All windows done: the next run starts from the oldest gap again
+        frappe.db.set_global(BACKFILL_WINDOW_KEY, "")
+        frappe.db.commit()
+
+    return reconciler.stats["created"]
@@ -0,0 +1,300 @@
+import math
+import time
+from contextlib import contextmanager
+
+import frappe
+
+from leopards_integration.benchmark.simulator import LeopardsSimulator, SimulatorConfig
+from leopards_integration.services.shipment_builder import compact_json, persist_shipment
+from leopards_integration.utils.bulk import bulk_insert_docs
+from leopards_integration.utils.leopards_client import (
+    _get_api_password,
+    _get_settings,
+    add_timing_listener,
+    override_base_url,
+    remove_timing_listener,
+)
+from leopards_integration.utils.metrics import count_queries
+
+# Token-bucket rate that never throttles ("--rate 0")
+UNTHROTTLED_RATE = 1e9
+
+
+SCENARIOS = ("booking", "booking_writes", "tracking", "cities")
+
+
+# =====================================================
+# MEASUREMENT HELPERS
+# =====================================================
+
+def percentile(values, pct) -> float:
+    """
+    Nearest-rank percentile; 0 for an empty sample.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[rank], 2)
+
+
+@contextmanager
+def _request_timings():
+    timings = []
+    add_timing_listener(timings.append)
+    try:
+        yield timings
+    finally:
+        remove_timing_listener(timings.append)
+
+
+@contextmanager
+def _rolled_back(all_connections=False):
+    """
+    Run a DB-writing scenario in one transaction: commits are suspended
+    and everything is rolled back afterwards.
+
+    With all_connections, commits are suspended for every connection of
+    the process, so worker threads that connect their own site (bulk
+    booking) never commit either; their work is discarded when the job
+    closes their connections at pool shutdown.
+    """
+    db = frappe.db
+    target = type(db) if all_connections else db
+    patched_outside = "commit" in vars(target)
+    original = vars(target).get("commit")
+
+    if all_connections:
+        target.commit = lambda self, *args, **kwargs: None
+    else:
+        target.commit = lambda *args, **kwargs: None
+
+    try:
+        yield
+    finally:
+        if patched_outside:
+            target.commit = original
+        else:
+            delattr(target, "commit")
+        db.rollback()
+
+
+def _result(scenario, operations, seconds, timings, queries=None, **extra) -> dict:
+    latencies = [t["elapsed_ms"] for t in timings]
+
+    return {
+        "scenario": scenario,
+        "operations": operations,
+        "seconds": round(seconds, 3),
+        "ops_per_sec": round(operations / seconds, 2) if seconds else 0,
+        "requests": len(timings),
+        "request_errors": sum(1 for t in timings if t["failed"]),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "db_queries": queries,
+        **extra,
+    }
+
+
+# =====================================================
+# SCENARIOS
+# =====================================================
+
+def bench_booking(count, concurrency=4, rate=0.0, burst=None):
+    """
+    The real bulk booking job - prefetch + build, thread pool under the
+    token bucket, Delivery Note write-back - over up to `count` submitted,
+    unbooked Delivery Notes of this site. Rolled back on every connection;
+    bookPacket goes to the simulator.
+    """
+    from leopards_integration.api.bulk_booking import bulk_book_delivery_notes_job
+
+    names = frappe.get_all(
+        "Delivery Note",
+        filters={"docstatus": 1, "custom_leopards_booking_status": ["!=", "Booked"]},
+        order_by="creation desc",
+        limit=int(count),
+        pluck="name",
+    )
+    if not names:
+        return _result("booking", 0, 0, [], 0, note="No submitted, unbooked Delivery Notes")
+
+    with _rolled_back(all_connections=True):
+        with _request_timings() as timings, count_queries(all_threads=True) as counter:
+            started = time.monotonic()
+            outcome = bulk_book_delivery_notes_job(
+                names,
+                frappe.session.user,
+                concurrency=concurrency,
+                rate=rate or UNTHROTTLED_RATE,
+                burst=burst,
+            )
+            seconds = time.monotonic() - started
+
+    return _result(
+        "booking",
+        len(names),
+        seconds,
+        timings,
+        counter["queries"],
+        booked=len(outcome["booked"]),
+        failed=len(outcome["failed"]),
+    )
+
+
+def bench_booking_writes(count):
+    """
+    Leopards Shipment persistence per booking, both modes (rolled back):
+    Draft insert + result save vs single write after the response.
+    """
+    rows = []
+
+    for single_write in (False, True):
+        with _rolled_back(), count_queries() as counter:
+            started = time.monotonic()
+
+            for i in range(int(count)):
+                _write_bench_shipment(i, single_write)
+
+            seconds = time.monotonic() - started
+
+        rows.append(_result(
+            "booking_writes_single" if single_write else "booking_writes_draft",
+            int(count),
+            seconds,
+            [],
+            queries=counter["queries"],
+        ))
+
+    return rows
+
+
+def _write_bench_shipment(i, single_write):
+    payload = {
+        "booked_packet_order_id": f"BENCH-DN-{i:07d}",
+        "booked_packet_weight": 500,
+        "booked_packet_no_piece": 1,
+        "booked_packet_collect_amount": 0,
+        "special_instructions": "Benchmark item x1",
+    }
+
+    shipment = frappe.new_doc("Leopards Shipment")
+    shipment.update({
+        "booking_status": "Draft",
+        "delivery_note": payload["booked_packet_order_id"],
+        "consignee_name": "Benchmark",
+        "city": "Benchmark",
+        "address": "Benchmark",
+        "phone": "03000000000",
+        "payment_mode": "COD",
+        "pieces": 1,
+        "weight_grams": 500,
+    })
+    shipment.flags.ignore_links = True
+    shipment.flags.ignore_mandatory = True
+
+    if not single_write:
+        shipment.insert(ignore_permissions=True)
+
+    shipment.request_payload = compact_json(payload)
+    shipment.response_payload = compact_json({"status": 1, "track_number": f"BENCH{i:07d}"})
+    shipment.cn_number = f"BENCH{i:07d}"
+    shipment.booking_status = "Booked"
+    persist_shipment(shipment)
+
+
+def bench_tracking(count):
+    """
+    Tracking engine (one shard, no lease) over `count` synthetic
+    snapshots (rolled back).
+    """
+    from leopards_integration.services.tracking_engine import sync_due_tracking
+
+    with _rolled_back():
+        bulk_insert_docs("Leopards Shipment Tracking", [
+            {
+                "delivery_note": f"BENCH-DN-{i:07d}",
+                "cn_number": f"BENCH{i:07d}",
+                "current_status": "Pending",
+                "is_delivered": 0,
+            }
+            for i in range(int(count))
+        ])
+
+        with _request_timings() as timings, count_queries() as counter:
+            started = time.monotonic()
+            outcome = sync_due_tracking(int(count))
+            seconds = time.monotonic() - started
+
+    return _result("tracking", int(count), seconds, timings, counter["queries"], outcome=outcome)
+
+
+def bench_cities():
+    """
+    sync_leopards_cities against the simulator's city list (rolled back).
+    """
+    from leopards_integration.api.cities import sync_leopards_cities
+
+    with _rolled_back():
+        with _request_timings() as timings, count_queries() as counter:
+            started = time.monotonic()
+            outcome = sync_leopards_cities()
+            seconds = time.monotonic() - started
+
+    operations = outcome.get("total_from_api") or 0
+    return _result("cities", operations, seconds, timings, counter["queries"], outcome=outcome)
+
+
+# =====================================================
+# ENTRY POINT
+# =====================================================
+
+def run_benchmark(
+    scenarios=SCENARIOS,
+    count=500,
+    concurrency=4,
+    rate=0.0,
+    burst=None,
+    simulator_config=None,
+):
+    """
+    Start the local simulator, point the client at it and run the given
+    scenarios. Needs an enabled Leopards Settings with credentials set
+    (they are sent to the simulator only).
+    """
+    # Warm the settings cache on this thread; worker threads reuse it
+    _get_api_password(_get_settings())
+
+    results = []
+
+    with LeopardsSimulator(simulator_config or SimulatorConfig()) as sim:
+        with override_base_url(sim.base_url):
+            for scenario in scenarios:
+                if scenario == "booking":
+                    results.append(bench_booking(count, concurrency, rate, burst))
+                elif scenario == "booking_writes":
+                    results.extend(bench_booking_writes(count))
+                elif scenario == "tracking":
+                    results.append(bench_tracking(count))
+                elif scenario == "cities":
+                    results.append(bench_cities())
+
+        for row in results:
+            row["simulator"] = dict(sim.counters)
+
+    return results
+
+
+def format_report(results) -> str:
+    columns = (
+        "scenario", "operations", "seconds", "ops_per_sec", "requests",
+        "request_errors", "p50_ms", "p95_ms", "p99_ms", "db_queries",
+    )
+
+    lines = ["  ".join(f"{c:>14}" for c in columns)]
+    for row in results:
+        cells = ("-" if row.get(c) is None else str(row.get(c)) for c in columns)
+        lines.append("  ".join(f"{cell:>14}" for cell in cells))
+
+    return "\n".join(lines)
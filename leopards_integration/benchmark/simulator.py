@@ -0,0 +1,284 @@
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# =====================================================
+# LOCAL LEOPARDS API STAND-IN (benchmarks / load tests)
+# =====================================================
+
+TRACKING_STAGES = (
+    "Pending",
+    "Consignment Booked",
+    "Dispatched",
+    "Arrived at Station",
+    "Out for Delivery",
+    "Delivered",
+)
+
+
+class SimulatorConfig:
+    """
+    - latency_ms / jitter_ms : added to every response
+    - error_rate             : share of requests answered with HTTP 500
+    - rate_limit             : requests/sec before HTTP 429 (0 = unlimited)
+    - cities                 : size of the getAllCities list
+    """
+
+    def __init__(self, latency_ms=50, jitter_ms=20, error_rate=0.0, rate_limit=0, cities=400, seed=None):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.rate_limit = float(rate_limit)
+        self.cities = int(cities)
+        self.random = random.Random(seed)
+
+
+class LeopardsSimulator:
+    """
+    Implements bookPacket, getAllCities, printCN, trackBookedPacket and
+    getBookedPacketLastStatus with the response shapes the client expects.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or SimulatorConfig()
+        self.host = host
+        self.port = port
+
+        self._cn_counter = itertools.count(1)
+        self._booked = {}
+        self._lock = threading.Lock()
+        self._window_started = time.monotonic()
+        self._window_count = 0
+        self._epoch = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+        self.counters = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+        self._server = None
+        self._thread = None
+
+    # ---------------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------------
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _bind(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        """
+        Serve from a daemon thread (benchmarks).
+        """
+        self._bind()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """
+        Serve in the foreground (bench leopards-simulator).
+        """
+        self._bind()
+        self._server.serve_forever()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------------------------------------------------------------
+    # Behaviour knobs
+    # ---------------------------------------------------------------
+
+    def _sleep(self):
+        c = self.config
+        delay = max(0.0, c.latency_ms + c.random.uniform(-c.jitter_ms, c.jitter_ms))
+        time.sleep(delay / 1000)
+
+    def _rate_limited(self) -> bool:
+        if self.config.rate_limit <= 0:
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_started >= 1:
+                self._window_started = now
+                self._window_count = 0
+            self._window_count += 1
+            return self._window_count > self.config.rate_limit
+
+    def _failed(self) -> bool:
+        return self.config.error_rate > 0 and self.config.random.random() < self.config.error_rate
+
+    # ---------------------------------------------------------------
+    # Endpoints
+    # ---------------------------------------------------------------
+
+    def book_packet(self, payload):
+        order_id = str(payload.get("booked_packet_order_id") or "")
+
+        with self._lock:
+            cn = f"SIM{next(self._cn_counter):09d}"
+            self._booked[cn] = {
+                "order_id": order_id,
+                "booked_at": datetime.now(),
+            }
+
+        return {
+            "status": 1,
+            "error": 0,
+            "track_number": cn,
+            "slip_link": f"{self.base_url}/slip/{cn}.pdf",
+        }
+
+    def get_all_cities(self, payload):
+        return {
+            "status": 1,
+            "error": 0,
+            "city_list": [
+                {
+                    "id": str(i),
+                    "name": f"City {i}",
+                    "allow_as_origin": 1 if i % 5 == 0 else 0,
+                    "allow_as_destination": 1,
+                }
+                for i in range(1, self.config.cities + 1)
+            ],
+        }
+
+    def print_cn(self, payload):
+        cns = _split_numbers(payload.get("cn_numbers"))
+        body = "".join(f"<div class='slip'>{cn}</div>" for cn in cns)
+        return {"status": 1, "error": 0, "html": f"<html><body>{body}</body></html>"}
+
+    def _timeline(self, cn):
+        """
+        Deterministic per CN: each CN starts 0-29 h before the simulator
+        did and advances one stage every 6 h, so repeated polls return the
+        same scans plus any new ones.
+        """
+        seed = int(hashlib.md5(cn.encode()).hexdigest()[:8], 16)
+        origin = self._epoch - timedelta(hours=seed % 30)
+        elapsed_hours = (datetime.now() - origin).total_seconds() / 3600
+        stage = min(len(TRACKING_STAGES) - 1, int(elapsed_hours // 6))
+
+        return [
+            {
+                "Status": TRACKING_STAGES[i],
+                "Activity_datetime": (origin + timedelta(hours=i * 6)).strftime("%Y-%m-%d %H:%M:%S"),
+                "Reason": "",
+            }
+            for i in range(stage + 1)
+        ]
+
+    def track_booked_packet(self, payload):
+        cns = _split_numbers(payload.get("track_numbers") or payload.get("track_number"))
+
+        packets = []
+        for cn in cns:
+            timeline = self._timeline(cn)
+            packets.append({
+                "track_number": cn,
+                "booked_packet_status": timeline[-1]["Status"],
+                "current_status": timeline[-1]["Status"],
+                "Tracking Detail": timeline,
+            })
+
+        return {"status": 1, "error": 0, "packet_list": packets}
+
+    def booked_packet_last_status(self, payload):
+        from_date = str(payload.get("from_date") or "")
+        to_date = str(payload.get("to_date") or "9999-12-31")
+
+        with self._lock:
+            booked = list(self._booked.items())
+
+        packets = []
+        for cn, info in booked:
+            booking_date = info["booked_at"].strftime("%Y-%m-%d")
+            if not (from_date <= booking_date <= to_date):
+                continue
+
+            packets.append({
+                "track_number": cn,
+                "booked_packet_order_id": info["order_id"],
+                "booking_date": booking_date,
+                "booked_packet_status": self._timeline(cn)[-1]["Status"],
+            })
+
+        return {"status": 1, "error": 0, "packet_list": packets}
+
+    def route(self, path):
+        return {
+            "/api/bookPacket/format/json/": self.book_packet,
+            "/api/getAllCities/format/json/": self.get_all_cities,
+            "/api/printCN/format/json/": self.print_cn,
+            "/api/trackBookedPacket/format/json/": self.track_booked_packet,
+            "/api/getBookedPacketLastStatus/format/json/": self.booked_packet_last_status,
+        }.get(path)
+
+
+def _split_numbers(value) -> list:
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value or "").split(",") if v.strip()]
+
+
+def _make_handler(sim):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code, body):
+            raw = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _payload(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+            if "json" in (self.headers.get("Content-Type") or ""):
+                return json.loads(raw or "{}")
+            return {k: v[0] for k, v in parse_qs(raw).items()}
+
+        def do_POST(self):
+            payload = self._payload()
+            sim.counters["requests"] += 1
+
+            handler = sim.route(self.path)
+            if not handler:
+                return self._send(404, {"status": 0, "error": "Unknown endpoint"})
+
+            sim._sleep()
+
+            if sim._rate_limited():
+                sim.counters["rate_limited"] += 1
+                return self._send(429, {"status": 0, "error": "Too many requests"})
+
+            if sim._failed():
+                sim.counters["errors"] += 1
+                return self._send(500, {"status": 0, "error": "Simulated failure"})
+
+            self._send(200, handler(payload))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
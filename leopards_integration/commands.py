@@ -0,0 +1,71 @@
+import json
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("leopards-simulator")
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", default=8765, type=int)
+@click.option("--latency-ms", default=50.0, type=float, help="Mean added latency per request")
+@click.option("--jitter-ms", default=20.0, type=float)
+@click.option("--error-rate", default=0.0, type=float, help="Share of requests answered with HTTP 500")
+@click.option("--rate-limit", default=0.0, type=float, help="Requests/sec before HTTP 429 (0 = unlimited)")
+@click.option("--cities", default=400, type=int)
+def leopards_simulator(host, port, latency_ms, jitter_ms, error_rate, rate_limit, cities):
+    """Run a local Leopards API stand-in (set it as Base URL on a test site)."""
+    from leopards_integration.benchmark.simulator import LeopardsSimulator, SimulatorConfig
+
+    sim = LeopardsSimulator(
+        SimulatorConfig(latency_ms, jitter_ms, error_rate, rate_limit, cities),
+        host=host,
+        port=port,
+    )
+    click.echo(f"Leopards simulator on http://{host}:{port}")
+    sim.serve_forever()
+
+
+@click.command("leopards-benchmark")
+@click.option("--scenario", "scenarios", multiple=True, type=click.Choice(["booking", "booking_writes", "tracking", "cities"]))
+@click.option("--count", default=500, type=int, help="Bookings / parcels per scenario")
+@click.option("--concurrency", default=4, type=int)
+@click.option("--rate", default=0.0, type=float, help="Booking token-bucket rate (0 = unthrottled)")
+@click.option("--burst", default=None, type=float)
+@click.option("--latency-ms", default=50.0, type=float)
+@click.option("--jitter-ms", default=20.0, type=float)
+@click.option("--error-rate", default=0.0, type=float)
+@click.option("--rate-limit", default=0.0, type=float)
+@click.option("--json", "as_json", is_flag=True, help="Print raw results as JSON")
+@pass_context
+def leopards_benchmark(
+    context, scenarios, count, concurrency, rate, burst,
+    latency_ms, jitter_ms, error_rate, rate_limit, as_json,
+):
+    """Benchmark booking, tracking sync and city sync against the local simulator."""
+    import frappe
+
+    from leopards_integration.benchmark.runner import SCENARIOS, format_report, run_benchmark
+    from leopards_integration.benchmark.simulator import SimulatorConfig
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+
+    try:
+        results = run_benchmark(
+            scenarios=scenarios or SCENARIOS,
+            count=count,
+            concurrency=concurrency,
+            rate=rate,
+            burst=burst,
+            simulator_config=SimulatorConfig(latency_ms, jitter_ms, error_rate, rate_limit),
+        )
+    finally:
+        frappe.destroy()
+
+    click.echo(json.dumps(results, indent=2, default=str) if as_json else format_report(results))
+
+
+commands = [
+    leopards_simulator,
+    leopards_benchmark,
+]
@@ -9,23 +9,34 @@ doctype_js = {
     "Delivery Note": "public/js/delivery_note.js"
 }
 
-scheduler_events = {
-    "hourly": [
-        "leopards_integration.services.tracking_sync.sync_all_active_shipments"
-    ]
-}
-
 app_include_js = [
     "/assets/leopards_integration/js/delivery_note_list.js",
 ]
 
 scheduler_events = {
     "cron": {
-        # Every 30 minutes – tracking sync
+        # Every 30 minutes - tracking sync (the only tracking entry point;
+        # fans out to shard workers, see scheduler.tracking_sync)
         "*/30 * * * *": [
             "leopards_integration.scheduler.tracking_sync.sync_leopards_tracking"
         ],
 
+        # Hourly - Leopards Metrics Summary, expired label bundles
+        "0 * * * *": [
+            "leopards_integration.api.metrics.refresh_metrics_summary",
+            "leopards_integration.services.label_bundle.cleanup_label_bundles",
+        ],
+
+        # Nightly - date-range status reconcile of every active parcel
+        "0 1 * * *": [
+            "leopards_integration.api.tracking_backfill.nightly_leopards_reconcile"
+        ],
+
+        # Daily - retire parcels with no status change in N days
+        "30 3 * * *": [
+            "leopards_integration.scheduler.cleanup.retire_stale_leopards_parcels"
+        ],
+
         # Monthly cleanup (safe)
         "0 2 1 * *": [
             "leopards_integration.scheduler.cleanup.cleanup_old_leopards_snapshots",
@@ -113,7 +124,8 @@ scheduler_events = {
 # ------------
 
 # before_install = "leopards_integration.install.before_install"
-# after_install = "leopards_integration.install.after_install"
+after_install = "leopards_integration.install.after_install"
+after_migrate = "leopards_integration.install.after_migrate"
 
 # Uninstallation
 # ------------
@@ -175,6 +187,17 @@ scheduler_events = {
 # 	}
 # }
 
+doc_events = {
+    "Leopards Settings": {
+        "on_update": "leopards_integration.utils.leopards_client.invalidate_settings_cache",
+    },
+    "Leopards City": {
+        "on_update": "leopards_integration.services.city_index.invalidate_city_index",
+        "on_trash": "leopards_integration.services.city_index.invalidate_city_index",
+        "after_rename": "leopards_integration.services.city_index.invalidate_city_index",
+    },
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -227,7 +250,7 @@ scheduler_events = {
 # Request Events
 # ----------------
 # before_request = ["leopards_integration.utils.before_request"]
-# after_request = ["leopards_integration.utils.after_request"]
+after_request = ["leopards_integration.utils.metrics.flush_metrics"]
 
 # Job Events
 # ----------
@@ -0,0 +1,313 @@
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+# =====================================================
+# CUSTOM FIELDS (idempotent - re-applied on every migrate)
+# =====================================================
+
+def get_custom_fields():
+    return {
+        "Leopards Settings": [
+            {
+                "fieldname": "leopards_performance_section",
+                "label": "Performance",
+                "fieldtype": "Section Break",
+                "collapsible": 1,
+            },
+            {
+                "fieldname": "http_pool_size",
+                "label": "HTTP Pool Size",
+                "fieldtype": "Int",
+                "default": "10",
+                "description": "Keep-alive connections per worker process.",
+                "insert_after": "leopards_performance_section",
+            },
+            {
+                "fieldname": "http_connect_timeout",
+                "label": "HTTP Connect Timeout (s)",
+                "fieldtype": "Float",
+                "default": "10",
+                "insert_after": "http_pool_size",
+            },
+            {
+                "fieldname": "http_read_timeout",
+                "label": "HTTP Read Timeout (s)",
+                "fieldtype": "Float",
+                "default": "30",
+                "insert_after": "http_connect_timeout",
+            },
+            {
+                "fieldname": "tracking_batch_size",
+                "label": "Tracking Batch Size",
+                "fieldtype": "Int",
+                "default": "50",
+                "description": "CNs sent per trackBookedPacket request.",
+                "insert_after": "http_read_timeout",
+            },
+            {
+                "fieldname": "tracking_concurrency",
+                "label": "Tracking Concurrency",
+                "fieldtype": "Int",
+                "default": "8",
+                "description": "trackBookedPacket requests in flight during sync. Keep at or below HTTP Pool Size.",
+                "insert_after": "tracking_batch_size",
+            },
+            {
+                "fieldname": "tracking_rate_limit",
+                "label": "Tracking Rate Limit (req/s)",
+                "fieldtype": "Float",
+                "default": "5",
+                "insert_after": "tracking_concurrency",
+            },
+            {
+                "fieldname": "tracking_sync_limit",
+                "label": "Tracking Sync Limit",
+                "fieldtype": "Int",
+                "default": "20000",
+                "description": "Maximum parcels polled per scheduler run.",
+                "insert_after": "tracking_rate_limit",
+            },
+            {
+                "fieldname": "tracking_commit_chunk",
+                "label": "Tracking Commit Chunk",
+                "fieldtype": "Int",
+                "default": "200",
+                "description": "Parcels written and committed per flush during tracking sync.",
+                "insert_after": "tracking_sync_limit",
+            },
+            {
+                "fieldname": "tracking_shards",
+                "label": "Tracking Shards",
+                "fieldtype": "Int",
+                "default": "1",
+                "description": "Hash partitions of the undelivered set; each is synced under its own lease.",
+                "insert_after": "tracking_commit_chunk",
+            },
+            {
+                "fieldname": "tracking_sync_workers",
+                "label": "Tracking Sync Workers",
+                "fieldtype": "Int",
+                "default": "1",
+                "description": "Background jobs that claim shards in parallel per sync run (long queue).",
+                "insert_after": "tracking_shards",
+            },
+            {
+                "fieldname": "stale_parcel_days",
+                "label": "Stale Parcel Days",
+                "fieldtype": "Int",
+                "default": "30",
+                "description": "Stop tracking parcels whose status has not changed for this many days. 0 disables.",
+                "insert_after": "tracking_sync_workers",
+            },
+            {
+                "fieldname": "status_stage_overrides",
+                "label": "Status Stage Overrides",
+                "fieldtype": "Small Text",
+                "description": (
+                    "One per line: Leopards status text or code = stage "
+                    "(booked, in_transit, out_for_delivery, exception, returning, "
+                    "delivered, returned, cancelled, lost)."
+                ),
+                "insert_after": "stale_parcel_days",
+            },
+            {
+                "fieldname": "reconcile_window_days",
+                "label": "Reconcile Window Days",
+                "fieldtype": "Int",
+                "default": "7",
+                "description": "Booking days per getBookedPacketLastStatus call in status reconciliation and backfill.",
+                "insert_after": "status_stage_overrides",
+            },
+            {
+                "fieldname": "booking_concurrency",
+                "label": "Bulk Booking Concurrency",
+                "fieldtype": "Int",
+                "default": "4",
+                "description": "Parallel booking threads per bulk job. Keep at or below HTTP Pool Size.",
+                "insert_after": "reconcile_window_days",
+            },
+            {
+                "fieldname": "booking_rate_limit",
+                "label": "Booking Rate Limit (req/s)",
+                "fieldtype": "Float",
+                "default": "2",
+                "insert_after": "booking_concurrency",
+            },
+            {
+                "fieldname": "booking_rate_burst",
+                "label": "Booking Rate Burst",
+                "fieldtype": "Int",
+                "default": "4",
+                "description": "Requests allowed back-to-back before the rate limit applies.",
+                "insert_after": "booking_rate_limit",
+            },
+            {
+                "fieldname": "booking_retry_attempts",
+                "label": "Booking Retry Attempts",
+                "fieldtype": "Int",
+                "default": "3",
+                "description": "Attempts per booking on timeouts / 5xx (with jittered backoff).",
+                "insert_after": "booking_rate_burst",
+            },
+            {
+                "fieldname": "single_write_booking",
+                "label": "Single-Write Booking",
+                "fieldtype": "Check",
+                "default": "0",
+                "description": "Save each shipment once, after the booking response (no Draft row while the API call is in flight).",
+                "insert_after": "booking_retry_attempts",
+            },
+            {
+                "fieldname": "print_batch_size",
+                "label": "Packing Slip Batch Size",
+                "fieldtype": "Int",
+                "default": "50",
+                "description": "CNs sent per printCN request by bulk packing-slip generation.",
+                "insert_after": "single_write_booking",
+            },
+            {
+                "fieldname": "circuit_failure_threshold",
+                "label": "Circuit Breaker Failure Threshold",
+                "fieldtype": "Int",
+                "default": "5",
+                "description": "Consecutive failures or slow calls before an endpoint fails fast.",
+                "insert_after": "print_batch_size",
+            },
+            {
+                "fieldname": "circuit_open_seconds",
+                "label": "Circuit Breaker Open (s)",
+                "fieldtype": "Int",
+                "default": "60",
+                "description": "Cool-down before a single probe request is let through.",
+                "insert_after": "circuit_failure_threshold",
+            },
+            {
+                "fieldname": "circuit_slow_call_ms",
+                "label": "Circuit Breaker Slow Call (ms)",
+                "fieldtype": "Int",
+                "default": "15000",
+                "description": "Responses slower than this count as failures.",
+                "insert_after": "circuit_open_seconds",
+            },
+        ],
+        "Leopards Shipment Tracking": [
+            {
+                "fieldname": "next_poll_at",
+                "label": "Next Poll At",
+                "fieldtype": "Datetime",
+                "read_only": 1,
+                "search_index": 1,
+                "insert_after": "is_delivered",
+            },
+            {
+                "fieldname": "unchanged_polls",
+                "label": "Unchanged Polls",
+                "fieldtype": "Int",
+                "read_only": 1,
+                "insert_after": "next_poll_at",
+            },
+            {
+                "fieldname": "last_event",
+                "label": "Last Event",
+                "fieldtype": "Data",
+                "read_only": 1,
+                "description": "Latest Leopards Tracking Event (may be archived).",
+                "insert_after": "unchanged_polls",
+            },
+            {
+                "fieldname": "last_event_status",
+                "label": "Last Event Status",
+                "fieldtype": "Data",
+                "read_only": 1,
+                "insert_after": "last_event",
+            },
+            {
+                "fieldname": "last_event_time",
+                "label": "Last Event Time",
+                "fieldtype": "Datetime",
+                "read_only": 1,
+                "insert_after": "last_event_status",
+            },
+            {
+                "fieldname": "last_scan",
+                "label": "Last Scan",
+                "fieldtype": "Data",
+                "read_only": 1,
+                "description": "Newest courier scan stored; only later scans are added.",
+                "insert_after": "last_event_time",
+            },
+            {
+                "fieldname": "last_scan_time",
+                "label": "Last Scan Time",
+                "fieldtype": "Datetime",
+                "read_only": 1,
+                "insert_after": "last_scan",
+            },
+            {
+                "fieldname": "tracking_stage",
+                "label": "Tracking Stage",
+                "fieldtype": "Data",
+                "read_only": 1,
+                "in_standard_filter": 1,
+                "insert_after": "last_scan_time",
+            },
+            {
+                "fieldname": "is_terminal",
+                "label": "Is Terminal",
+                "fieldtype": "Check",
+                "read_only": 1,
+                "search_index": 1,
+                "description": "Delivered, returned, cancelled, lost or stale - no longer polled.",
+                "insert_after": "tracking_stage",
+            },
+        ],
+        "Leopards Tracking Event": [
+            {
+                "fieldname": "reason",
+                "label": "Reason",
+                "fieldtype": "Small Text",
+                "read_only": 1,
+                "insert_after": "status_text",
+            },
+        ],
+    }
+
+
+def create_leopards_custom_fields():
+    create_custom_fields(get_custom_fields(), ignore_validate=True, update=True)
+
+
+# =====================================================
+# INDEXES (add_index is a no-op when already present)
+# =====================================================
+
+def get_indexes():
+    return {
+        "Leopards Shipment Tracking": [
+            ["delivery_note"],
+            # Date-range reconcile matches by CN
+            ["cn_number"],
+        ],
+        # Per-parcel timelines, and archive-then-purge by age
+        "Leopards Tracking Event": [
+            ["delivery_note", "event_time"],
+            ["cn_number", "event_time"],
+            ["event_time"],
+        ],
+    }
+
+
+def create_leopards_indexes():
+    for doctype, indexes in get_indexes().items():
+        for fields in indexes:
+            frappe.db.add_index(doctype, fields)
+
+
+def after_install():
+    create_leopards_custom_fields()
+    create_leopards_indexes()
+
+
+def after_migrate():
+    create_leopards_custom_fields()
+    create_leopards_indexes()
@@ -0,0 +1,22 @@
+frappe.ui.form.on("Leopards Metrics Summary", {
+    refresh(frm) {
+        frm.disable_save();
+
+        frm.add_custom_button("Refresh Now", () => {
+            frappe.call({
+                method: "leopards_integration.api.metrics.refresh_metrics_summary",
+                freeze: true,
+                callback: () => frm.reload_doc(),
+            });
+        });
+
+        frm.add_custom_button("Reset Counters", () => {
+            frappe.confirm("Clear all collected Leopards metrics?", () => {
+                frappe.call({
+                    method: "leopards_integration.api.metrics.reset",
+                    callback: () => frm.reload_doc(),
+                });
+            });
+        });
+    },
+});
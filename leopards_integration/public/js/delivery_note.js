@@ -15,7 +15,13 @@ frappe.ui.form.on("Delivery Note", {
           freeze: true,
           freeze_message: __("Booking shipment with Leopards..."),
         }).then((r) => {
-          if (r && r.message) {
+          if (r && r.message && r.message.status !== "Booked") {
+            frappe.msgprint({
+              title: __("Not Booked"),
+              message: r.message.message || r.message.status,
+              indicator: "orange",
+            });
+          } else if (r && r.message) {
             frappe.msgprint({
               title: __("Booked"),
               message: __("CN Number: {0}", [r.message.cn_number]),
@@ -60,5 +60,60 @@ frappe.listview_settings["Delivery Note"] = {
                 });
             }
         );
+
+        listview.page.add_menu_item(
+            __("Print Leopards Labels"),
+            () => {
+                const selected = listview.get_checked_items();
+
+                if (!selected || !selected.length) {
+                    frappe.msgprint(__("Please select Delivery Notes first."));
+                    return;
+                }
+
+                frappe.call({
+                    method: "leopards_integration.api.bulk_print.bulk_print_leopards_labels",
+                    args: {
+                        delivery_notes: selected.map(d => d.name),
+                        merge: 1
+                    },
+                    freeze: true,
+                    freeze_message: __("Preparing Leopards labels…"),
+                    callback: (r) => {
+                        const res = r.message || {};
+
+                        if (res.bundle_url) {
+                            window.open(res.bundle_url, "_blank");
+                        }
+
+                        const not_merged = res.unmerged || [];
+                        const skipped = res.skipped || [];
+
+                        if (!res.bundle_url || not_merged.length || skipped.length) {
+                            let html = "";
+
+                            if (not_merged.length) {
+                                html += "<h4>" + __("Open separately") + "</h4><ul>" +
+                                    not_merged.map(u => `<li><a href="${u}" target="_blank">${u}</a></li>`).join("") +
+                                    "</ul>";
+                            }
+
+                            if (skipped.length) {
+                                html += "<h4>" + __("No label") + "</h4><ul>" +
+                                    skipped.map(dn => `<li>${dn}</li>`).join("") +
+                                    "</ul>";
+                            }
+
+                            frappe.msgprint({
+                                title: __("Leopards Labels"),
+                                message: html || __("No printable labels."),
+                                indicator: "orange",
+                                wide: true
+                            });
+                        }
+                    }
+                });
+            }
+        );
     }
 };
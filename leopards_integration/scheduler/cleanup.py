@@ -1,45 +1,182 @@
+import gzip
+import json
+import os
+
 import frappe
+from frappe.utils import add_days, cint, now_datetime
+
+from leopards_integration.services.status_taxonomy import STALE
+from leopards_integration.utils import metrics
+from leopards_integration.utils.bulk import bulk_update
+from leopards_integration.utils.leopards_client import get_cached_settings
+
+# Rows archived + deleted per transaction; keeps locks short
+CLEANUP_CHUNK_SIZE = 5000
+
+ARCHIVE_FOLDER = "leopards_archive"
+
+DEFAULT_STALE_PARCEL_DAYS = 30
 
 
+@metrics.job_metrics("cleanup_snapshots")
 def cleanup_old_leopards_snapshots(days=30):
     """
-    Delete delivered Leopards Shipment Tracking records
-    older than N days (default: 30).
+    Delete finished (delivered or terminal) Leopards Shipment Tracking
+    records older than N days (default: 30).
 
     Safe:
     - Does NOT touch Delivery Notes
     - Does NOT touch tracking history
+    - Deletes in chunks, one commit each
     """
 
-    frappe.db.sql(
+    cutoff = add_days(now_datetime(), -int(days))
+
+    return _delete_in_chunks(
         """
-        DELETE FROM `tabLeopards Shipment Tracking`
-        WHERE is_delivered = 1
-          AND last_updated < DATE_SUB(NOW(), INTERVAL %s DAY)
+        SELECT name FROM `tabLeopards Shipment Tracking`
+        WHERE (is_delivered = 1 OR is_terminal = 1)
+          AND last_updated < %s
+        LIMIT %s
         """,
-        (int(days),),
+        "Leopards Shipment Tracking",
+        cutoff,
     )
 
-    frappe.db.commit()
+
+@metrics.job_metrics("stale_reaper")
+def retire_stale_leopards_parcels(days=None):
+    """
+    Stop tracking parcels whose status has not changed for N days
+    (Leopards Settings → Stale Parcel Days, default 30; 0 disables).
+
+    "Last change" is the snapshot's last_event_time, or its creation
+    when no event was ever recorded. Retired snapshots get
+    tracking_stage = "stale" and is_terminal = 1, which drops them from
+    the active set. Clear is_terminal to resume tracking a CN.
+
+    Safe:
+    - Does NOT touch Delivery Notes or tracking history
+    - Updates in chunks, one commit each
+    """
+
+    if days is None:
+        days = get_cached_settings().get("stale_parcel_days")
+        days = DEFAULT_STALE_PARCEL_DAYS if days in (None, "") else days
+
+    days = cint(days)
+    if days <= 0:
+        return {"retired": 0}
+
+    cutoff = add_days(now_datetime(), -days)
+    retired = 0
+
+    while True:
+        names = frappe.db.sql_list(
+            """
+            SELECT name FROM `tabLeopards Shipment Tracking`
+            WHERE is_delivered = 0
+              AND is_terminal = 0
+              AND COALESCE(last_event_time, creation) < %s
+            LIMIT %s
+            """,
+            (cutoff, CLEANUP_CHUNK_SIZE),
+        )
+        if not names:
+            break
+
+        bulk_update(
+            "Leopards Shipment Tracking",
+            {name: {"tracking_stage": STALE, "is_terminal": 1, "next_poll_at": None} for name in names},
+        )
+        frappe.db.commit()
+        retired += len(names)
+
+    return {"retired": retired}
 
 
+@metrics.job_metrics("cleanup_history")
 def cleanup_old_leopards_tracking_history(days=30):
     """
-    Delete Leopards Tracking Event records
+    Archive, then delete, Leopards Tracking Event records
     older than N days (default: 30).
 
     Safe:
-    - Does NOT touch snapshots
+    - Does NOT touch snapshots (their last_event_* fields keep the
+      latest status even once the event itself is archived)
     - Does NOT touch Delivery Notes
     - History-only cleanup
+
+    Rows are taken oldest first, CLEANUP_CHUNK_SIZE at a time (event_time
+    index), appended to a gzipped JSON-lines file under
+    private/files/leopards_archive/ and only then deleted and committed.
+    An interrupted run may archive a chunk twice; it never deletes
+    anything that was not archived.
     """
 
+    cutoff = add_days(now_datetime(), -int(days))
+    path = archive_path("tracking_events")
+    archived = 0
+
+    with gzip.open(path, "at", encoding="utf-8") as archive:
+        while True:
+            rows = frappe.db.sql(
+                """
+                SELECT * FROM `tabLeopards Tracking Event`
+                WHERE event_time < %s
+                ORDER BY event_time ASC
+                LIMIT %s
+                """,
+                (cutoff, CLEANUP_CHUNK_SIZE),
+                as_dict=True,
+            )
+            if not rows:
+                break
+
+            for row in rows:
+                archive.write(json.dumps(row, default=str, separators=(",", ":")) + "\n")
+
+            # Durable archive before the delete is committed
+            archive.flush()
+            os.fsync(archive.fileno())
+
+            _delete_names("Leopards Tracking Event", [r.name for r in rows])
+            frappe.db.commit()
+            archived += len(rows)
+
+    if not archived:
+        os.remove(path)
+        return {"archived": 0, "archive": None}
+
+    return {"archived": archived, "archive": os.path.relpath(path, frappe.get_site_path())}
+
+
+def archive_path(prefix) -> str:
+    folder = frappe.get_site_path("private", "files", ARCHIVE_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+
+    stamp = now_datetime().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(folder, f"{prefix}-{stamp}.jsonl.gz")
+
+
+def _delete_in_chunks(select_sql, doctype, cutoff) -> dict:
+    deleted = 0
+
+    while True:
+        names = frappe.db.sql_list(select_sql, (cutoff, CLEANUP_CHUNK_SIZE))
+        if not names:
+            break
+
+        _delete_names(doctype, names)
+        frappe.db.commit()
+        deleted += len(names)
+
+    return {"deleted": deleted}
+
+
+def _delete_names(doctype, names):
+    placeholders = ", ".join(["%s"] * len(names))
     frappe.db.sql(
-        """
-        DELETE FROM `tabLeopards Tracking Event`
-        WHERE event_time < DATE_SUB(NOW(), INTERVAL %s DAY)
-        """,
-        (int(days),),
+        f"DELETE FROM `tab{doctype}` WHERE name IN ({placeholders})",
+        tuple(names),
     )
-
-    frappe.db.commit()
\ No newline at end of file
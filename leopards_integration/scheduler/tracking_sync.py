@@ -1,58 +1,187 @@
+import random
+import time
+
 import frappe
-from frappe.utils import now_datetime
-from leopards_integration.api.tracking import (
-    fetch_leopards_tracking,
-    _is_delivered,
-)
+from frappe.utils import cint
+from leopards_integration.services.tracking_engine import sync_due_tracking
+from leopards_integration.utils import metrics
+from leopards_integration.utils.lease import get_lease, lease_holder, site_key
+from leopards_integration.utils.leopards_client import get_cached_settings
+
+
+DEFAULT_SYNC_LIMIT = 20000
+
+# Cron interval of sync_leopards_tracking (hooks.py: */30)
+SYNC_SLOT_SECONDS = 30 * 60
+
+# Leave headroom inside the 30-minute cron window
+RUN_BUDGET_SECONDS = 25 * 60
+
+DEFAULT_TRACKING_SHARDS = 1
+DEFAULT_SYNC_WORKERS = 1
+
+# A dead worker's shard is free again after this long without heartbeats
+SHARD_LEASE_SECONDS = 120
+
+# How often idle workers look for shards whose holder died
+SHARD_RECHECK_SECONDS = 15
+
+
+def get_tracking_sync_limit(settings=None) -> int:
+    settings = settings or get_cached_settings()
+    return cint(settings.get("tracking_sync_limit")) or DEFAULT_SYNC_LIMIT
+
+
+def get_tracking_sharding(settings=None) -> tuple:
+    """
+    (shards, workers) from Leopards Settings.
+    """
+    settings = settings or get_cached_settings()
+    shards = cint(settings.get("tracking_shards")) or DEFAULT_TRACKING_SHARDS
+    workers = cint(settings.get("tracking_sync_workers")) or DEFAULT_SYNC_WORKERS
+    return max(1, shards), max(1, min(workers, shards))
+
+
+def sync_leopards_tracking(limit=None):
+    """
+    Scheduler entry (every 30 min).
+
+    Only enqueues `Tracking Sync Workers` shard workers on the long queue
+    and returns, so the default queue is never held for the run budget.
+    Every worker claims free shards under a heartbeat lease (see
+    sync_tracking_shards), so runs never overlap on a shard, even if a
+    run outlasts the cron interval.
+    """
+    _shards, workers = get_tracking_sharding()
+    slot = current_sync_slot()
+
+    for i in range(workers):
+        frappe.enqueue(
+            "leopards_integration.scheduler.tracking_sync.sync_tracking_shards",
+            queue="long",
+            timeout=RUN_BUDGET_SECONDS + 5 * 60,
+            job_id=f"leopards_tracking_sync_worker:{i}",
+            deduplicate=True,
+            limit=limit,
+            slot=slot,
+        )
+
+
+def current_sync_slot() -> int:
+    """
+    Number of the 30-minute cron slot we are in.
+    """
+    return int(time.time() // SYNC_SLOT_SECONDS)
 
 
-def sync_leopards_tracking(limit=50):
+def shard_lease_name(shard) -> str:
+    return f"leopards_integration:tracking_sync:shard:{shard}"
+
+
+def shard_done_name(slot, shard) -> str:
+    return f"leopards_integration:tracking_sync:shard_done:{slot}:{shard}"
+
+
+@metrics.job_metrics("tracking_sync")
+def sync_tracking_shards(limit=None, slot=None):
     """
-    Scheduler-safe tracking sync.
+    Claim and sync free shards until every shard has been synced in this
+    cron slot or the run budget is spent.
+
+    - Shard lease: Redis SET NX + heartbeat (utils.lease); only one worker
+      on any node syncs a shard at a time
+    - A synced shard is marked done for its cron slot only (the slot the
+      run was enqueued in), so the next run always starts with every
+      shard pending
+    - Shards held by another worker are re-checked every
+      SHARD_RECHECK_SECONDS; when the holder dies its lease expires and
+      the shard is handed off to whichever worker claims it first
+    """
+    shards, _workers = get_tracking_sharding()
+    slot = current_sync_slot() if slot is None else slot
+    per_shard = max(1, (limit or get_tracking_sync_limit()) // shards)
+    deadline = time.monotonic() + RUN_BUDGET_SECONDS
+    cache = frappe.cache()
+
+    totals = {"shards": [], "polled": 0, "skipped": 0, "written": 0, "failed": 0}
+
+    # Random start spreads workers over different shards
+    offset = random.randrange(shards)
+    order = [(offset + i) % shards for i in range(shards)]
+
+    while time.monotonic() < deadline:
+        pending = [s for s in order if not cache.get(site_key(shard_done_name(slot, s)))]
+        if not pending:
+            break
+
+        claimed = False
+        for shard in pending:
+            lease = get_lease(shard_lease_name(shard), SHARD_LEASE_SECONDS)
+            if not lease.acquire():
+                continue
+
+            claimed = True
+            with lease:
+                stats = sync_tracking_shard(shard, shards, per_shard, deadline, lease.lost)
+
+                if not lease.lost.is_set():
+                    cache.set(
+                        site_key(shard_done_name(slot, shard)), 1, ex=2 * SYNC_SLOT_SECONDS
+                    )
+
+            totals["shards"].append(shard)
+            for key in ("polled", "skipped", "written", "failed"):
+                totals[key] += stats[key]
+
+        if not claimed:
+            # Everything left is held by live workers (or by dead ones
+            # whose lease has not expired yet)
+            time.sleep(SHARD_RECHECK_SECONDS)
+
+    return totals
+
+
+def sync_tracking_shard(shard, shards, limit, deadline, stop=None):
+    """
+    Tracking sync of one shard through the tracking engine.
 
     Rules:
     - Only sync undelivered shipments
     - Stop forever once delivered
     - Never fail due to API instability
+    - Many CNs per trackBookedPacket call (Tracking Batch Size)
+    - Only rows that are due (next_poll_at), most overdue first;
+      unchanged results back off (see services.poll_schedule)
+    - Batches are tracked concurrently under a concurrency cap and a
+      global rate limit (see services.async_tracking)
+    - Writes are buffered and committed per chunk (see TrackingWriter)
+    - Once `stop` is set (lease lost) no new batches start and no more
+      results are written; those rows stay due
     """
+    return sync_due_tracking(limit, shard, shards, deadline, stop)
 
-    rows = frappe.get_all(
-        "Leopards Shipment Tracking",
-        filters={"is_delivered": 0},
-        fields=["name", "delivery_note", "cn_number"],
-        limit=int(limit),
-    )
-
-    for row in rows:
-        try:
-            status = fetch_leopards_tracking(row.cn_number)
-        except Exception:
-            # Best-effort only
-            continue
 
-        delivered = _is_delivered(status)
+@frappe.whitelist()
+def get_tracking_shard_status():
+    """
+    Holder (host:pid) and done flag (current cron slot) of every tracking
+    shard on this site.
+    """
+    frappe.only_for("System Manager")
 
-        # Update tracking row
-        frappe.db.set_value(
-            "Leopards Shipment Tracking",
-            row.name,
-            {
-                "current_status": status,
-                "last_updated": now_datetime(),
-                "is_delivered": delivered,
-            },
-        )
+    shards, workers = get_tracking_sharding()
+    slot = current_sync_slot()
+    cache = frappe.cache()
 
-        # OPTIONAL summary back to DN (safe, no booking_status change)
-        frappe.db.set_value(
-            "Delivery Note",
-            row.delivery_note,
+    return {
+        "shards": shards,
+        "workers": workers,
+        "status": [
             {
-                "custom_leopards_last_tracking_status": status,
-                "custom_leopards_delivered_on": now_datetime()
-                if delivered else None,
-            },
-            update_modified=False,
-        )
-
-    frappe.db.commit()
\ No newline at end of file
+                "shard": shard,
+                "holder": (lease_holder(shard_lease_name(shard)) or "").rsplit(":", 1)[0] or None,
+                "done": bool(cache.get(site_key(shard_done_name(slot, shard)))),
+            }
+            for shard in range(shards)
+        ],
+    }
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from leopards_integration.api.tracking import get_tracking_request, post_tracking_request
+from leopards_integration.utils import metrics
+from leopards_integration.utils.circuit_breaker import CircuitOpenError
+from leopards_integration.utils.leopards_client import get_cached_settings
+from leopards_integration.utils.rate_limiter import AsyncTokenBucket
+
+DEFAULT_TRACKING_CONCURRENCY = 8
+DEFAULT_TRACKING_RATE = 5.0
+
+
+def get_tracking_limits(settings=None) -> tuple:
+    """
+    (concurrency, requests/sec) from Leopards Settings.
+    """
+    settings = settings or get_cached_settings()
+
+    def _num(fieldname, default, cast):
+        try:
+            value = cast(settings.get(fieldname) or 0)
+        except (TypeError, ValueError):
+            value = 0
+        return value if value > 0 else default
+
+    return (
+        _num("tracking_concurrency", DEFAULT_TRACKING_CONCURRENCY, int),
+        _num("tracking_rate_limit", DEFAULT_TRACKING_RATE, float),
+    )
+
+
+async def _track_batches(batches, request, concurrency, rate, deadline=None, stop=None):
+    """
+    Async generator of (batch, packets, error) in completion order.
+
+    - At most `concurrency` trackBookedPacket calls in flight
+    - Global token bucket at `rate` requests/sec
+    - Blocking HTTP runs on an executor over the shared keep-alive pool
+    - Batches not started before `deadline` (or once `stop` is set)
+      come back with TimeoutError
+    - While the circuit is open, batches fail fast with CircuitOpenError
+    """
+    loop = asyncio.get_running_loop()
+    breaker = request[4]
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = AsyncTokenBucket(rate, burst=concurrency)
+
+    with ThreadPoolExecutor(
+        max_workers=concurrency,
+        thread_name_prefix="leopards-track",
+        initializer=metrics.bind_site,
+        initargs=(metrics.current_site(),),
+    ) as executor:
+
+        async def _one(batch):
+            async with semaphore:
+                if deadline and time.monotonic() >= deadline:
+                    return batch, None, TimeoutError("Tracking run deadline reached")
+                if stop and stop.is_set():
+                    return batch, None, TimeoutError("Tracking run stopped")
+
+                # Open circuit → fail fast without spending a rate-limit token
+                if breaker and breaker.state() == "open":
+                    return batch, None, CircuitOpenError("trackBookedPacket circuit open")
+
+                waited = await limiter.acquire()
+                metrics.observe("leopards_rate_limit_wait_seconds", waited, buckets=metrics.RATE_WAIT_BUCKETS_S, limiter="tracking")
+
+                try:
+                    packets = await loop.run_in_executor(executor, post_tracking_request, request, batch)
+                    return batch, packets, None
+                except Exception as e:
+                    return batch, None, e
+
+        for future in asyncio.as_completed([_one(b) for b in batches]):
+            yield await future
+
+
+def track_batches(batches, on_result, settings=None, deadline=None, stop=None):
+    """
+    Track every batch of CNs concurrently.
+
+    on_result(batch, packets, error) is called on the CALLING thread as
+    each request completes, so it can use frappe.db / writers directly.
+    Credentials and URL are resolved here before any thread starts.
+    """
+    batches = [b for b in batches if b]
+    if not batches:
+        return
+
+    request = get_tracking_request(settings)
+    concurrency, rate = get_tracking_limits(settings)
+
+    async def _run():
+        async for batch, packets, error in _track_batches(
+            batches, request, concurrency, rate, deadline, stop
+        ):
+            on_result(batch, packets, error)
+
+    asyncio.run(_run())
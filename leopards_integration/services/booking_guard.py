@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import add_days, cint, getdate, nowdate
+
+from leopards_integration.utils.leopards_client import (
+    LeopardsAPIError,
+    LeopardsTransientError,
+    book_packet,
+    get_booked_packets_last_status,
+    get_cached_settings,
+)
+from leopards_integration.utils.retry import DEFAULT_ATTEMPTS, retry_call
+
+# Long enough to cover every retry of one booking
+BOOKING_LOCK_SECONDS = 300
+
+# Oldest booking date searched for an earlier booking of a Delivery Note
+REMOTE_LOOKUP_MAX_DAYS = 30
+
+
+# =====================================================
+# BOOKING KEY (one booking in flight per Delivery Note)
+# =====================================================
+
+def booking_key(delivery_note) -> str:
+    return f"leopards_integration:booking:{delivery_note}"
+
+
+@contextmanager
+def booking_lock(delivery_note):
+    """
+    Redis SET NX on the Delivery Note's booking key: a second booking of
+    the same DN (double click, bulk + manual) is refused while one runs.
+    """
+    cache = frappe.cache()
+    key = cache.make_key(booking_key(delivery_note))
+    token = frappe.generate_hash(length=12)
+
+    if not cache.set(key, token, nx=True, ex=BOOKING_LOCK_SECONDS):
+        raise LeopardsAPIError(f"Leopards booking for {delivery_note} is already in progress")
+
+    try:
+        yield
+    finally:
+        current = cache.get(key)
+        if current and current.decode() == token:
+            cache.delete(key)
+
+
+# =====================================================
+# EXISTING BOOKINGS (local first, then Leopards)
+# =====================================================
+
+def find_booked_shipment(delivery_note):
+    return frappe.db.get_value(
+        "Leopards Shipment",
+        {
+            "delivery_note": delivery_note,
+            "booking_status": "Booked",
+            "cn_number": ["is", "set"],
+        },
+        ["name", "cn_number", "slip_link"],
+        as_dict=True,
+    )
+
+
+def last_failed_booking(delivery_note):
+    """
+    Creation time of the most recent Failed shipment of the DN that was
+    sent to Leopards (request_payload set just before bookPacket), or None.
+    Failures before the call (invalid address, build errors) cannot hide
+    a booking. Earlier attempts were already checked by the attempt after
+    them.
+    """
+    return frappe.db.sql(
+        """
+        SELECT MAX(creation) FROM `tabLeopards Shipment`
+        WHERE delivery_note = %s AND booking_status = 'Failed'
+          AND IFNULL(request_payload, '') != ''
+        """,
+        delivery_note,
+    )[0][0]
+
+
+def find_remote_booking(order_id, since=None):
+    """
+    Packet Leopards already booked for `booked_packet_order_id`, shaped
+    like a bookPacket response; None if absent.
+
+    Searches bookings from `since` (e.g. the last failed attempt) - at
+    least yesterday, at most REMOTE_LOOKUP_MAX_DAYS back - up to today.
+    Raises LeopardsAPIError when Leopards cannot be asked.
+    """
+    today = getdate(nowdate())
+    start = getdate(add_days(today, -1))
+    if since:
+        start = max(
+            min(start, getdate(since)),
+            getdate(add_days(today, -REMOTE_LOOKUP_MAX_DAYS)),
+        )
+
+    for packet in get_booked_packets_last_status(start, today):
+        if str(packet.get("booked_packet_order_id") or "").strip() != order_id:
+            continue
+
+        if packet.get("track_number"):
+            return {
+                "status": 1,
+                "track_number": packet.get("track_number"),
+                "slip_link": packet.get("slip_link") or "",
+                "recovered": 1,
+            }
+
+    return None
+
+
+# =====================================================
+# RETRYING BOOK CALL
+# =====================================================
+
+def get_booking_retry_attempts(settings=None) -> int:
+    settings = settings or get_cached_settings()
+    return cint(settings.get("booking_retry_attempts")) or DEFAULT_ATTEMPTS
+
+
+def book_packet_idempotent(payload: dict, limiter=None) -> dict:
+    """
+    bookPacket with jittered exponential backoff on transient errors.
+    With a `limiter` (bulk booking), every attempt takes a token.
+
+    A timeout / 5xx may hide a booking that succeeded, so before every
+    retry Leopards is asked for a packet with the same
+    booked_packet_order_id; if one exists it is adopted instead of booking
+    again. If that lookup itself fails, the original error is raised
+    rather than risking a duplicate CN.
+    """
+    order_id = str(payload.get("booked_packet_order_id") or "").strip()
+
+    def _before_retry(attempt, error):
+        try:
+            return find_remote_booking(order_id)
+        except Exception:
+            raise error
+
+    return retry_call(
+        lambda: book_packet(payload),
+        attempts=get_booking_retry_attempts(),
+        retry_on=(LeopardsTransientError,),
+        before_retry=_before_retry,
+        name="bookPacket",
+        limiter=limiter,
+    )
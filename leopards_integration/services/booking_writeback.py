@@ -0,0 +1,44 @@
+import frappe
+from frappe.utils import get_fullname
+
+from leopards_integration.utils.bulk import bulk_insert_docs, bulk_update
+
+
+def write_back_bookings(bookings) -> int:
+    """
+    Stamp booking results onto Delivery Notes without loading or saving them.
+
+    `bookings` is a list of dicts with delivery_note, cn_number and slip_link.
+    The four custom_leopards_* fields are set with one CASE UPDATE per chunk
+    (no reload, validation or Version diff), and the audit trail is one
+    Info comment per Delivery Note, inserted in bulk.
+    """
+    bookings = [b for b in bookings if b.get("delivery_note") and b.get("cn_number")]
+    if not bookings:
+        return 0
+
+    bulk_update("Delivery Note", {
+        b["delivery_note"]: {
+            "custom_leopards_consignment_number": b["cn_number"],
+            "custom_leopards_slip_link": b.get("slip_link") or "",
+            "custom_leopards_booking_status": "Booked",
+            "custom_leopards_last_tracking_status": "Booked",
+        }
+        for b in bookings
+    })
+
+    user = frappe.session.user
+
+    bulk_insert_docs("Comment", [
+        {
+            "comment_type": "Info",
+            "reference_doctype": "Delivery Note",
+            "reference_name": b["delivery_note"],
+            "comment_email": user,
+            "comment_by": get_fullname(user),
+            "content": f"Booked with Leopards - CN {b['cn_number']}",
+        }
+        for b in bookings
+    ])
+
+    return len(bookings)
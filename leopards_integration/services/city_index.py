@@ -0,0 +1,66 @@
+import frappe
+from frappe.utils import cint
+
+from leopards_integration.utils.cache import VersionedCache
+
+# =====================================================
+# LEOPARDS CITY INDEX (process-level, Redis-versioned)
+# =====================================================
+
+def normalize_city_name(value) -> str:
+    """
+    Case- and whitespace-insensitive key: "  dera  Ghazi khan " → "dera ghazi khan"
+    """
+    return " ".join(str(value or "").split()).casefold()
+
+
+def _load_city_index():
+    rows = frappe.get_all(
+        "Leopards City",
+        fields=[
+            "name",
+            "city_name",
+            "allow_as_origin",
+            "allow_as_destination",
+            "is_active",
+        ],
+        limit_page_length=0,
+    )
+
+    by_id = {}
+    by_name = {}
+
+    for r in rows:
+        city = frappe._dict(
+            name=r.name,
+            city_name=r.city_name,
+            allow_as_origin=cint(r.allow_as_origin),
+            allow_as_destination=cint(r.allow_as_destination),
+            is_active=cint(r.is_active),
+        )
+
+        by_id[r.name] = city
+
+        # Name lookups only ever matched active cities
+        if city.is_active:
+            by_name.setdefault(normalize_city_name(r.city_name), city)
+
+    return frappe._dict(by_id=by_id, by_name=by_name)
+
+
+_city_index = VersionedCache("city_index", _load_city_index)
+
+
+def get_city_index():
+    """
+    {by_id: {city_id: city}, by_name: {normalized name: city}}
+    """
+    return _city_index.get()
+
+
+def invalidate_city_index(doc=None, method=None, *args):
+    """
+    doc_events hook: Leopards City → on_update / on_trash / after_rename.
+    Also called by sync_leopards_cities before it commits.
+    """
+    _city_index.invalidate()
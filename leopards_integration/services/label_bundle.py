@@ -0,0 +1,156 @@
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+
+from leopards_integration.utils import metrics
+from leopards_integration.utils.leopards_client import get_cached_settings, get_http_client
+
+LABEL_DIR = ("private", "files", "leopards_labels")
+DOWNLOAD_WORKERS = 8
+
+# Bundles older than this are rebuilt on the next print and removed by
+# cleanup_label_bundles
+BUNDLE_TTL_SECONDS = 24 * 3600
+
+
+# =====================================================
+# MERGED LABEL BUNDLE (cached on disk by CN set)
+# =====================================================
+
+def bundle_key(cns) -> str:
+    """
+    Same set of CNs (any order) → same bundle.
+    """
+    return hashlib.sha1("|".join(sorted(set(cns))).encode()).hexdigest()
+
+
+def bundle_path(key: str) -> str:
+    if not key or not key.isalnum():
+        frappe.throw("Invalid label bundle key")
+    return frappe.get_site_path(*LABEL_DIR, f"{key}.pdf")
+
+
+def bundle_meta_path(key: str) -> str:
+    return bundle_path(key)[:-len(".pdf")] + ".json"
+
+
+def read_bundle_meta(key: str):
+    """
+    {delivery_notes, merged, unmerged} stored next to a live bundle;
+    None when the bundle is missing or expired.
+    """
+    path = bundle_path(key)
+
+    try:
+        if time.time() - os.path.getmtime(path) > BUNDLE_TTL_SECONDS:
+            return None
+        with open(bundle_meta_path(key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def cleanup_label_bundles():
+    """
+    Delete bundles (and their metadata) older than BUNDLE_TTL_SECONDS.
+    """
+    folder = frappe.get_site_path(*LABEL_DIR)
+    if not os.path.isdir(folder):
+        return {"deleted": 0}
+
+    cutoff = time.time() - BUNDLE_TTL_SECONDS
+    deleted = 0
+
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            deleted += 1
+
+    return {"deleted": deleted}
+
+
+def _download(client, url):
+    """
+    (url, pdf bytes | None) - runs on download threads, no frappe access.
+    """
+    try:
+        resp = client.get("slip", url)
+    except Exception:
+        return url, None
+
+    content = resp.content or b""
+    if resp.status_code != 200 or not content.startswith(b"%PDF"):
+        return url, None
+
+    return url, content
+
+
+def build_label_bundle(labels) -> dict:
+    """
+    Merge label PDFs into ONE printable file.
+
+    labels: [{"dn": ..., "cn": ..., "url": ...}] in print order.
+    Returns {key, merged, unmerged: [urls that were not PDFs / failed]}.
+
+    A live bundle for the same CN set is reused only if it was complete;
+    one with unmerged labels is rebuilt, so the missing slips are tried
+    again. The Delivery Notes it covers are stored next to it for the
+    download permission check.
+    """
+    from pypdf import PdfWriter
+
+    key = bundle_key([row["cn"] or row["url"] for row in labels])
+    path = bundle_path(key)
+
+    meta = read_bundle_meta(key)
+    if meta and not meta["unmerged"]:
+        return {"key": key, "merged": meta["merged"], "unmerged": [], "cached": 1}
+
+    client = get_http_client(get_cached_settings())
+
+    with ThreadPoolExecutor(
+        max_workers=DOWNLOAD_WORKERS,
+        initializer=metrics.bind_site,
+        initargs=(metrics.current_site(),),
+    ) as pool:
+        downloaded = dict(pool.map(lambda row: _download(client, row["url"]), labels))
+
+    writer = PdfWriter()
+    merged = 0
+    unmerged = []
+
+    for row in labels:
+        content = downloaded.get(row["url"])
+        if not content:
+            unmerged.append(row["url"])
+            continue
+
+        writer.append(io.BytesIO(content))
+        merged += 1
+
+    if merged:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        _write_atomic(bundle_meta_path(key), json.dumps({
+            "delivery_notes": sorted({row["dn"] for row in labels}),
+            "merged": merged,
+            "unmerged": unmerged,
+        }).encode())
+
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        _write_atomic(path, buffer.getvalue())
+
+    return {"key": key if merged else None, "merged": merged, "unmerged": unmerged, "cached": 0}
+
+
+def _write_atomic(path, content: bytes):
+    tmp_path = f"{path}.{frappe.generate_hash(length=6)}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from frappe.utils import get_datetime, now_datetime
+
+from leopards_integration.services.status_taxonomy import classify_status
+
+# =====================================================
+# ADAPTIVE POLL SCHEDULE
+# =====================================================
+
+# Base interval (minutes) per tracking stage: poll where status moves fastest
+STAGE_POLL_MINUTES = {
+    "out_for_delivery": 30,
+    "exception": 30,
+    "returning": 240,
+    "in_transit": 120,
+    "booked": 240,
+    "unknown": 60,
+}
+
+MAX_POLL_MINUTES = 24 * 60
+MAX_BACKOFF_STEPS = 4
+
+
+def classify_poll_stage(status_text) -> str:
+    """
+    Taxonomy stage (see status_taxonomy), or "unknown" for stages that
+    are not polled.
+    """
+    stage = classify_status(status_text)
+    return stage if stage in STAGE_POLL_MINUTES else "unknown"
+
+
+def _age_factor(created, now) -> int:
+    if not created:
+        return 1
+
+    age_days = (now - get_datetime(created)).days
+    if age_days > 14:
+        return 4
+    if age_days > 7:
+        return 2
+    return 1
+
+
+def compute_next_poll_at(status_text, unchanged_polls=0, created=None, now=None):
+    """
+    next_poll_at = now + stage interval x age factor x 2^unchanged polls
+
+    - Stage: out for delivery polls most often, freshly booked least
+    - Age: parcels older than 7 / 14 days slow down x2 / x4
+    - Backoff: each poll without a status change doubles the interval
+      (up to 2^MAX_BACKOFF_STEPS), capped at MAX_POLL_MINUTES
+    """
+    now = now or now_datetime()
+
+    minutes = STAGE_POLL_MINUTES[classify_poll_stage(status_text)]
+    minutes *= _age_factor(created, now)
+    minutes *= 2 ** min(int(unchanged_polls or 0), MAX_BACKOFF_STEPS)
+
+    return now + timedelta(minutes=min(minutes, MAX_POLL_MINUTES))
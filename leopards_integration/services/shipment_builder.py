@@ -1,14 +1,57 @@
 import json
+
 import frappe
 from frappe.utils import flt
 
+from leopards_integration.services.city_index import (
+    get_city_index,
+    normalize_city_name,
+)
+from leopards_integration.utils.leopards_client import get_cached_settings
 
 # =====================================================
 # SETTINGS
 # =====================================================
 
 def get_leopards_settings():
-    return frappe.get_single("Leopards Settings")
+    return get_cached_settings()
+
+
+def is_single_write_booking(settings=None) -> bool:
+    settings = settings or get_leopards_settings()
+    return bool(int(settings.get("single_write_booking") or 0))
+
+
+def compact_json(value) -> str:
+    """
+    JSON for request/response payload fields - no indentation or spaces.
+    """
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def persist_shipment(shipment):
+    if shipment.is_new():
+        shipment.insert(ignore_permissions=True)
+    else:
+        shipment.save(ignore_permissions=True)
+
+
+def record_failed_booking(delivery_note, error, shipment=None):
+    """
+    Persist a Failed Leopards Shipment as the Delivery Note's failure
+    trace. Without a shipment (bulk build failed) a minimal one carrying
+    only the Delivery Note and the error is saved. Only shipments with a
+    request_payload were sent to Leopards (see last_failed_booking).
+    """
+    if not shipment:
+        shipment = frappe.new_doc("Leopards Shipment")
+        shipment.delivery_note = delivery_note
+        shipment.flags.ignore_mandatory = True
+
+    shipment.booking_status = "Failed"
+    shipment.last_error = str(error)[:240]
+    persist_shipment(shipment)
+    return shipment
 
 
 # =====================================================
@@ -53,15 +96,18 @@ def compose_address(addr):
     return ", ".join([p for p in parts if p])
 
 
-def get_phone(addr, dn):
+def get_phone(addr, dn, customer=None):
     if addr.phone:
         return addr.phone.strip()
 
+    if customer is not None:
+        return (customer.get("mobile_no") or "").strip()
+
     return (frappe.db.get_value("Customer", dn.customer, "mobile_no") or "").strip()
 
 
 # =====================================================
-# WEIGHT RESOLUTION (GRAMS ONLY – NO CONVERSION)
+# WEIGHT RESOLUTION (GRAMS ONLY - NO CONVERSION)
 # =====================================================
 
 def resolve_shipment_weight_grams(dn):
@@ -77,7 +123,7 @@ def resolve_shipment_weight_grams(dn):
 
     # 1️⃣ DN-level weight (grams)
     if dn.get("total_net_weight"):
-        w = int(round(float(dn.total_net_weight)))
+        w = round(float(dn.total_net_weight))
         if w > 0:
             return w
 
@@ -88,7 +134,7 @@ def resolve_shipment_weight_grams(dn):
         q = float(item.get("qty") or 0)
         total += w * q
 
-    total = int(round(total))
+    total = round(total)
     if total > 0:
         return total
 
@@ -103,42 +149,38 @@ def resolve_shipment_weight_grams(dn):
 # =====================================================
 
 def resolve_leopards_city_id(city_value: str, for_origin=False) -> str:
+    """
+    Resolve a Leopards City ID by ID or by (normalized) city name.
+    Pure dict lookup against the cached city index.
+    """
     if not city_value:
         frappe.throw("City is missing.")
 
     city_value = str(city_value).strip()
+    index = get_city_index()
 
-    if frappe.db.exists("Leopards City", city_value):
-        doc = frappe.get_doc("Leopards City", city_value)
-        if for_origin and not doc.allow_as_origin:
-            frappe.throw(f"{doc.city_name} not allowed as origin")
-        if not for_origin and not doc.allow_as_destination:
-            frappe.throw(f"{doc.city_name} not allowed as destination")
-        return doc.name
-
-    row = frappe.db.get_value(
-        "Leopards City",
-        {"city_name": city_value, "is_active": 1},
-        ["name", "allow_as_origin", "allow_as_destination"],
-        as_dict=True,
-    )
+    city = index.by_id.get(city_value)
+    label = city.city_name if city else city_value
 
-    if not row:
+    if not city:
+        city = index.by_name.get(normalize_city_name(city_value))
+
+    if not city:
         frappe.throw(f"City '{city_value}' not mapped for Leopards")
 
-    if for_origin and not row.allow_as_origin:
-        frappe.throw(f"{city_value} not allowed as origin")
-    if not for_origin and not row.allow_as_destination:
-        frappe.throw(f"{city_value} not allowed as destination")
+    if for_origin and not city.allow_as_origin:
+        frappe.throw(f"{label} not allowed as origin")
+    if not for_origin and not city.allow_as_destination:
+        frappe.throw(f"{label} not allowed as destination")
 
-    return row.name
+    return city.name
 
 
 # =====================================================
 # BUILD LEOPARDS SHIPMENT (DRAFT)
 # =====================================================
 
-def build_leopards_shipment(delivery_note_name):
+def build_leopards_shipment(delivery_note_name, insert=True):
     dn = frappe.get_doc("Delivery Note", delivery_note_name)
 
     if dn.docstatus != 1:
@@ -147,6 +189,17 @@ def build_leopards_shipment(delivery_note_name):
     settings = get_leopards_settings()
     addr = get_shipping_address(dn)
 
+    shipment = new_leopards_shipment(dn, addr, settings)
+    if insert:
+        shipment.insert(ignore_permissions=True)
+    return shipment
+
+
+def new_leopards_shipment(dn, addr, settings, customer=None):
+    """
+    Unsaved Leopards Shipment for `dn` - no queries when `customer`
+    (customer_name, mobile_no) is passed in.
+    """
     shipment = frappe.new_doc("Leopards Shipment")
     shipment.docstatus = 0
     shipment.booking_status = "Draft"
@@ -155,21 +208,24 @@ def build_leopards_shipment(delivery_note_name):
     shipment.customer = dn.customer
     shipment.company = dn.company
 
-# Prefer real customer name, not address title
-consignee_name = (dn.customer_name or "").strip()
+    # Prefer real customer name, not address title
+    consignee_name = (dn.customer_name or "").strip()
 
-if not consignee_name:
-    consignee_name = (frappe.db.get_value("Customer", dn.customer, "customer_name") or "").strip()
+    if not consignee_name:
+        if customer is not None:
+            consignee_name = (customer.get("customer_name") or "").strip()
+        else:
+            consignee_name = (frappe.db.get_value("Customer", dn.customer, "customer_name") or "").strip()
 
-# Last fallback only (avoid showing "Walk In Customer Address")
-if not consignee_name:
-    consignee_name = (addr.address_title or dn.customer or "").strip()
+    # Last fallback only (avoid showing "Walk In Customer Address")
+    if not consignee_name:
+        consignee_name = (addr.address_title or dn.customer or "").strip()
 
-shipment.consignee_name = consignee_name
+    shipment.consignee_name = consignee_name
 
     shipment.city = addr.city
     shipment.address = compose_address(addr)
-    shipment.phone = get_phone(addr, dn)
+    shipment.phone = get_phone(addr, dn, customer)
 
     if not shipment.city:
         frappe.throw("Destination city missing in Shipping Address")
@@ -191,7 +247,6 @@ shipment.consignee_name = consignee_name
         else 0
     )
 
-    shipment.insert(ignore_permissions=True)
     return shipment
 
 
@@ -223,7 +278,15 @@ def build_remarks_for_leopards(dn, max_length=250):
 
 def build_book_packet_payload(shipment):
     settings = get_leopards_settings()
+    dn = frappe.get_doc("Delivery Note", shipment.delivery_note)
+
+    return shipment_payload(shipment, dn, settings)
+
 
+def shipment_payload(shipment, dn, settings):
+    """
+    bookPacket payload for `shipment` - pure, cities come from the cached index.
+    """
     if not settings.default_origin_city:
         frappe.throw("Default Origin City is required in Leopards Settings")
 
@@ -237,12 +300,10 @@ def build_book_packet_payload(shipment):
     weight_grams = int(shipment.weight_grams or 0)
     if weight_grams <= 0 or weight_grams > 100000:
         frappe.throw(
-            f"Invalid weight {weight_grams}g. Leopards allows 1–100000 grams."
+            f"Invalid weight {weight_grams}g. Leopards allows 1-100000 grams."
         )
 
-    dn = frappe.get_doc("Delivery Note", shipment.delivery_note)
-
-    payload = {
+    return {
         "booked_packet_order_id": shipment.delivery_note,
         "booked_packet_weight": weight_grams,
         "booked_packet_no_piece": int(shipment.pieces),
@@ -268,7 +329,173 @@ def build_book_packet_payload(shipment):
         "special_instructions": build_remarks_for_leopards(dn),
     }
 
-    shipment.request_payload = json.dumps(payload, indent=2)
-    shipment.save(ignore_permissions=True)
 
-    return payload
\ No newline at end of file
+# =====================================================
+# BATCH BUILD (MANY DELIVERY NOTES, PREFETCHED)
+# =====================================================
+
+DN_FIELDS = [
+    "name",
+    "docstatus",
+    "customer",
+    "customer_name",
+    "company",
+    "shipping_address_name",
+    "customer_address",
+    "total_net_weight",
+    "grand_total",
+]
+
+ADDRESS_FIELDS = [
+    "name",
+    "address_title",
+    "address_line1",
+    "address_line2",
+    "city",
+    "state",
+    "pincode",
+    "country",
+    "phone",
+]
+
+
+def prefetch_delivery_notes(delivery_note_names):
+    """
+    {dn name: frappe._dict(DN fields, items=[...])} in two queries.
+    """
+    names = list(dict.fromkeys(delivery_note_names))
+    if not names:
+        return {}
+
+    fields = list(DN_FIELDS)
+    if frappe.get_meta("Delivery Note").has_field("custom_leopards_remarks_override"):
+        fields.append("custom_leopards_remarks_override")
+
+    dns = {
+        d.name: d
+        for d in frappe.get_all(
+            "Delivery Note",
+            filters={"name": ["in", names]},
+            fields=fields,
+        )
+    }
+
+    for dn in dns.values():
+        dn["items"] = []
+
+    for item in frappe.get_all(
+        "Delivery Note Item",
+        filters={"parent": ["in", list(dns)], "parenttype": "Delivery Note"},
+        fields=["parent", "item_name", "qty", "weight_per_unit"],
+        order_by="parent asc, idx asc",
+    ):
+        dns[item.parent]["items"].append(item)
+
+    return dns
+
+
+def prefetch_shipping_addresses(dns):
+    """
+    {dn name: Address row}, same resolution as get_shipping_address():
+    DN shipping/customer address first, then any Address linked to the customer.
+    """
+    address_for = {
+        dn.name: dn.shipping_address_name or dn.customer_address
+        for dn in dns
+    }
+
+    missing = {dn.customer for dn in dns if not address_for[dn.name] and dn.customer}
+    linked = {}
+    if missing:
+        for link in frappe.get_all(
+            "Dynamic Link",
+            filters={
+                "link_doctype": "Customer",
+                "link_name": ["in", list(missing)],
+                "parenttype": "Address",
+            },
+            fields=["link_name", "parent"],
+        ):
+            linked.setdefault(link.link_name, link.parent)
+
+    for dn in dns:
+        if not address_for[dn.name]:
+            address_for[dn.name] = linked.get(dn.customer)
+
+    wanted = {a for a in address_for.values() if a}
+    addresses = {}
+    if wanted:
+        addresses = {
+            a.name: a
+            for a in frappe.get_all(
+                "Address",
+                filters={"name": ["in", list(wanted)]},
+                fields=ADDRESS_FIELDS,
+            )
+        }
+
+    return {
+        dn_name: addresses.get(address_name)
+        for dn_name, address_name in address_for.items()
+    }
+
+
+def prefetch_customers(customer_names):
+    names = list({c for c in customer_names if c})
+    if not names:
+        return {}
+
+    return {
+        c.name: c
+        for c in frappe.get_all(
+            "Customer",
+            filters={"name": ["in", names]},
+            fields=["name", "customer_name", "mobile_no"],
+        )
+    }
+
+
+def build_leopards_shipments(delivery_note_names):
+    """
+    Build unsaved shipments + bookPacket payloads for many Delivery Notes.
+
+    Everything is prefetched with a handful of IN-queries (Delivery Notes,
+    items, addresses, customers; cities and settings come from cache), so
+    the query count does not grow with the number of Delivery Notes.
+
+    Returns {dn name: frappe._dict(shipment, payload)} for the ones that
+    build, and {dn name: Exception} for the ones that don't.
+    """
+    settings = get_leopards_settings()
+    dns = prefetch_delivery_notes(delivery_note_names)
+    addresses = prefetch_shipping_addresses(list(dns.values()))
+    customers = prefetch_customers(dn.customer for dn in dns.values())
+
+    built = {}
+
+    for dn_name in delivery_note_names:
+        try:
+            dn = dns.get(dn_name)
+            if not dn:
+                frappe.throw(f"Delivery Note {dn_name} not found")
+
+            if dn.docstatus != 1:
+                frappe.throw("Delivery Note must be submitted")
+
+            addr = addresses.get(dn_name)
+            if not addr:
+                frappe.throw(
+                    "Shipping Address not found. "
+                    "Set Shipping Address on Delivery Note or Customer."
+                )
+
+            customer = customers.get(dn.customer) or frappe._dict()
+            shipment = new_leopards_shipment(dn, addr, settings, customer)
+            payload = shipment_payload(shipment, dn, settings)
+
+            built[dn_name] = frappe._dict(shipment=shipment, payload=payload)
+
+        except Exception as e:
+            built[dn_name] = e
+
+    return built
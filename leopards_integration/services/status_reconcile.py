@@ -0,0 +1,218 @@
+import time
+
+import frappe
+from frappe.utils import add_days, cint, getdate, now_datetime, nowdate
+
+from leopards_integration.api.tracking import _packet_status
+from leopards_integration.services.status_taxonomy import classify_status
+from leopards_integration.services.tracking_engine import new_snapshot_row
+from leopards_integration.services.tracking_writer import TrackingWriter
+from leopards_integration.utils import metrics
+from leopards_integration.utils.bulk import bulk_insert_docs, chunked
+from leopards_integration.utils.leopards_client import (
+    get_booked_packets_last_status,
+    get_cached_settings,
+)
+
+DEFAULT_WINDOW_DAYS = 7
+
+# CNs per snapshot / Delivery Note lookup
+MATCH_CHUNK_SIZE = 1000
+
+SNAPSHOT_FIELDS = "name, cn_number, current_status, is_delivered, is_terminal"
+
+
+def get_reconcile_window_days(settings=None) -> int:
+    """
+    Booking days per getBookedPacketLastStatus call
+    (Leopards Settings → Reconcile Window Days).
+    """
+    settings = settings or get_cached_settings()
+    return max(1, cint(settings.get("reconcile_window_days")) or DEFAULT_WINDOW_DAYS)
+
+
+def booking_windows(from_date, to_date, days):
+    """
+    (start, end) date pairs covering from_date..to_date, `days` each,
+    oldest first.
+    """
+    start, end = getdate(from_date), getdate(to_date)
+
+    while start <= end:
+        stop = min(getdate(add_days(start, int(days) - 1)), end)
+        yield start, stop
+        start = getdate(add_days(stop, 1))
+
+
+def fetch_window_statuses(from_date, to_date) -> dict:
+    """
+    {cn: last status} for every packet booked in the window - ONE
+    getBookedPacketLastStatus call, read like a poll result
+    (_packet_status). Raises LeopardsAPIError on failure.
+    """
+    statuses = {}
+
+    for packet in get_booked_packets_last_status(from_date, to_date):
+        cn = str(packet.get("track_number") or "").strip()
+        if cn:
+            statuses[cn] = str(_packet_status(packet)).strip()
+
+    return statuses
+
+
+def earliest_active_booking_date():
+    """
+    Posting date of the oldest Delivery Note that still has an active
+    (non-terminal) snapshot - bookings are never older than their DN.
+    """
+    return frappe.db.sql(
+        """
+        SELECT MIN(dn.posting_date)
+        FROM `tabLeopards Shipment Tracking` t
+        JOIN `tabDelivery Note` dn ON dn.name = t.delivery_note
+        WHERE t.is_delivered = 0
+          AND t.is_terminal = 0
+        """
+    )[0][0]
+
+
+class StatusReconciler:
+    """
+    Date-range status reconciliation: one getBookedPacketLastStatus call
+    per booking-date window instead of one trackBookedPacket lookup per CN.
+
+    Per window: statuses by CN → snapshots matched by cn_number (chunked
+    IN lookups) → active rows whose status moved to another stage
+    (classify_status) are only scheduled for an immediate poll
+    (next_poll_at = now) in the buffered writer. The poll then writes the
+    status, courier scans, DN summary and stage, so history and the
+    last_event / last_scan pointers are only ever written from real poll
+    results. Delivered / terminal rows and same-stage statuses are not
+    written at all.
+
+    With create_missing, CNs without a snapshot that belong to a booked
+    Delivery Note get one (backfill); their courier scans arrive with the
+    first regular poll.
+    """
+
+    def __init__(self, writer=None, create_missing=False, window_days=None):
+        self.writer = writer or TrackingWriter()
+        self.create_missing = create_missing
+        self.window_days = int(window_days or get_reconcile_window_days())
+
+        self.stats = {
+            "windows": 0,
+            "failed_windows": 0,
+            "packets": 0,
+            "changed": 0,
+            "unchanged": 0,
+            "terminal": 0,
+            "created": 0,
+            "unmatched": 0,
+        }
+
+    def run(self, from_date, to_date=None, deadline=None, on_window=None) -> dict:
+        """
+        Reconcile every window in from_date..to_date (default: today).
+        `on_window(start, end, stats)` is called after each committed window.
+        """
+        for start, end in booking_windows(from_date, to_date or nowdate(), self.window_days):
+            if deadline and time.monotonic() >= deadline:
+                break
+
+            self.reconcile_window(start, end)
+
+            if on_window:
+                on_window(start, end, self.stats)
+
+        return {**self.stats, "written": self.writer.written, "failed": self.writer.failed}
+
+    def reconcile_window(self, from_date, to_date, now=None):
+        """
+        Best-effort: a failed call is logged and the window skipped.
+        """
+        now = now or now_datetime()
+
+        try:
+            statuses = fetch_window_statuses(from_date, to_date)
+        except Exception:
+            self.stats["failed_windows"] += 1
+            metrics.inc("leopards_reconcile_windows_failed_total")
+            frappe.log_error(
+                title="Leopards Status Reconcile Failed",
+                message=f"{from_date} - {to_date}\n{frappe.get_traceback()}",
+            )
+            return
+
+        self.stats["windows"] += 1
+        self.stats["packets"] += len(statuses)
+        changed = 0
+
+        for cns in chunked(statuses, MATCH_CHUNK_SIZE):
+            matched = set()
+
+            for row in self._snapshots(cns):
+                cn = str(row.cn_number).strip()
+                matched.add(cn)
+
+                if cint(row.is_delivered) or cint(row.is_terminal):
+                    self.stats["terminal"] += 1
+                    continue
+
+                status = statuses[cn]
+                if classify_status(status) == classify_status(row.current_status):
+                    self.stats["unchanged"] += 1
+                    continue
+
+                self.writer.update_snapshot(row.name, {"next_poll_at": now, "unchanged_polls": 0})
+                changed += 1
+
+            missing = [cn for cn in cns if cn not in matched]
+            if missing:
+                self._handle_missing(missing, statuses, now)
+
+        self.writer.flush()
+
+        self.stats["changed"] += changed
+        metrics.inc("leopards_reconcile_changes_total", changed)
+
+    def _snapshots(self, cns) -> list:
+        return frappe.db.sql(
+            f"""
+            SELECT {SNAPSHOT_FIELDS}
+            FROM `tabLeopards Shipment Tracking`
+            WHERE cn_number IN %(cns)s
+            """,
+            {"cns": tuple(cns)},
+            as_dict=True,
+        )
+
+    def _handle_missing(self, cns, statuses, now):
+        if not self.create_missing:
+            self.stats["unmatched"] += len(cns)
+            return
+
+        dns = frappe.db.sql(
+            """
+            SELECT dn.name, dn.custom_leopards_consignment_number AS cn_number
+            FROM `tabDelivery Note` dn
+            LEFT JOIN `tabLeopards Shipment Tracking` t
+                ON t.delivery_note = dn.name
+            WHERE dn.custom_leopards_booking_status = 'Booked'
+              AND dn.custom_leopards_consignment_number IN %(cns)s
+              AND t.name IS NULL
+            """,
+            {"cns": tuple(cns)},
+            as_dict=True,
+        )
+
+        rows = [
+            new_snapshot_row(d.name, d.cn_number, statuses[str(d.cn_number).strip()], now)
+            for d in dns
+        ]
+
+        bulk_insert_docs("Leopards Shipment Tracking", rows)
+        frappe.db.commit()
+
+        self.stats["created"] += len(rows)
+        self.stats["unmatched"] += len(cns) - len(rows)
@@ -0,0 +1,147 @@
+import re
+
+from leopards_integration.utils.leopards_client import get_cached_settings
+
+# =====================================================
+# CANONICAL STAGES
+# =====================================================
+
+BOOKED = "booked"
+IN_TRANSIT = "in_transit"
+OUT_FOR_DELIVERY = "out_for_delivery"
+EXCEPTION = "exception"
+RETURNING = "returning"
+DELIVERED = "delivered"
+RETURNED = "returned"
+CANCELLED = "cancelled"
+LOST = "lost"
+STALE = "stale"
+UNKNOWN = "unknown"
+
+STAGES = (
+    BOOKED, IN_TRANSIT, OUT_FOR_DELIVERY, EXCEPTION, RETURNING,
+    DELIVERED, RETURNED, CANCELLED, LOST, STALE, UNKNOWN,
+)
+
+# Parcels in these stages are never polled again
+TERMINAL_STAGES = frozenset({DELIVERED, RETURNED, CANCELLED, LOST, STALE})
+
+# Terminal stages stop polling for good, so they need the status to *start*
+# with one of these phrases (after an optional "shipment"/"parcel"); a
+# keyword buried in free text ("Consignee address missing") never ends
+# tracking. Group names are the stage values.
+TERMINAL_PHRASES = re.compile(
+    r"^(?:shipment |parcel )?(?:"
+    r"(?P<returned>returned|return delivered|return to shipper)"
+    r"|(?P<delivered>delivered)"
+    r"|(?P<cancelled>cancell?ed)"
+    r"|(?P<lost>lost)"
+    r")\b"
+)
+
+# Non-terminal stages only; checked in order, first keyword hit wins.
+# Negative phrases come first so "Undelivered" never counts as delivered.
+STAGE_KEYWORDS = (
+    (EXCEPTION, (
+        "undelivered", "not delivered", "delivery attempt", "attempted", "refused",
+        "consignee not available", "missing", "incomplete address",
+    )),
+    (RETURNING, ("return",)),
+    (OUT_FOR_DELIVERY, ("out for delivery", "arrived at destination", "assigned to courier")),
+    (IN_TRANSIT, ("transit", "dispatched", "arrived", "departed", "received at")),
+    (BOOKED, ("pending", "booked", "pickup", "picked")),
+)
+
+# Exact status codes; extend per site via Leopards Settings → Status Stage Overrides
+STATUS_CODES = {
+    "rts": RETURNED,
+}
+
+# Memoised classifications kept per settings snapshot
+MAX_MEMO = 10000
+
+
+def normalize_status(status_text) -> str:
+    return re.sub(r"\s+", " ", str(status_text or "")).strip().lower()
+
+
+def parse_overrides(text) -> dict:
+    """
+    "status or code = stage" per line → {normalized status: stage}.
+    Unknown stages are ignored.
+    """
+    overrides = {}
+
+    for line in str(text or "").splitlines():
+        if "=" not in line:
+            continue
+
+        status, stage = line.rsplit("=", 1)
+        stage = normalize_status(stage).replace(" ", "_")
+
+        if status.strip() and stage in STAGES:
+            overrides[normalize_status(status)] = stage
+
+    return overrides
+
+
+def _keyword_stage(normalized) -> str:
+    # A negative phrase ("Delivered - refused") still wins over a terminal prefix
+    match = TERMINAL_PHRASES.match(normalized)
+    if match and not any(k in normalized for k in STAGE_KEYWORDS[0][1]):
+        return match.lastgroup
+
+    for stage, keywords in STAGE_KEYWORDS:
+        if any(k in normalized for k in keywords):
+            return stage
+    return UNKNOWN
+
+
+def get_status_table() -> dict:
+    """
+    Lookup table {normalized status: stage}: codes + site overrides,
+    then every status seen so far.
+
+    Stored on the cached Leopards Settings snapshot, so a settings change
+    rebuilds it on every worker.
+    """
+    settings = get_cached_settings()
+
+    table = settings.get("_status_table")
+    if table is None:
+        table = {**STATUS_CODES, **parse_overrides(settings.get("status_stage_overrides"))}
+        settings._status_table = table
+
+    return table
+
+
+def classify_status(status_text) -> str:
+    """
+    Canonical stage for Leopards status text or code (see STAGES).
+    """
+    normalized = normalize_status(status_text)
+    if not normalized:
+        return UNKNOWN
+
+    table = get_status_table()
+
+    stage = table.get(normalized)
+    if stage is None:
+        stage = _keyword_stage(normalized)
+        if len(table) < MAX_MEMO:
+            table[normalized] = stage
+
+    return stage
+
+
+def is_terminal_stage(stage) -> bool:
+    return stage in TERMINAL_STAGES
+
+
+def stage_fields(status_text) -> dict:
+    """
+    Snapshot fields for a status: tracking_stage + is_terminal.
+    Terminal snapshots leave the active (polled) set.
+    """
+    stage = classify_status(status_text)
+    return {"tracking_stage": stage, "is_terminal": int(is_terminal_stage(stage))}
@@ -0,0 +1,334 @@
+import time
+
+import frappe
+from frappe.utils import cint, get_datetime, now_datetime
+
+from leopards_integration.api.tracking import (
+    _is_delivered,
+    _packet_status,
+    event_hash,
+    get_tracking_batch_size,
+    get_tracking_request,
+    packet_timeline,
+    post_tracking_request,
+)
+from leopards_integration.services.async_tracking import track_batches
+from leopards_integration.services.poll_schedule import compute_next_poll_at
+from leopards_integration.services.status_taxonomy import stage_fields
+from leopards_integration.services.tracking_writer import TrackingWriter
+from leopards_integration.utils.bulk import chunked
+from leopards_integration.utils.leopards_client import get_cached_settings
+
+# =====================================================
+# FETCH STAGES
+# =====================================================
+
+class AsyncFetcher:
+    """
+    Batches tracked concurrently under the tracking concurrency cap and
+    rate limit (services.async_tracking). Default for scheduled syncs.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings
+
+    def fetch(self, batches, on_result, deadline=None, stop=None):
+        track_batches(batches, on_result, self.settings, deadline=deadline, stop=stop)
+
+
+class SequentialFetcher:
+    """
+    One batch at a time on the calling thread - no executor or event loop.
+    For consoles, small one-off runs and debugging.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = settings
+
+    def fetch(self, batches, on_result, deadline=None, stop=None):
+        request = get_tracking_request(self.settings)
+
+        for batch in batches:
+            if not batch:
+                continue
+
+            if (deadline and time.monotonic() >= deadline) or (stop and stop.is_set()):
+                on_result(batch, None, TimeoutError("Tracking run stopped"))
+                continue
+
+            try:
+                packets = post_tracking_request(request, batch)
+            except Exception as e:
+                on_result(batch, None, e)
+                continue
+
+            on_result(batch, packets, None)
+
+
+# =====================================================
+# SELECT + APPLY
+# =====================================================
+
+def get_due_tracking_rows(limit, now=None, shard=0, shards=1):
+    """
+    Active snapshots (not delivered, not in a terminal stage) whose
+    next_poll_at has passed, most overdue first. Never-scheduled rows
+    (next_poll_at empty) sort first.
+
+    With shards > 1 only rows with CRC32(name) % shards == shard are
+    returned, so shards are disjoint and stable across runs.
+    """
+    shard_condition = "AND MOD(CRC32(name), %(shards)s) = %(shard)s" if shards > 1 else ""
+
+    return frappe.db.sql(
+        f"""
+        SELECT name, delivery_note, cn_number, current_status,
+               unchanged_polls, creation, last_scan, last_scan_time
+        FROM `tabLeopards Shipment Tracking`
+        WHERE is_delivered = 0
+          AND is_terminal = 0
+          AND (next_poll_at IS NULL OR next_poll_at <= %(now)s)
+          {shard_condition}
+        ORDER BY next_poll_at ASC
+        LIMIT %(limit)s
+        """,
+        {
+            "now": now or now_datetime(),
+            "shards": int(shards),
+            "shard": int(shard),
+            "limit": int(limit),
+        },
+        as_dict=True,
+    )
+
+
+def new_timeline_events(row, packet) -> list:
+    """
+    Courier scans in `packet` that are newer than the snapshot's
+    last_scan pointer, each named by its content hash. No history read.
+
+    Only courier scans move the pointer, never events logged at poll time,
+    so a scan older than such an event is still stored when it arrives.
+    Without a pointer every scan is returned; INSERT IGNORE on the hash
+    names drops the ones already stored.
+    """
+    since = get_datetime(row.last_scan_time) if row.get("last_scan_time") else None
+    events = []
+
+    for event in packet_timeline(packet):
+        event.name = event_hash(row.cn_number, event)
+
+        if since and (
+            event.event_time < since
+            or (event.event_time == since and event.name == row.get("last_scan"))
+        ):
+            continue
+
+        events.append(event)
+
+    return events
+
+
+def new_snapshot_row(delivery_note, cn, status, now, scans=()) -> dict:
+    """
+    Field values for a new Leopards Shipment Tracking row (bulk insert),
+    pointing at the latest of `scans` when there are any.
+    """
+    stage = stage_fields(status)
+
+    row = {
+        "delivery_note": delivery_note,
+        "cn_number": cn,
+        "current_status": status,
+        "last_updated": now,
+        "is_delivered": _is_delivered(status),
+        **stage,
+        "unchanged_polls": 0,
+        "next_poll_at": None if stage["is_terminal"] else compute_next_poll_at(status, 0, now, now),
+    }
+
+    if scans:
+        row.update({
+            "last_event": scans[-1].name,
+            "last_event_status": scans[-1].status,
+            "last_event_time": scans[-1].event_time,
+            "last_scan": scans[-1].name,
+            "last_scan_time": scans[-1].event_time,
+        })
+
+    return row
+
+
+def apply_tracking_result(writer, row, packet, now):
+    """
+    Feed one polled parcel into the buffered writer:
+    snapshot + schedule always, new scans as history, DN summary only on
+    status change.
+    """
+    # Not in response → keep current status, count as unchanged
+    status = _packet_status(packet) if packet else (row.current_status or "Pending")
+    delivered = _is_delivered(status)
+    stage = stage_fields(status)
+
+    changed = status != row.current_status
+    unchanged_polls = 0 if changed else cint(row.unchanged_polls) + 1
+    snapshot = {}
+
+    # History: every new courier scan at its scan time (hash-named, so a
+    # re-sent scan is dropped by INSERT IGNORE)
+    scans = new_timeline_events(row, packet) if packet else []
+    for scan in scans:
+        writer.log_event(
+            row.delivery_note, row.cn_number, scan.status, scan.event_time,
+            name=scan.name, reason=scan.reason,
+        )
+
+    if scans:
+        latest = scans[-1]
+        snapshot.update({
+            "last_event": latest.name,
+            "last_event_status": latest.status,
+            "last_event_time": latest.event_time,
+            "last_scan": latest.name,
+            "last_scan_time": latest.event_time,
+        })
+    elif changed:
+        # No scan list in the response → one event at poll time; last_scan
+        # stays put, so the courier's own scans are still stored later
+        event = writer.log_event(row.delivery_note, row.cn_number, status, now)
+        snapshot.update({
+            "last_event": event,
+            "last_event_status": status,
+            "last_event_time": now,
+        })
+
+    if changed:
+        delivered_scans = [scan for scan in scans if _is_delivered(scan.status)]
+        delivered_on = delivered_scans[-1].event_time if delivered_scans else now
+
+        # OPTIONAL summary back to DN (safe, no booking_status change)
+        writer.update_delivery_note(
+            row.delivery_note,
+            {
+                "custom_leopards_last_tracking_status": status,
+                "custom_leopards_delivered_on": delivered_on if delivered else None,
+            },
+        )
+
+    # Update tracking row (buffered; flushes every commit chunk)
+    writer.update_snapshot(
+        row.name,
+        {
+            **snapshot,
+            **stage,
+            "current_status": status,
+            "last_updated": now,
+            "is_delivered": delivered,
+            "unchanged_polls": unchanged_polls,
+            # Terminal → dropped from the active set, never scheduled again
+            "next_poll_at": None if stage["is_terminal"] else compute_next_poll_at(
+                status, unchanged_polls, row.creation, now
+            ),
+        },
+    )
+
+
+# =====================================================
+# ENGINE
+# =====================================================
+
+class TrackingEngine:
+    """
+    The one tracking pipeline: rows → fetch stage → apply → write stage.
+
+    - fetcher: AsyncFetcher (default) or SequentialFetcher - anything with
+      fetch(batches, on_result, deadline, stop)
+    - writer: buffered TrackingWriter (default) - anything with the
+      TrackingWriter interface (update_snapshot / log_event /
+      update_delivery_note / flush / written / failed)
+
+    Scheduler sync, backfill and benchmarks all go through here.
+    """
+
+    def __init__(self, fetcher=None, writer=None, batch_size=None):
+        self.fetcher = fetcher or AsyncFetcher()
+        self.writer = writer or TrackingWriter()
+        self.batch_size = int(batch_size or get_tracking_batch_size())
+
+    def run(self, rows, now=None, deadline=None, stop=None) -> dict:
+        """
+        Poll `rows` (snapshot rows as returned by get_due_tracking_rows)
+        and write results through the write stage.
+
+        - Never fails due to API instability: failed batches are skipped
+          and stay due
+        - Once `stop` is set no new batches start and no more results
+          are applied
+        """
+        now = now or now_datetime()
+
+        rows_by_cn = {}
+        for r in rows:
+            if r.cn_number:
+                rows_by_cn.setdefault(str(r.cn_number).strip(), []).append(r)
+
+        stats = {"polled": 0, "skipped": 0}
+
+        def _on_result(batch, packets, error):
+            if error or (stop and stop.is_set()):
+                # Best-effort only - rows stay due for the next run
+                stats["skipped"] += len(batch)
+                return
+
+            for cn in batch:
+                for row in rows_by_cn.get(cn, ()):
+                    apply_tracking_result(self.writer, row, packets.get(cn), now)
+                    stats["polled"] += 1
+
+        self.fetcher.fetch(
+            chunked(list(rows_by_cn), self.batch_size),
+            _on_result,
+            deadline=deadline,
+            stop=stop,
+        )
+
+        self.writer.flush()
+
+        return {
+            **stats,
+            "written": self.writer.written,
+            "failed": self.writer.failed,
+        }
+
+    def fetch_packets(self, cns, deadline=None) -> dict:
+        """
+        {cn: packet} through the fetch stage, without writing anything.
+        Best-effort: CNs from failed batches are simply missing.
+        """
+        packets = {}
+
+        def _on_result(batch, result, error):
+            if not error:
+                packets.update(result)
+
+        cns = list(dict.fromkeys(str(cn).strip() for cn in cns if cn))
+        self.fetcher.fetch(chunked(cns, self.batch_size), _on_result, deadline=deadline)
+
+        return packets
+
+
+def sync_due_tracking(limit, shard=0, shards=1, deadline=None, stop=None, engine=None) -> dict:
+    """
+    Select the due rows of one shard and run them through the engine.
+    Nothing to do (and no engine built) while Leopards is disabled or no
+    row is due.
+    """
+    if not get_cached_settings().enabled:
+        return {"polled": 0, "skipped": 0, "written": 0, "failed": 0}
+
+    now = now_datetime()
+    rows = get_due_tracking_rows(limit, now, shard, shards)
+    if not rows:
+        return {"polled": 0, "skipped": 0, "written": 0, "failed": 0}
+
+    return (engine or TrackingEngine()).run(rows, now, deadline, stop)
@@ -0,0 +1,103 @@
+import frappe
+
+from leopards_integration.utils.bulk import bulk_insert_docs, bulk_update, new_name
+from leopards_integration.utils.leopards_client import get_cached_settings
+
+DEFAULT_COMMIT_CHUNK = 200
+
+
+def get_tracking_commit_chunk(settings=None) -> int:
+    """
+    Parcels per flush/commit (Leopards Settings → Tracking Commit Chunk).
+    """
+    settings = settings or get_cached_settings()
+    try:
+        size = int(settings.get("tracking_commit_chunk") or 0)
+    except (TypeError, ValueError):
+        size = 0
+    return size if size > 0 else DEFAULT_COMMIT_CHUNK
+
+
+class TrackingWriter:
+    """
+    Buffered, set-based write path for tracking results.
+
+    Snapshot updates, history events and Delivery Note summaries are
+    collected in memory and flushed every `commit_every` parcels as:
+      - one CASE UPDATE on `tabLeopards Shipment Tracking`
+      - one multi-row INSERT IGNORE into `tabLeopards Tracking Event`
+      - one CASE UPDATE on `tabDelivery Note` (modified untouched)
+    followed by a commit. A failing chunk is rolled back and logged;
+    earlier chunks stay committed.
+    """
+
+    def __init__(self, commit_every=None, source="Leopards API"):
+        self.commit_every = int(commit_every or get_tracking_commit_chunk())
+        self.source = source
+
+        self._snapshots = {}
+        self._events = []
+        self._delivery_notes = {}
+
+        self.written = 0
+        self.failed = 0
+
+    # ---------------------------------------------------------------
+    # Buffering
+    # ---------------------------------------------------------------
+
+    def update_snapshot(self, name, values):
+        self._snapshots.setdefault(name, {}).update(values)
+        if len(self._snapshots) >= self.commit_every:
+            self.flush()
+
+    def log_event(self, delivery_note, cn, status, event_time, name=None, reason=None) -> str:
+        """
+        Buffer one history row; returns its name for the snapshot's
+        last_event pointer. Courier scans pass their content hash as
+        `name`, so duplicates are skipped on insert; other rows are named
+        by the DocType's autoname.
+        """
+        event = {
+            "delivery_note": delivery_note,
+            "cn_number": cn,
+            "status_text": status,
+            "reason": reason,
+            "event_time": event_time,
+            "source": self.source,
+        }
+        event["name"] = name or new_name("Leopards Tracking Event", event)
+
+        self._events.append(event)
+        return event["name"]
+
+    def update_delivery_note(self, name, values):
+        self._delivery_notes.setdefault(name, {}).update(values)
+
+    # ---------------------------------------------------------------
+    # Flush
+    # ---------------------------------------------------------------
+
+    def flush(self):
+        snapshots, self._snapshots = self._snapshots, {}
+        events, self._events = self._events, []
+        delivery_notes, self._delivery_notes = self._delivery_notes, {}
+
+        if not (snapshots or events or delivery_notes):
+            return
+
+        try:
+            bulk_update("Leopards Shipment Tracking", snapshots)
+            bulk_insert_docs("Leopards Tracking Event", events, ignore_duplicates=True)
+            bulk_update("Delivery Note", delivery_notes, update_modified=False)
+            frappe.db.commit()
+            self.written += len(snapshots)
+
+        except Exception:
+            frappe.db.rollback()
+            self.failed += len(snapshots)
+            frappe.log_error(
+                title="Leopards Tracking Flush Failed",
+                message=f"{len(snapshots)} parcels\n{frappe.get_traceback()}",
+            )
+            frappe.db.commit()
@@ -0,0 +1,119 @@
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from leopards_integration.api import booking
+from leopards_integration.utils.leopards_client import LeopardsAPIError, LeopardsTransientError
+
+
+class BookingFailed(Exception):
+    pass
+
+
+@contextmanager
+def free_lock(delivery_note):
+    yield
+
+
+@contextmanager
+def held_lock(delivery_note):
+    raise LeopardsAPIError(f"Leopards booking for {delivery_note} is already in progress")
+    yield
+
+
+class TestBookOnce(unittest.TestCase):
+    """
+    Failure traces of _book_once: which failures leave a Failed shipment,
+    and which of those make the next attempt ask Leopards first.
+    """
+
+    def setUp(self):
+        fake_frappe = MagicMock()
+        fake_frappe.throw.side_effect = BookingFailed
+
+        self.recorded = []
+        self.patch(
+            frappe=fake_frappe,
+            _=lambda text: text,
+            booking_lock=free_lock,
+            find_booked_shipment=lambda dn: None,
+            last_failed_booking=lambda dn: None,
+            is_single_write_booking=lambda: True,
+            persist_shipment=lambda shipment: None,
+            write_back_bookings=MagicMock(),
+            record_failed_booking=lambda dn, error, shipment=None: self.recorded.append(shipment),
+        )
+        self.shipment = frappe._dict(name="LS-0001", request_payload=None)
+
+    def patch(self, **values):
+        for name, value in values.items():
+            patcher = patch.object(booking, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _book(self, build_payload=lambda shipment: {"booked_packet_order_id": "DN-0001"}):
+        return booking._book_once("DN-0001", lambda insert: self.shipment, build_payload)
+
+    def test_lock_contention_leaves_no_trace(self):
+        self.patch(booking_lock=held_lock)
+
+        with self.assertRaises(BookingFailed):
+            self._book()
+        self.assertEqual(self.recorded, [])
+
+    def test_failure_before_the_call_is_not_marked_as_sent(self):
+        def invalid(shipment):
+            raise ValueError("Origin city not mapped")
+
+        with self.assertRaises(BookingFailed):
+            self._book(invalid)
+
+        self.assertEqual(self.recorded, [self.shipment])
+        self.assertIsNone(self.shipment.request_payload)
+
+    def test_failure_after_the_call_is_marked_as_sent(self):
+        self.patch(book_packet_idempotent=MagicMock(side_effect=LeopardsTransientError("timeout")))
+
+        with self.assertRaises(BookingFailed):
+            self._book()
+
+        self.assertEqual(self.recorded, [self.shipment])
+        self.assertTrue(self.shipment.request_payload)
+
+    def test_booked(self):
+        self.patch(book_packet_idempotent=MagicMock(return_value={"track_number": "CN1", "slip_link": "s"}))
+
+        result = self._book()
+
+        self.assertEqual((result["status"], result["cn_number"], result["outcome"]), ("Booked", "CN1", "booked"))
+        booking.write_back_bookings.assert_called_once()
+
+    def test_existing_booking_stamps_unbooked_dn(self):
+        existing = frappe._dict(name="LS-0000", cn_number="CN0", slip_link="")
+        self.patch(find_booked_shipment=lambda dn: existing)
+        booking.frappe.db.get_value.return_value = "Not Booked"
+
+        self.assertEqual(self._book()["outcome"], "existing")
+        booking.write_back_bookings.assert_called_once_with(
+            [{"delivery_note": "DN-0001", "cn_number": "CN0", "slip_link": ""}]
+        )
+
+    def test_existing_booking_keeps_stamped_dn(self):
+        self.patch(find_booked_shipment=lambda dn: frappe._dict(name="LS-0000", cn_number="CN0"))
+        booking.frappe.db.get_value.return_value = "Booked"
+
+        self._book()
+        booking.write_back_bookings.assert_not_called()
+
+    def test_unverified_when_lookup_fails(self):
+        api = MagicMock()
+        self.patch(
+            last_failed_booking=lambda dn: "2024-03-01",
+            find_remote_booking=MagicMock(side_effect=LeopardsAPIError("down")),
+            book_packet_idempotent=api,
+        )
+
+        self.assertEqual(self._book()["status"], "Unverified")
+        api.assert_not_called()
@@ -0,0 +1,131 @@
+import sqlite3
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from leopards_integration.utils import bulk
+from leopards_integration.utils.bulk import bulk_insert_docs, bulk_update, chunked
+
+NOW = "2024-03-10 12:00:00"
+
+
+class FakeDB:
+    """
+    frappe.db.sql / bulk_insert on an in-memory SQLite table, so the
+    generated SQL really runs.
+    """
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute(
+            """
+            CREATE TABLE `tabItem` (
+                name TEXT PRIMARY KEY, status TEXT, qty INTEGER,
+                owner TEXT, creation TEXT, modified TEXT, modified_by TEXT, docstatus INTEGER
+            )
+            """
+        )
+        self.statements = []
+
+    def sql(self, query, values=()):
+        self.statements.append(query)
+        return self.conn.execute(query.replace("%s", "?"), values).fetchall()
+
+    def bulk_insert(self, doctype, fields, values, ignore_duplicates=False, chunk_size=None):
+        verb = "INSERT OR IGNORE" if ignore_duplicates else "INSERT"
+        columns = ", ".join(f"`{f}`" for f in fields)
+        placeholders = ", ".join("?" * len(fields))
+        self.conn.executemany(f"{verb} INTO `tab{doctype}` ({columns}) VALUES ({placeholders})", values)
+
+    def rows(self):
+        return {
+            name: (status, qty, modified)
+            for name, status, qty, modified in self.conn.execute(
+                "SELECT name, status, qty, modified FROM `tabItem`"
+            )
+        }
+
+
+class BulkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeDB()
+        hashes = iter(range(1000))
+        fake = SimpleNamespace(
+            db=self.db,
+            session=SimpleNamespace(user="bulk@example.com"),
+            get_meta=lambda doctype: SimpleNamespace(autoname="hash"),
+            generate_hash=lambda length=10: f"h{next(hashes)}",
+        )
+
+        for name, value in (("frappe", fake), ("now_datetime", lambda: NOW)):
+            patcher = patch.object(bulk, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        bulk_insert_docs("Item", [
+            {"name": "A", "status": "new", "qty": 1},
+            {"name": "B", "status": "new", "qty": 2},
+            {"name": "C", "status": "new", "qty": 3},
+        ])
+        self.db.conn.execute("UPDATE `tabItem` SET modified = 'old'")
+
+
+class TestBulkInsert(BulkTestCase):
+    def test_fills_standard_columns_and_names(self):
+        bulk_insert_docs("Item", [{"status": "new", "qty": 4}])
+
+        row = self.db.conn.execute(
+            "SELECT name, owner, modified_by, creation, docstatus FROM `tabItem` WHERE qty = 4"
+        ).fetchone()
+        self.assertEqual(row, ("h0", "bulk@example.com", "bulk@example.com", NOW, 0))
+
+    def test_ignore_duplicates(self):
+        with self.assertRaises(sqlite3.IntegrityError):
+            bulk_insert_docs("Item", [{"name": "A", "status": "dup"}])
+
+        self.assertEqual(bulk_insert_docs("Item", [{"name": "A", "status": "dup"}], ignore_duplicates=True), 1)
+        self.assertEqual(self.db.rows()["A"][0], "new")
+
+    def test_empty(self):
+        self.assertEqual(bulk_insert_docs("Item", []), 0)
+
+
+class TestBulkUpdate(BulkTestCase):
+    def test_per_row_values_only_where_given(self):
+        count = bulk_update("Item", {
+            "A": {"status": "booked"},
+            "B": {"qty": 20},
+        })
+
+        self.assertEqual(count, 2)
+        self.assertEqual(self.db.rows(), {
+            "A": ("booked", 1, NOW),
+            "B": ("new", 20, NOW),
+            "C": ("new", 3, "old"),
+        })
+
+    def test_one_statement_per_chunk(self):
+        self.db.statements.clear()
+        bulk_update("Item", {name: {"qty": 0} for name in "ABC"}, chunk_size=2)
+
+        self.assertEqual(len(self.db.statements), 2)
+        self.assertEqual({qty for _status, qty, _m in self.db.rows().values()}, {0})
+
+    def test_without_modified(self):
+        bulk_update("Item", {"C": {"status": "x"}}, update_modified=False)
+        self.assertEqual(self.db.rows()["C"], ("x", 3, "old"))
+
+    def test_null_values(self):
+        bulk_update("Item", {"A": {"status": None}})
+        self.assertIsNone(self.db.rows()["A"][0])
+
+    def test_empty(self):
+        self.db.statements.clear()
+        self.assertEqual(bulk_update("Item", {}), 0)
+        self.assertEqual(self.db.statements, [])
+
+
+class TestChunked(unittest.TestCase):
+    def test_chunks(self):
+        self.assertEqual(list(chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked({"a": 1, "b": 2}, 0)), [["a"], ["b"]])
@@ -0,0 +1,81 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from leopards_integration.utils import cache as cache_module
+from leopards_integration.utils.cache import VersionedCache
+
+
+class FakeFrappe:
+    """
+    frappe.local.site, frappe.cache() get/set_value and
+    frappe.db.after_commit for one site.
+    """
+
+    def __init__(self):
+        self.redis = {}
+        self.callbacks = []
+        self.local = SimpleNamespace(site="site1")
+        self.db = SimpleNamespace(
+            after_commit=SimpleNamespace(add=self.callbacks.append),
+            commit=self.commit,
+        )
+        self._cache = SimpleNamespace(get_value=self.redis.get, set_value=self.redis.__setitem__)
+        self._hashes = iter(range(1000))
+
+    def cache(self):
+        return self._cache
+
+    def generate_hash(self, length=10):
+        return str(next(self._hashes))
+
+    def commit(self):
+        callbacks, self.callbacks[:] = list(self.callbacks), []
+        for callback in callbacks:
+            callback()
+
+
+class TestVersionedCache(unittest.TestCase):
+    def setUp(self):
+        self.frappe = FakeFrappe()
+        patcher = patch.object(cache_module, "frappe", self.frappe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.row = {"value": 1}
+        self.loads = 0
+        self.cache = VersionedCache("test", self._load)
+
+    def _load(self):
+        self.loads += 1
+        return dict(self.row)
+
+    def test_loads_once_per_version(self):
+        self.assertEqual(self.cache.get(), {"value": 1})
+        self.assertEqual(self.cache.get(), {"value": 1})
+        self.assertEqual(self.loads, 1)
+
+    def test_version_bumped_only_after_commit(self):
+        self.cache.get()
+
+        # Save in progress: the row is not committed yet
+        self.cache.invalidate()
+        self.assertEqual(self.frappe.redis, {})
+        self.assertEqual(self.cache.get(), {"value": 1})
+        self.assertEqual(self.loads, 1)
+
+        self.row["value"] = 2
+        self.frappe.db.commit()
+
+        self.assertEqual(self.cache.get(), {"value": 2})
+        self.assertEqual(self.loads, 2)
+
+    def test_other_workers_reload_on_new_version(self):
+        other = VersionedCache("test", self._load)
+        other.get()
+
+        self.row["value"] = 2
+        self.cache.invalidate()
+        self.frappe.db.commit()
+
+        self.assertEqual(other.get(), {"value": 2})
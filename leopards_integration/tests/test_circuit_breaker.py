@@ -0,0 +1,148 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from leopards_integration.utils import circuit_breaker
+from leopards_integration.utils.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    is_failure_response,
+)
+
+
+class FakeRedis:
+    """
+    get / set (nx) / delete / incr / expire on a dict; values come back
+    as bytes like redis-py.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("redis down")
+
+    def get(self, key):
+        self._check()
+        value = self.data.get(key)
+        return None if value is None else str(value).encode()
+
+    def set(self, key, value, nx=False, ex=None):
+        self._check()
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        self._check()
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        self._check()
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        self._check()
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch.object(circuit_breaker.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.redis = FakeRedis()
+        self.breaker = self._breaker()
+
+    def _breaker(self):
+        return CircuitBreaker(
+            "trackBookedPacket", self.redis, "test:circuit",
+            failure_threshold=3, open_seconds=60, slow_call_ms=1000,
+        )
+
+    def _fail(self, times):
+        for _ in range(times):
+            self.breaker.record(False)
+
+    def test_opens_after_threshold(self):
+        self._fail(2)
+        self.assertEqual(self.breaker.state(), "closed")
+        self.breaker.before_call()
+
+        self._fail(1)
+        self.assertEqual(self.breaker.state(), "open")
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_state_is_shared_through_redis(self):
+        self._fail(3)
+        self.assertEqual(self._breaker().state(), "open")
+
+    def test_success_resets_failures(self):
+        self._fail(2)
+        self.breaker.record(True, 10)
+        self._fail(2)
+        self.assertEqual(self.breaker.state(), "closed")
+
+    def test_slow_calls_count_as_failures(self):
+        for _ in range(3):
+            self.breaker.record(True, 5000)
+        self.assertEqual(self.breaker.state(), "open")
+
+    def test_half_open_allows_one_probe(self):
+        self._fail(3)
+        self.now += 61
+        self.assertEqual(self.breaker.state(), "half_open")
+
+        self.breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            self._breaker().before_call()
+
+    def test_probe_success_closes(self):
+        self._fail(3)
+        self.now += 61
+        self.breaker.before_call()
+        self.breaker.record(True, 10)
+
+        self.assertEqual(self.breaker.state(), "closed")
+        self.assertEqual(self.redis.data, {})
+
+    def test_probe_failure_reopens(self):
+        self._fail(3)
+        self.now += 61
+        self.breaker.before_call()
+        self.breaker.record(False)
+
+        self.assertEqual(self.breaker.state(), "open")
+        self.now += 59
+        self.assertEqual(self.breaker.state(), "open")
+        self.now += 2
+        self.breaker.before_call()
+
+    def test_redis_trouble_fails_open(self):
+        self._fail(3)
+        self.redis.down = True
+
+        self.assertEqual(self.breaker.state(), "closed")
+        self.breaker.before_call()
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.status()["failures"], 0)
+
+    def test_reset(self):
+        self._fail(3)
+        self.breaker.reset()
+        self.assertEqual(self.breaker.state(), "closed")
+
+
+class TestIsFailureResponse(unittest.TestCase):
+    def test_server_errors_and_throttling_only(self):
+        self.assertTrue(is_failure_response(SimpleNamespace(status_code=502)))
+        self.assertTrue(is_failure_response(SimpleNamespace(status_code=429)))
+        self.assertFalse(is_failure_response(SimpleNamespace(status_code=404)))
+        self.assertFalse(is_failure_response(SimpleNamespace(status_code=200)))
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+
+from leopards_integration.utils import lease as lease_module
+from leopards_integration.utils.lease import Lease
+
+
+class FakeRedis:
+    """
+    Just enough of redis-py for Lease: SET NX EX, GET and the two
+    compare-and-act scripts.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        self.ttl = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value
+            self.ttl[key] = ex
+            return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def eval(self, script, numkeys, key, token, *args):
+        with self.lock:
+            if self.data.get(key) != token:
+                return 0
+            if script == lease_module._RENEW:
+                self.ttl[key] = int(args[0])
+            else:
+                del self.data[key]
+                self.ttl.pop(key, None)
+            return 1
+
+
+class TestLease(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+
+    def test_one_holder_at_a_time(self):
+        first = Lease(self.redis, "shard:0", ttl=30)
+        second = Lease(self.redis, "shard:0", ttl=30)
+
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+
+        first.release()
+        self.assertNotIn("shard:0", self.redis.data)
+        self.assertTrue(second.acquire())
+        second.release()
+
+    def test_release_keeps_other_holders_key(self):
+        mine = Lease(self.redis, "shard:0", ttl=30)
+        self.assertTrue(mine.acquire())
+
+        # Our lease expired and another worker took over
+        self.redis.data["shard:0"] = "someone-else"
+        mine.release()
+
+        self.assertEqual(self.redis.get("shard:0"), "someone-else")
+
+    def test_renew_only_while_owned(self):
+        lease = Lease(self.redis, "shard:0", ttl=30)
+        self.assertTrue(lease.acquire())
+        self.assertTrue(lease.renew())
+
+        self.redis.data["shard:0"] = "someone-else"
+        self.assertFalse(lease.renew())
+        lease.release()
+
+    def test_heartbeat_extends_and_flags_loss(self):
+        lease = Lease(self.redis, "shard:0", ttl=3)
+        self.assertTrue(lease.acquire())
+
+        self.redis.ttl["shard:0"] = 0
+        deadline = time.monotonic() + 3
+        while self.redis.ttl["shard:0"] != 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.redis.ttl["shard:0"], 3)
+        self.assertFalse(lease.lost.is_set())
+
+        self.redis.data["shard:0"] = "someone-else"
+        self.assertTrue(lease.lost.wait(3))
+        lease.release()
+
+    def test_context_manager_releases(self):
+        with Lease(self.redis, "shard:0", ttl=30) as lease:
+            self.assertTrue(lease.acquire())
+
+        self.assertNotIn("shard:0", self.redis.data)
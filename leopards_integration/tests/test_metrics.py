@@ -0,0 +1,169 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from leopards_integration.utils import metrics
+from leopards_integration.utils.metrics import (
+    MetricsRegistry,
+    histogram_quantile,
+    parse_series,
+    render_prometheus,
+    series_key,
+)
+
+
+class FakePipeline:
+    def __init__(self, hashes):
+        self.hashes = hashes
+        self.ops = []
+
+    def hincrbyfloat(self, key, field, delta):
+        self.ops.append(lambda: self.hashes.setdefault(key, {}).__setitem__(
+            field, self.hashes.get(key, {}).get(field, 0) + delta
+        ))
+
+    def hset(self, key, field, value):
+        self.ops.append(lambda: self.hashes.setdefault(key, {}).__setitem__(field, value))
+
+    def execute(self):
+        for op in self.ops:
+            op()
+
+
+class FakeFrappe:
+    """
+    frappe.local.site + a per-site frappe.cache() with pipelines.
+    """
+
+    def __init__(self):
+        self.local = SimpleNamespace(site="a.example.com")
+        self.hashes = {}
+
+    def cache(self):
+        return SimpleNamespace(
+            make_key=lambda key: f"{self.local.site}|{key}",
+            pipeline=lambda: FakePipeline(self.hashes),
+        )
+
+
+class TestSeries(unittest.TestCase):
+    def test_key_and_parse_round_trip(self):
+        key = series_key("leopards_http_requests_total", status="2xx", endpoint='say "hi"\\')
+
+        self.assertEqual(key, 'leopards_http_requests_total{endpoint="say \\"hi\\"\\\\",status="2xx"}')
+        self.assertEqual(
+            parse_series(key),
+            ("leopards_http_requests_total", {"endpoint": 'say "hi"\\', "status": "2xx"}),
+        )
+        self.assertEqual(parse_series("plain_total"), ("plain_total", {}))
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.frappe = FakeFrappe()
+        patcher = patch.object(metrics, "frappe", self.frappe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = MetricsRegistry()
+
+    def test_observe_fills_cumulative_buckets(self):
+        self.registry.observe("latency_ms", 120, buckets=(100, 250, 500))
+        counters, _gauges = self.registry.drain("a.example.com")
+
+        self.assertEqual(counters, {
+            'latency_ms_bucket{le="250"}': 1,
+            'latency_ms_bucket{le="500"}': 1,
+            'latency_ms_bucket{le="+Inf"}': 1,
+            "latency_ms_sum": 120,
+            "latency_ms_count": 1,
+        })
+
+    def test_deltas_are_kept_per_site(self):
+        self.registry.inc("jobs_total")
+        self.frappe.local.site = "b.example.com"
+        self.registry.inc("jobs_total", 5)
+        self.registry.set("last_run", 7)
+
+        self.assertEqual(self.registry.drain("a.example.com"), ({"jobs_total": 1}, {}))
+        self.assertEqual(self.registry.drain("b.example.com"), ({"jobs_total": 5}, {"last_run": 7}))
+
+    def test_bound_threads_record_for_their_site(self):
+        self.frappe.local.site = None
+
+        def work():
+            metrics.bind_site("a.example.com")
+            self.registry.inc("tracked_total")
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(self.registry.drain("a.example.com")[0], {"tracked_total": 1})
+
+    def test_unattributed_deltas_are_dropped(self):
+        self.frappe.local.site = None
+        self.registry.inc("orphan_total")
+
+        self.assertEqual(self.registry.drain("a.example.com"), ({}, {}))
+        self.assertEqual(self.registry._counters, {})
+
+    def test_flush_writes_only_current_site(self):
+        with patch.object(metrics, "_registry", self.registry):
+            self.registry.inc("jobs_total", 2)
+            self.frappe.local.site = "b.example.com"
+            self.registry.inc("jobs_total", 3)
+
+            metrics.flush_metrics()
+
+        self.assertEqual(self.frappe.hashes, {f"b.example.com|{metrics.METRICS_KEY}": {"jobs_total": 3}})
+        self.assertEqual(self.registry.drain("a.example.com")[0], {"jobs_total": 2})
+
+
+class TestRenderPrometheus(unittest.TestCase):
+    def test_buckets_in_numeric_order(self):
+        values = {
+            'leopards_booking_db_queries_bucket{le="+Inf"}': 3,
+            'leopards_booking_db_queries_bucket{le="100"}': 3,
+            'leopards_booking_db_queries_bucket{le="25"}': 2,
+            'leopards_booking_db_queries_bucket{le="10"}': 1,
+            "leopards_booking_db_queries_sum": 57.5,
+            "leopards_booking_db_queries_count": 3,
+        }
+
+        self.assertEqual(render_prometheus(values).splitlines(), [
+            "# HELP leopards_booking_db_queries DB queries issued by one booking.",
+            "# TYPE leopards_booking_db_queries histogram",
+            'leopards_booking_db_queries_bucket{le="10"} 1',
+            'leopards_booking_db_queries_bucket{le="25"} 2',
+            'leopards_booking_db_queries_bucket{le="100"} 3',
+            'leopards_booking_db_queries_bucket{le="+Inf"} 3',
+            "leopards_booking_db_queries_count 3",
+            "leopards_booking_db_queries_sum 57.5",
+        ])
+
+    def test_labelled_series_and_unknown_metrics(self):
+        text = render_prometheus({
+            'leopards_bookings_total{outcome="failed"}': 1.0,
+            'leopards_bookings_total{outcome="booked"}': 4.0,
+            "custom_thing": 0.123456,
+        })
+
+        self.assertEqual(text.splitlines(), [
+            "# HELP custom_thing custom_thing",
+            "# TYPE custom_thing untyped",
+            "custom_thing 0.1235",
+            "# HELP leopards_bookings_total Bookings per outcome.",
+            "# TYPE leopards_bookings_total counter",
+            'leopards_bookings_total{outcome="booked"} 4',
+            'leopards_bookings_total{outcome="failed"} 1',
+        ])
+
+
+class TestHistogramQuantile(unittest.TestCase):
+    def test_quantiles(self):
+        buckets = {"50": 50, "100": 90, "250": 100, "+Inf": 100}
+
+        self.assertEqual(histogram_quantile(buckets, 0.5), 50)
+        self.assertEqual(histogram_quantile(buckets, 0.95), 250)
+        self.assertEqual(histogram_quantile({}, 0.5), 0.0)
@@ -0,0 +1,53 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import frappe
+
+from leopards_integration.services import status_taxonomy
+from leopards_integration.services.poll_schedule import (
+    MAX_POLL_MINUTES,
+    classify_poll_stage,
+    compute_next_poll_at,
+)
+
+NOW = datetime(2024, 3, 10, 12, 0)
+
+
+def _minutes(status, unchanged_polls=0, created=None):
+    return (compute_next_poll_at(status, unchanged_polls, created, NOW) - NOW) / timedelta(minutes=1)
+
+
+class TestPollSchedule(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(status_taxonomy, "get_cached_settings", lambda: frappe._dict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stage_intervals(self):
+        self.assertEqual(_minutes("Out for Delivery"), 30)
+        self.assertEqual(_minutes("Undelivered"), 30)
+        self.assertEqual(_minutes("In Transit"), 120)
+        self.assertEqual(_minutes("Pending"), 240)
+        self.assertEqual(_minutes("Weather delay"), 60)
+
+    def test_unpolled_stages_fall_back_to_unknown(self):
+        self.assertEqual(classify_poll_stage("Delivered"), "unknown")
+        self.assertEqual(classify_poll_stage("Cancelled"), "unknown")
+
+    def test_age_slows_old_parcels(self):
+        self.assertEqual(_minutes("In Transit", created=NOW - timedelta(days=7)), 120)
+        self.assertEqual(_minutes("In Transit", created=NOW - timedelta(days=8)), 240)
+        self.assertEqual(_minutes("In Transit", created=NOW - timedelta(days=15)), 480)
+
+    def test_backoff_doubles_per_unchanged_poll(self):
+        self.assertEqual(
+            [_minutes("Out for Delivery", n) for n in range(7)],
+            [30, 60, 120, 240, 480, 480, 480],
+        )
+
+    def test_capped_at_max_interval(self):
+        self.assertEqual(
+            _minutes("Pending", unchanged_polls=10, created=NOW - timedelta(days=30)),
+            MAX_POLL_MINUTES,
+        )
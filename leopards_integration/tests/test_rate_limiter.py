@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from leopards_integration.utils import rate_limiter
+from leopards_integration.utils.rate_limiter import AsyncTokenBucket, TokenBucket
+
+
+class FakeClock:
+    """
+    time.monotonic / time.sleep stand-in: sleeping advances the clock.
+    """
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for name, fake in (("monotonic", self.clock.monotonic), ("sleep", self.clock.sleep)):
+            patcher = patch.object(rate_limiter.time, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rejects_non_positive_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    def test_burst_then_empty(self):
+        bucket = TokenBucket(rate=2, burst=3)
+
+        self.assertEqual([bucket.try_acquire() for _ in range(4)], [True, True, True, False])
+
+    def test_refills_at_rate_up_to_capacity(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        for _ in range(3):
+            bucket.try_acquire()
+
+        self.clock.now += 0.5
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+        # Long idle never banks more than `burst`
+        self.clock.now += 60
+        self.assertEqual(sum(bucket.try_acquire() for _ in range(5)), 3)
+
+    def test_acquire_waits_for_next_token(self):
+        bucket = TokenBucket(rate=4, burst=1)
+
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertAlmostEqual(bucket.acquire(), 0.25)
+        self.assertAlmostEqual(sum(self.clock.slept), 0.25)
+
+    def test_sustained_rate(self):
+        bucket = TokenBucket(rate=5, burst=1)
+        start = self.clock.now
+
+        for _ in range(11):
+            bucket.acquire()
+
+        self.assertAlmostEqual(self.clock.now - start, 2.0)
+
+    def test_burst_defaults_to_rate(self):
+        self.assertEqual(TokenBucket(rate=3).capacity, 3)
+        self.assertEqual(TokenBucket(rate=0.5).capacity, 1)
+
+
+class TestAsyncTokenBucket(unittest.TestCase):
+    def test_acquire_yields_instead_of_blocking(self):
+        clock = FakeClock()
+
+        with (
+            patch.object(rate_limiter.time, "monotonic", clock.monotonic),
+            patch.object(rate_limiter.asyncio, "sleep", clock.async_sleep),
+        ):
+            bucket = AsyncTokenBucket(rate=2, burst=1)
+            waits = asyncio.run(self._acquire(bucket, 3))
+
+        self.assertEqual(waits[0], 0.0)
+        self.assertAlmostEqual(sum(waits), 1.0)
+
+    async def _acquire(self, bucket, times):
+        return [await bucket.acquire() for _ in range(times)]
@@ -0,0 +1,182 @@
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from leopards_integration.services import booking_guard
+from leopards_integration.services.booking_guard import book_packet_idempotent, find_remote_booking
+from leopards_integration.utils import retry
+from leopards_integration.utils.leopards_client import LeopardsAPIError, LeopardsTransientError
+from leopards_integration.utils.retry import backoff_delay, retry_call
+
+
+class Flaky:
+    """
+    Callable failing with the given errors, then returning "ok".
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+        return 0.0
+
+
+class RetryTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(retry, "metrics", MagicMock())
+        self.metrics = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.slept = []
+
+
+class TestRetryCall(RetryTestCase):
+    def test_retries_until_success(self):
+        fn = Flaky(ValueError(), ValueError())
+
+        self.assertEqual(retry_call(fn, attempts=3, sleep=self.slept.append), "ok")
+        self.assertEqual(fn.calls, 3)
+        self.assertEqual(len(self.slept), 2)
+
+    def test_gives_up_after_attempts(self):
+        fn = Flaky(ValueError("1"), ValueError("2"), ValueError("3"))
+
+        with self.assertRaisesRegex(ValueError, "2"):
+            retry_call(fn, attempts=2, sleep=self.slept.append)
+        self.assertEqual(fn.calls, 2)
+
+    def test_other_errors_are_not_retried(self):
+        fn = Flaky(KeyError())
+
+        with self.assertRaises(KeyError):
+            retry_call(fn, retry_on=(ValueError,), sleep=self.slept.append)
+        self.assertEqual(fn.calls, 1)
+
+    def test_before_retry_result_is_adopted(self):
+        fn = Flaky(ValueError(), ValueError())
+        seen = []
+
+        def before_retry(attempt, error):
+            seen.append((attempt, type(error)))
+            return "adopted"
+
+        self.assertEqual(retry_call(fn, before_retry=before_retry, sleep=self.slept.append), "adopted")
+        self.assertEqual(fn.calls, 1)
+        self.assertEqual(seen, [(1, ValueError)])
+
+    def test_every_attempt_takes_a_token(self):
+        limiter = CountingLimiter()
+        retry_call(Flaky(ValueError(), ValueError()), limiter=limiter, sleep=self.slept.append)
+
+        self.assertEqual(limiter.acquired, 3)
+
+    def test_retries_are_counted(self):
+        retry_call(Flaky(ValueError()), name="bookPacket", sleep=self.slept.append)
+
+        self.metrics.inc.assert_called_once_with("leopards_retries_total", operation="bookPacket")
+
+    def test_backoff_is_bounded(self):
+        for attempt in range(10):
+            self.assertTrue(0 <= backoff_delay(attempt, 1.0, 10.0) <= min(10.0, 2**attempt))
+
+
+class TestIdempotentBooking(RetryTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, value in (
+            ("get_booking_retry_attempts", lambda: 3),
+            ("retry_call", lambda fn, **kwargs: retry_call(fn, sleep=self.slept.append, **kwargs)),
+        ):
+            patcher = patch.object(booking_guard, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.payload = {"booked_packet_order_id": "DN-0001"}
+
+    def _book(self, book_packet, find_remote_booking):
+        with (
+            patch.object(booking_guard, "book_packet", book_packet),
+            patch.object(booking_guard, "find_remote_booking", find_remote_booking),
+        ):
+            return book_packet_idempotent(self.payload)
+
+    def test_adopts_booking_found_after_timeout(self):
+        book_packet = MagicMock(side_effect=LeopardsTransientError("timeout"))
+        found = {"status": 1, "track_number": "CN1", "recovered": 1}
+
+        self.assertEqual(self._book(book_packet, MagicMock(return_value=found)), found)
+        book_packet.assert_called_once()
+
+    def test_books_again_when_nothing_found(self):
+        book_packet = MagicMock(side_effect=[LeopardsTransientError("timeout"), {"track_number": "CN2"}])
+        lookup = MagicMock(return_value=None)
+
+        self.assertEqual(self._book(book_packet, lookup), {"track_number": "CN2"})
+        lookup.assert_called_once_with("DN-0001")
+
+    def test_failed_lookup_raises_original_error(self):
+        error = LeopardsTransientError("timeout")
+        book_packet = MagicMock(side_effect=error)
+
+        with self.assertRaises(LeopardsTransientError) as raised:
+            self._book(book_packet, MagicMock(side_effect=LeopardsAPIError("down")))
+
+        self.assertIs(raised.exception, error)
+        book_packet.assert_called_once()
+
+    def test_client_errors_are_not_retried(self):
+        book_packet = MagicMock(side_effect=LeopardsAPIError("invalid city"))
+        lookup = MagicMock()
+
+        with self.assertRaises(LeopardsAPIError):
+            self._book(book_packet, lookup)
+        lookup.assert_not_called()
+
+
+class TestFindRemoteBooking(unittest.TestCase):
+    def setUp(self):
+        self.windows = []
+        self.packets = [
+            {"booked_packet_order_id": "DN-0002", "track_number": "CN2"},
+            {"booked_packet_order_id": "DN-0001", "track_number": "CN1", "slip_link": "https://slip"},
+        ]
+
+        def last_status(start, end):
+            self.windows.append((start, end))
+            return self.packets
+
+        for name, value in (("nowdate", lambda: "2024-03-10"), ("get_booked_packets_last_status", last_status)):
+            patcher = patch.object(booking_guard, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_match_by_order_id(self):
+        self.assertEqual(
+            find_remote_booking("DN-0001"),
+            {"status": 1, "track_number": "CN1", "slip_link": "https://slip", "recovered": 1},
+        )
+        self.assertIsNone(find_remote_booking("DN-0003"))
+
+    def test_window_defaults_to_yesterday(self):
+        find_remote_booking("DN-0001", since="2024-03-10")
+        self.assertEqual(self.windows, [(date(2024, 3, 9), date(2024, 3, 10))])
+
+    def test_window_reaches_back_to_since(self):
+        find_remote_booking("DN-0001", since="2024-03-01 10:00:00")
+        self.assertEqual(self.windows, [(date(2024, 3, 1), date(2024, 3, 10))])
+
+    def test_window_is_capped(self):
+        find_remote_booking("DN-0001", since="2023-11-01")
+        self.assertEqual(self.windows, [(date(2024, 2, 9), date(2024, 3, 10))])
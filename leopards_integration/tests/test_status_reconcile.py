@@ -0,0 +1,100 @@
+import unittest
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from leopards_integration.services import status_reconcile, status_taxonomy
+from leopards_integration.services.status_reconcile import StatusReconciler, booking_windows
+
+
+class TestBookingWindows(unittest.TestCase):
+    def test_covers_range_oldest_first(self):
+        self.assertEqual(
+            list(booking_windows("2024-01-01", "2024-01-10", 4)),
+            [
+                (date(2024, 1, 1), date(2024, 1, 4)),
+                (date(2024, 1, 5), date(2024, 1, 8)),
+                (date(2024, 1, 9), date(2024, 1, 10)),
+            ],
+        )
+
+    def test_single_day(self):
+        self.assertEqual(
+            list(booking_windows("2024-02-29", "2024-02-29", 7)),
+            [(date(2024, 2, 29), date(2024, 2, 29))],
+        )
+
+    def test_crosses_month_end(self):
+        self.assertEqual(
+            list(booking_windows("2024-01-30", "2024-02-02", 2)),
+            [(date(2024, 1, 30), date(2024, 1, 31)), (date(2024, 2, 1), date(2024, 2, 2))],
+        )
+
+    def test_empty_when_reversed(self):
+        self.assertEqual(list(booking_windows("2024-01-10", "2024-01-01", 7)), [])
+
+
+class FakeWriter:
+    def __init__(self):
+        self.snapshots = {}
+        self.flushes = 0
+
+    def update_snapshot(self, name, values):
+        self.snapshots.setdefault(name, {}).update(values)
+
+    def log_event(self, *args, **kwargs):
+        raise AssertionError("reconcile must not write history")
+
+    def update_delivery_note(self, *args, **kwargs):
+        raise AssertionError("reconcile must not write Delivery Notes")
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestReconcileWindow(unittest.TestCase):
+    NOW = datetime(2024, 3, 5, 8, 0)
+
+    def setUp(self):
+        statuses = {
+            "CN1": "Delivered",
+            "CN2": "Arrived at origin",
+            "CN3": "Delivered",
+            "CN4": "Delivered",
+        }
+        snapshots = [
+            frappe._dict(name="TRK-1", cn_number="CN1", current_status="Out for Delivery",
+                         is_delivered=0, is_terminal=0),
+            frappe._dict(name="TRK-2", cn_number="CN2", current_status="Departed from origin",
+                         is_delivered=0, is_terminal=0),
+            frappe._dict(name="TRK-3", cn_number="CN3", current_status="Delivered",
+                         is_delivered=1, is_terminal=1),
+        ]
+
+        for patcher in (
+            patch.object(status_reconcile, "fetch_window_statuses", lambda *_: statuses),
+            patch.object(StatusReconciler, "_snapshots", lambda _self, cns: snapshots),
+            patch.object(status_reconcile, "metrics", MagicMock()),
+            patch.object(status_taxonomy, "get_cached_settings", lambda: frappe._dict()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.writer = FakeWriter()
+        self.reconciler = StatusReconciler(writer=self.writer, window_days=7)
+
+    def test_stage_change_only_schedules_a_poll(self):
+        self.reconciler.reconcile_window("2024-03-01", "2024-03-05", now=self.NOW)
+
+        self.assertEqual(self.writer.snapshots, {"TRK-1": {"next_poll_at": self.NOW, "unchanged_polls": 0}})
+        self.assertEqual(self.writer.flushes, 1)
+
+    def test_stats(self):
+        self.reconciler.reconcile_window("2024-03-01", "2024-03-05", now=self.NOW)
+
+        stats = self.reconciler.stats
+        self.assertEqual(
+            (stats["packets"], stats["changed"], stats["unchanged"], stats["terminal"], stats["unmatched"]),
+            (4, 1, 1, 1, 1),
+        )
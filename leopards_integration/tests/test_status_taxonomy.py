@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+
+import frappe
+
+from leopards_integration.services import status_taxonomy as taxonomy
+from leopards_integration.services.status_taxonomy import (
+    BOOKED,
+    CANCELLED,
+    DELIVERED,
+    EXCEPTION,
+    IN_TRANSIT,
+    LOST,
+    OUT_FOR_DELIVERY,
+    RETURNED,
+    RETURNING,
+    UNKNOWN,
+    classify_status,
+    parse_overrides,
+    stage_fields,
+)
+
+
+class TestClassifyStatus(unittest.TestCase):
+    def setUp(self):
+        self.settings = frappe._dict(status_stage_overrides="")
+        patcher = patch.object(taxonomy, "get_cached_settings", lambda: self.settings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_delivered(self):
+        self.assertEqual(classify_status("Delivered"), DELIVERED)
+        self.assertEqual(classify_status("  DELIVERED  "), DELIVERED)
+        self.assertEqual(classify_status("Shipment Delivered to consignee"), DELIVERED)
+
+    def test_negative_phrases_are_not_delivered(self):
+        self.assertEqual(classify_status("Undelivered"), EXCEPTION)
+        self.assertEqual(classify_status("Not Delivered - consignee not available"), EXCEPTION)
+        self.assertEqual(classify_status("Delivery attempted"), EXCEPTION)
+
+    def test_returns(self):
+        self.assertEqual(classify_status("Returned"), RETURNED)
+        self.assertEqual(classify_status("Return Delivered"), RETURNED)
+        self.assertEqual(classify_status("Returned to shipper"), RETURNED)
+        self.assertEqual(classify_status("Being Return"), RETURNING)
+        self.assertEqual(classify_status("RTS"), RETURNED)
+
+    def test_lost(self):
+        self.assertEqual(classify_status("lost"), LOST)
+        self.assertEqual(classify_status("Shipment Lost"), LOST)
+
+    def test_terminal_words_inside_free_text_are_not_terminal(self):
+        for status in (
+            "Consignee address missing",
+            "Incomplete address - phone missing",
+            "Missing Route",
+            "Shipment Missing",
+        ):
+            with self.subTest(status=status):
+                self.assertEqual(classify_status(status), EXCEPTION)
+
+        self.assertEqual(classify_status("Delivered - refused by consignee"), EXCEPTION)
+        self.assertEqual(classify_status("Cancellation requested by shipper"), UNKNOWN)
+        self.assertEqual(classify_status("Parcel reported lost, under investigation"), UNKNOWN)
+        self.assertEqual(stage_fields("Consignee address missing")["is_terminal"], 0)
+
+    def test_in_flight_stages(self):
+        self.assertEqual(classify_status("Pending"), BOOKED)
+        self.assertEqual(classify_status("Departed from origin"), IN_TRANSIT)
+        self.assertEqual(classify_status("Out for Delivery"), OUT_FOR_DELIVERY)
+        self.assertEqual(classify_status("Cancelled"), CANCELLED)
+
+    def test_status_code_is_matched_exactly(self):
+        # "rts" inside "departs" must not read as Return To Shipper
+        self.assertEqual(classify_status("Departs hub"), UNKNOWN)
+
+    def test_unknown(self):
+        self.assertEqual(classify_status(""), UNKNOWN)
+        self.assertEqual(classify_status(None), UNKNOWN)
+        self.assertEqual(classify_status("Weather delay"), UNKNOWN)
+
+    def test_site_overrides(self):
+        self.settings.status_stage_overrides = "Weather delay = exception\nHOLD = lost"
+        self.assertEqual(classify_status("weather   delay"), EXCEPTION)
+        self.assertEqual(classify_status("hold"), LOST)
+
+    def test_stage_fields(self):
+        self.assertEqual(stage_fields("Delivered"), {"tracking_stage": DELIVERED, "is_terminal": 1})
+        self.assertEqual(stage_fields("Undelivered"), {"tracking_stage": EXCEPTION, "is_terminal": 0})
+
+
+class TestParseOverrides(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_overrides("Weather Delay = exception\nRTO=Returned\n  Out  For Delivery = out for delivery"),
+            {
+                "weather delay": EXCEPTION,
+                "rto": RETURNED,
+                "out for delivery": OUT_FOR_DELIVERY,
+            },
+        )
+
+    def test_ignores_invalid_lines(self):
+        self.assertEqual(parse_overrides("no separator\n= delivered\nfoo = bogus"), {})
+        self.assertEqual(parse_overrides(None), {})
+
+    def test_last_separator_splits(self):
+        self.assertEqual(parse_overrides("a = b = lost"), {"a = b": LOST})
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import frappe
+
+from leopards_integration.services import tracking_engine
+from leopards_integration.services.tracking_engine import sync_due_tracking
+
+IDLE = {"polled": 0, "skipped": 0, "written": 0, "failed": 0}
+
+
+class TestSyncDueTracking(unittest.TestCase):
+    def setUp(self):
+        self.settings = frappe._dict(enabled=1)
+        self.rows = []
+        self.engine = MagicMock()
+        self.engine.run.return_value = {"polled": 2}
+
+        for name, value in (
+            ("get_cached_settings", lambda: self.settings),
+            ("get_due_tracking_rows", MagicMock(side_effect=lambda *args: self.rows)),
+            ("TrackingEngine", MagicMock(side_effect=AssertionError("engine built"))),
+        ):
+            patcher = patch.object(tracking_engine, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_disabled_integration_is_a_no_op(self):
+        self.settings.enabled = 0
+
+        self.assertEqual(sync_due_tracking(100), IDLE)
+        tracking_engine.get_due_tracking_rows.assert_not_called()
+
+    def test_no_due_rows_builds_no_engine(self):
+        self.assertEqual(sync_due_tracking(100), IDLE)
+
+    def test_due_rows_go_through_the_engine(self):
+        self.rows = [frappe._dict(cn_number="CN1"), frappe._dict(cn_number="CN2")]
+
+        self.assertEqual(sync_due_tracking(100, engine=self.engine), {"polled": 2})
+        self.assertEqual(self.engine.run.call_args.args[0], self.rows)
@@ -0,0 +1,145 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import frappe
+
+from leopards_integration.api.tracking import event_hash, packet_timeline
+from leopards_integration.services import status_taxonomy
+from leopards_integration.services.tracking_engine import apply_tracking_result, new_timeline_events
+
+
+def _packet(*scans):
+    return {
+        "Tracking Detail": [
+            {"Status": status, "Activity_datetime": stamp, "Reason": reason}
+            for status, stamp, reason in scans
+        ]
+    }
+
+
+PACKET = _packet(
+    ("Arrived at destination", "2024-03-02 09:00:00", ""),
+    ("Pickup", "2024-03-01 10:00:00", ""),
+    ("Delivered", "2024-03-03 15:30:00", "Received by owner"),
+)
+
+
+class TestEventHash(unittest.TestCase):
+    def test_stable_and_content_based(self):
+        event = frappe._dict(status="Delivered", event_time=datetime(2024, 3, 3, 15, 30), reason="")
+
+        self.assertEqual(event_hash("CN1", event), event_hash(" CN1 ", event))
+        self.assertNotEqual(event_hash("CN1", event), event_hash("CN2", event))
+        self.assertNotEqual(
+            event_hash("CN1", event), event_hash("CN1", frappe._dict(event, reason="Refused"))
+        )
+
+
+class TestNewTimelineEvents(unittest.TestCase):
+    def test_timeline_sorted_oldest_first(self):
+        self.assertEqual(
+            [e.status for e in packet_timeline(PACKET)],
+            ["Pickup", "Arrived at destination", "Delivered"],
+        )
+
+    def test_all_scans_without_pointer(self):
+        row = frappe._dict(cn_number="CN1")
+        events = new_timeline_events(row, PACKET)
+
+        self.assertEqual([e.status for e in events], ["Pickup", "Arrived at destination", "Delivered"])
+        self.assertEqual(events[0].name, event_hash("CN1", events[0]))
+
+    def test_only_scans_after_pointer(self):
+        latest = new_timeline_events(frappe._dict(cn_number="CN1"), PACKET)[1]
+        row = frappe._dict(cn_number="CN1", last_scan=latest.name, last_scan_time=latest.event_time)
+
+        self.assertEqual([e.status for e in new_timeline_events(row, PACKET)], ["Delivered"])
+
+    def test_same_time_different_scan_is_kept(self):
+        row = frappe._dict(
+            cn_number="CN1", last_scan="other", last_scan_time=datetime(2024, 3, 2, 9, 0)
+        )
+
+        self.assertEqual(
+            [e.status for e in new_timeline_events(row, PACKET)],
+            ["Arrived at destination", "Delivered"],
+        )
+
+    def test_scans_without_timestamp_are_skipped(self):
+        packet = _packet(("Pickup", "", ""), ("Delivered", "2024-03-03 15:30:00", ""))
+
+        self.assertEqual(
+            [e.status for e in new_timeline_events(frappe._dict(cn_number="CN1"), packet)],
+            ["Delivered"],
+        )
+
+
+class RecordingWriter:
+    """
+    TrackingWriter stand-in that keeps what would be written.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.snapshots = {}
+        self.delivery_notes = {}
+
+    def log_event(self, delivery_note, cn, status, event_time, name=None, reason=None):
+        name = name or f"poll-{len(self.events)}"
+        self.events.append((name, status, event_time))
+        return name
+
+    def update_snapshot(self, name, values):
+        self.snapshots.setdefault(name, {}).update(values)
+
+    def update_delivery_note(self, name, values):
+        self.delivery_notes.setdefault(name, {}).update(values)
+
+
+class TestApplyTrackingResult(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(status_taxonomy, "get_cached_settings", lambda: frappe._dict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.writer = RecordingWriter()
+        self.row = frappe._dict(
+            name="TRK-1", delivery_note="DN-1", cn_number="CN1",
+            current_status="Pickup", unchanged_polls=0, creation=datetime(2024, 3, 1, 10, 0),
+        )
+
+    def _apply(self, packet, now):
+        apply_tracking_result(self.writer, self.row, packet, now)
+        self.row.update(self.writer.snapshots["TRK-1"])
+
+    def test_status_without_scans_keeps_the_scan_pointer(self):
+        self._apply({"current_status": "Arrived at destination"}, datetime(2024, 3, 5, 8, 0))
+
+        snapshot = self.writer.snapshots["TRK-1"]
+        self.assertEqual(snapshot["last_event_time"], datetime(2024, 3, 5, 8, 0))
+        self.assertNotIn("last_scan_time", snapshot)
+
+        # The courier's scans arrive later, all older than the poll-time event
+        self._apply(PACKET, datetime(2024, 3, 5, 9, 0))
+
+        self.assertEqual(
+            [status for _name, status, _time in self.writer.events],
+            ["Arrived at destination", "Pickup", "Arrived at destination", "Delivered"],
+        )
+        self.assertEqual(self.row.last_scan_time, datetime(2024, 3, 3, 15, 30))
+
+    def test_delivered_on_is_the_delivered_scan_time(self):
+        packet = _packet(
+            ("Pickup", "2024-03-01 10:00:00", ""),
+            ("Delivered", "2024-03-03 15:30:00", ""),
+            ("Shipment closed", "2024-03-04 09:00:00", ""),
+        )
+        packet["current_status"] = "Delivered"
+
+        self._apply(packet, datetime(2024, 3, 5, 8, 0))
+
+        self.assertEqual(
+            self.writer.delivery_notes["DN-1"]["custom_leopards_delivered_on"], datetime(2024, 3, 3, 15, 30)
+        )
+        self.assertEqual(self.writer.snapshots["TRK-1"]["is_terminal"], 1)
@@ -0,0 +1,89 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from leopards_integration.scheduler import tracking_sync
+from leopards_integration.scheduler.tracking_sync import SYNC_SLOT_SECONDS, shard_done_name
+
+# The undecorated job: no job metrics / flush in these tests
+sync_tracking_shards = tracking_sync.sync_tracking_shards.__wrapped__
+
+STATS = {"polled": 1, "skipped": 0, "written": 1, "failed": 0}
+
+
+class FreeLease:
+    def __init__(self):
+        self.lost = threading.Event()
+
+    def acquire(self):
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class TestShardRuns(unittest.TestCase):
+    def setUp(self):
+        self.redis = {}
+        self.synced = []
+        self.enqueue = MagicMock()
+
+        fake_frappe = SimpleNamespace(
+            cache=lambda: SimpleNamespace(get=self.redis.get, set=self._set),
+            enqueue=self.enqueue,
+        )
+
+        for name, value in (
+            ("frappe", fake_frappe),
+            ("get_tracking_sharding", lambda: (3, 2)),
+            ("get_tracking_sync_limit", lambda: 300),
+            ("site_key", lambda name: name),
+            ("get_lease", lambda name, ttl: FreeLease()),
+            ("sync_tracking_shard", self._sync),
+        ):
+            patcher = patch.object(tracking_sync, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _set(self, key, value, ex=None):
+        self.redis[key] = value
+
+    def _sync(self, shard, shards, limit, deadline, stop=None):
+        self.synced.append((shard, limit))
+        return dict(STATS)
+
+    def test_every_shard_once_per_slot(self):
+        totals = sync_tracking_shards(slot=100)
+
+        self.assertEqual(sorted(self.synced), [(0, 100), (1, 100), (2, 100)])
+        self.assertEqual(totals["polled"], 3)
+
+        # A second worker in the same slot finds nothing left
+        self.synced.clear()
+        sync_tracking_shards(slot=100)
+        self.assertEqual(self.synced, [])
+
+    def test_next_slot_starts_with_every_shard_pending(self):
+        sync_tracking_shards(slot=100)
+        self.synced.clear()
+
+        sync_tracking_shards(slot=101)
+        self.assertEqual(len(self.synced), 3)
+        self.assertIn(shard_done_name(101, 0), self.redis)
+
+    def test_cron_only_enqueues_workers(self):
+        with patch.object(tracking_sync.time, "time", lambda: 100 * SYNC_SLOT_SECONDS + 5):
+            self.assertIsNone(tracking_sync.sync_leopards_tracking())
+
+        self.assertEqual(self.synced, [])
+        self.assertEqual(
+            [(c.kwargs["queue"], c.kwargs["job_id"], c.kwargs["slot"]) for c in self.enqueue.call_args_list],
+            [
+                ("long", "leopards_tracking_sync_worker:0", 100),
+                ("long", "leopards_tracking_sync_worker:1", 100),
+            ],
+        )
@@ -0,0 +1,124 @@
+import frappe
+from frappe.model.naming import set_new_name
+from frappe.utils import now_datetime
+
+# -------------------------------------------------------------------------
+# Set-based writes (no document hooks, no Version rows)
+# -------------------------------------------------------------------------
+
+def chunked(items, size):
+    items = list(items)
+    size = max(1, int(size))
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def new_name(doctype, values=None) -> str:
+    """
+    Name for a row written set-based, following the DocType's autoname.
+
+    Hash-named DocTypes get a random hash without a DB round trip; any
+    other rule (naming series, format:, field:, autoincrement) goes
+    through frappe's own naming on an unsaved document.
+    """
+    autoname = (frappe.get_meta(doctype).autoname or "").strip().lower()
+    if autoname in ("", "hash", "prompt"):
+        return frappe.generate_hash(length=10)
+
+    doc = frappe.new_doc(doctype)
+    doc.update(values or {})
+    set_new_name(doc)
+    return doc.name
+
+
+def bulk_insert_docs(doctype, rows, chunk_size=1000, ignore_duplicates=False) -> int:
+    """
+    Multi-row INSERT for plain records.
+
+    Each row is a dict of field values. Standard columns (name, owner,
+    creation, modified, modified_by, docstatus) are filled in when missing;
+    `name` follows the DocType's autoname (see new_name).
+    """
+    if not rows:
+        return 0
+
+    now = now_datetime()
+    user = frappe.session.user
+
+    defaults = {
+        "owner": user,
+        "modified_by": user,
+        "creation": now,
+        "modified": now,
+        "docstatus": 0,
+    }
+
+    fields = ["name", *defaults]
+    for row in rows:
+        for f in row:
+            if f not in fields:
+                fields.append(f)
+
+    values = []
+    for row in rows:
+        record = {**defaults, **row}
+        record.setdefault("name", None)
+        if not record["name"]:
+            record["name"] = new_name(doctype, row)
+        values.append(tuple(record.get(f) for f in fields))
+
+    frappe.db.bulk_insert(
+        doctype,
+        fields,
+        values,
+        ignore_duplicates=ignore_duplicates,
+        chunk_size=chunk_size,
+    )
+
+    return len(values)
+
+
+def bulk_update(doctype, updates, chunk_size=500, update_modified=True) -> int:
+    """
+    Set-based UPDATE for {name: {field: value}}, one statement per chunk:
+
+        UPDATE `tabX`
+        SET f = CASE `name` WHEN %s THEN %s ... ELSE f END, ...
+        WHERE `name` IN (...)
+    """
+    if not updates:
+        return 0
+
+    table = f"`tab{doctype}`"
+    now = now_datetime()
+    user = frappe.session.user
+
+    for names in chunked(updates, chunk_size):
+        fields = sorted({f for name in names for f in updates[name]})
+
+        assignments = []
+        values = []
+
+        for f in fields:
+            cases = []
+            for name in names:
+                if f in updates[name]:
+                    cases.append("WHEN %s THEN %s")
+                    values.extend((name, updates[name][f]))
+
+            assignments.append(f"`{f}` = CASE `name` {' '.join(cases)} ELSE `{f}` END")
+
+        if update_modified:
+            assignments.append("`modified` = %s")
+            assignments.append("`modified_by` = %s")
+            values.extend((now, user))
+
+        placeholders = ", ".join(["%s"] * len(names))
+        values.extend(names)
+
+        frappe.db.sql(
+            f"UPDATE {table} SET {', '.join(assignments)} WHERE `name` IN ({placeholders})",
+            values,
+        )
+
+    return len(updates)
@@ -0,0 +1,53 @@
+import threading
+
+import frappe
+
+
+class VersionedCache:
+    """
+    Process-level cache, one entry per site.
+
+    Workers keep the loaded value in memory and only compare a small
+    version key in Redis on each read. `invalidate()` bumps the version
+    once the current transaction commits, so every worker on every node
+    reloads the committed value on its next access.
+    """
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self.loader = loader
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version_key(self) -> str:
+        return f"leopards_integration:{self.name}:version"
+
+    def _current_version(self):
+        return frappe.cache().get_value(self.version_key)
+
+    def get(self):
+        site = frappe.local.site
+        version = self._current_version()
+
+        entry = self._entries.get(site)
+        if entry and entry[0] == version:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(site)
+            if entry and entry[0] == version:
+                return entry[1]
+
+            value = self.loader()
+            self._entries[site] = (version, value)
+            return value
+
+    def invalidate(self):
+        # Bumping before the commit would let a worker load the old,
+        # still-committed row and keep it under the new version
+        frappe.db.after_commit.add(self._bump)
+
+    def _bump(self):
+        frappe.cache().set_value(self.version_key, frappe.generate_hash(length=12))
+        self._entries.pop(frappe.local.site, None)
@@ -0,0 +1,194 @@
+import time
+
+import frappe
+import requests
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_OPEN_SECONDS = 60
+DEFAULT_SLOW_CALL_MS = 15000
+
+# Failure counter forgets isolated errors after this long
+FAILURE_WINDOW_SECONDS = 300
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of calling Leopards while the endpoint's circuit is open.
+    Subclasses requests.ConnectionError so every endpoint's existing
+    connection-error handling applies unchanged.
+    """
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker with its state in Redis, so all workers
+    on all nodes agree.
+
+    closed    → calls pass; consecutive failures / slow calls are counted
+    open      → calls fail fast with CircuitOpenError for `open_seconds`
+    half-open → after the cool-down ONE worker gets a probe call;
+                success closes the circuit, failure re-opens it
+
+    Keys and the Redis connection are resolved up front, so instances can
+    be used from threads without frappe.local.
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        redis,
+        key_prefix,
+        failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+        open_seconds=DEFAULT_OPEN_SECONDS,
+        slow_call_ms=DEFAULT_SLOW_CALL_MS,
+    ):
+        self.endpoint = endpoint
+        self.redis = redis
+        self.failure_threshold = int(failure_threshold)
+        self.open_seconds = float(open_seconds)
+        self.slow_call_ms = float(slow_call_ms)
+
+        self._failures_key = f"{key_prefix}:failures"
+        self._opened_at_key = f"{key_prefix}:opened_at"
+        self._probe_key = f"{key_prefix}:probe"
+
+    # ---------------------------------------------------------------
+    # State
+    # ---------------------------------------------------------------
+
+    def _opened_at(self):
+        value = self.redis.get(self._opened_at_key)
+        return float(value) if value else None
+
+    def state(self) -> str:
+        try:
+            opened_at = self._opened_at()
+        except Exception:
+            return "closed"
+
+        if opened_at is None:
+            return "closed"
+        if time.time() - opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+
+    def status(self) -> dict:
+        try:
+            failures = int(self.redis.get(self._failures_key) or 0)
+        except Exception:
+            failures = 0
+
+        return {
+            "endpoint": self.endpoint,
+            "state": self.state(),
+            "failures": failures,
+        }
+
+    # ---------------------------------------------------------------
+    # Call protocol
+    # ---------------------------------------------------------------
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError unless a call may go out now.
+        Redis trouble never blocks calls (fails open).
+        """
+        state = self.state()
+
+        if state == "closed":
+            return
+
+        if state == "half_open":
+            try:
+                # Only one probe in flight across all workers
+                probe_ttl = max(1, int(self.open_seconds))
+                if self.redis.set(self._probe_key, 1, nx=True, ex=probe_ttl):
+                    return
+            except Exception:
+                return
+
+        raise CircuitOpenError(f"Leopards {self.endpoint} circuit open - failing fast")
+
+    def record(self, ok: bool, elapsed_ms: float = 0):
+        if ok and elapsed_ms > self.slow_call_ms:
+            ok = False
+
+        try:
+            if ok:
+                self._on_success()
+            else:
+                self._on_failure()
+        except Exception:
+            pass
+
+    def _on_success(self):
+        if self.redis.get(self._opened_at_key) or self.redis.get(self._failures_key):
+            self.redis.delete(self._failures_key, self._opened_at_key, self._probe_key)
+
+    def _on_failure(self):
+        if self._opened_at() is not None:
+            # Failed probe (or straggler) → restart the cool-down
+            self._open()
+            return
+
+        failures = self.redis.incr(self._failures_key)
+        self.redis.expire(self._failures_key, FAILURE_WINDOW_SECONDS)
+
+        if failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.redis.set(self._opened_at_key, time.time())
+        self.redis.delete(self._probe_key)
+
+    def reset(self):
+        self.redis.delete(self._failures_key, self._opened_at_key, self._probe_key)
+
+
+def is_failure_response(resp) -> bool:
+    """
+    Server-side trouble counts against the circuit; 4xx client errors do not.
+    """
+    return resp.status_code >= 500 or resp.status_code == 429
+
+
+def get_circuit_breaker(endpoint, settings=None) -> CircuitBreaker:
+    """
+    Breaker for one Leopards endpoint on the current site
+    (thresholds from Leopards Settings → Circuit Breaker fields).
+    """
+    settings = settings or frappe._dict()
+    cache = frappe.cache()
+
+    def _num(fieldname, default):
+        try:
+            value = float(settings.get(fieldname) or 0)
+        except (TypeError, ValueError):
+            value = 0
+        return value if value > 0 else default
+
+    key_prefix = cache.make_key(f"leopards_integration:circuit:{endpoint}")
+    if isinstance(key_prefix, bytes):
+        key_prefix = key_prefix.decode()
+
+    return CircuitBreaker(
+        endpoint,
+        redis=cache,
+        key_prefix=key_prefix,
+        failure_threshold=_num("circuit_failure_threshold", DEFAULT_FAILURE_THRESHOLD),
+        open_seconds=_num("circuit_open_seconds", DEFAULT_OPEN_SECONDS),
+        slow_call_ms=_num("circuit_slow_call_ms", DEFAULT_SLOW_CALL_MS),
+    )
+
+
+@frappe.whitelist()
+def get_circuit_status():
+    """
+    Current breaker state for every Leopards endpoint on this site.
+    """
+    frappe.only_for("System Manager")
+
+    from leopards_integration.utils.leopards_client import ENDPOINTS, get_cached_settings
+
+    settings = get_cached_settings()
+    return [get_circuit_breaker(endpoint, settings).status() for endpoint in ENDPOINTS]
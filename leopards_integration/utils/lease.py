@@ -0,0 +1,111 @@
+import os
+import socket
+import threading
+
+import frappe
+
+DEFAULT_LEASE_SECONDS = 120
+
+# Extend only while we still own the key / delete only our own key
+_RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    """
+    Expiring Redis lease with a heartbeat - one holder at a time across
+    all workers and nodes.
+
+    acquire()  → SET NX EX with a unique token
+    heartbeat  → background thread re-extends the TTL every ttl/3 seconds
+                 while the token is still ours; a failed renewal sets `lost`
+    release()  → deletes the key only if the token is still ours
+
+    A holder that dies stops heart-beating, so its lease expires after
+    `ttl` seconds and another worker can claim it. The Redis connection is
+    resolved up front; the heartbeat thread never touches frappe.local.
+    """
+
+    def __init__(self, redis, key, ttl=DEFAULT_LEASE_SECONDS):
+        self.redis = redis
+        self.key = key
+        self.ttl = max(3, int(ttl))
+        self.token = f"{worker_id()}:{frappe.generate_hash(length=8)}"
+
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self) -> bool:
+        if not self.redis.set(self.key, self.token, nx=True, ex=self.ttl):
+            return False
+
+        self.lost.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+        return True
+
+    def renew(self) -> bool:
+        try:
+            return bool(self.redis.eval(_RENEW, 1, self.key, self.token, self.ttl))
+        except Exception:
+            return False
+
+    def release(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        try:
+            self.redis.eval(_RELEASE, 1, self.key, self.token)
+        except Exception:
+            pass
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3):
+            if not self.renew():
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def site_key(name) -> str:
+    key = frappe.cache().make_key(name)
+    return key.decode() if isinstance(key, bytes) else key
+
+
+def get_lease(name, ttl=DEFAULT_LEASE_SECONDS) -> Lease:
+    """
+    Lease on `name` for the current site (not yet acquired).
+    """
+    return Lease(frappe.cache(), site_key(name), ttl)
+
+
+def lease_holder(name):
+    """
+    Token of the current holder of `name`, or None.
+    """
+    value = frappe.cache().get(site_key(name))
+    return value.decode() if isinstance(value, bytes) else value
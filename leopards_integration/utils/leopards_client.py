@@ -1,19 +1,73 @@
 import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import requests
+from requests.adapters import HTTPAdapter
 import frappe
 from frappe.utils.password import get_decrypted_password
 
+from leopards_integration.utils import metrics
+from leopards_integration.utils.cache import VersionedCache
+from leopards_integration.utils.circuit_breaker import (
+    CircuitOpenError,
+    get_circuit_breaker,
+    is_failure_response,
+)
+
 
 class LeopardsAPIError(Exception):
     pass
 
 
+class LeopardsTransientError(LeopardsAPIError):
+    """
+    Timeout, connection drop, HTTP 5xx/429 or unreadable reply:
+    safe to retry, but the request MAY have been processed by Leopards.
+    """
+
+
 # -------------------------------------------------------------------------
 # Settings & Credentials
 # -------------------------------------------------------------------------
 
+def _load_settings():
+    """
+    Resolve Leopards Settings once per version: field values + base URL.
+    The API password is decrypted lazily (see _get_api_password) and
+    then kept on the same snapshot.
+    """
+    doc = frappe.get_single("Leopards Settings")
+
+    settings = frappe._dict(doc.as_dict(no_default_fields=True))
+    settings._base_url = _configured_base_url(doc)
+    settings._api_password = None
+
+    return settings
+
+
+_settings_cache = VersionedCache("settings", _load_settings)
+
+
+def get_cached_settings():
+    """
+    Process-level Leopards Settings snapshot (read-only).
+    No DB access until Leopards Settings is saved again.
+    """
+    return _settings_cache.get()
+
+
+def invalidate_settings_cache(doc=None, method=None):
+    """
+    doc_events hook: Leopards Settings → on_update.
+    """
+    _settings_cache.invalidate()
+
+
 def _get_settings():
-    settings = frappe.get_single("Leopards Settings")
+    settings = get_cached_settings()
     if not settings.enabled:
         frappe.throw("Leopards Integration is disabled in Leopards Settings.")
     return settings
@@ -22,14 +76,21 @@ def _get_settings():
 def _get_api_password(settings) -> str:
     """
     Robust password retrieval for Single DocType.
+    Cached on the settings snapshot after the first decryption.
     """
-    try:
-        pw = settings.get_password("api_password")
-        if pw:
-            return pw
-    except Exception:
-        pass
+    if settings.get("_api_password"):
+        return settings._api_password
+
+    pw = _decrypt_api_password(settings)
 
+    if isinstance(settings, dict):
+        settings["_api_password"] = pw
+
+    return pw
+
+
+def _decrypt_api_password(settings) -> str:
+    # The snapshot is a plain frappe._dict: decrypt straight from __Auth
     try:
         return get_decrypted_password(
             "Leopards Settings",
@@ -72,10 +133,39 @@ def _normalize_base_url(url: str) -> str:
     return u.rstrip("/")
 
 
+_base_url_override = None
+
+
+@contextmanager
+def override_base_url(url: str):
+    """
+    Point every endpoint at another Leopards-compatible host for this
+    process (e.g. the local simulator in leopards_integration.benchmark).
+    """
+    global _base_url_override
+
+    previous = _base_url_override
+    _base_url_override = _normalize_base_url(url)
+    try:
+        yield _base_url_override
+    finally:
+        _base_url_override = previous
+
+
 def _resolve_base_url(settings) -> str:
     """
     Returns normalized Leopards base URL WITHOUT /api
     """
+    if _base_url_override:
+        return _base_url_override
+
+    if settings.get("_base_url"):
+        return settings._base_url
+
+    return _configured_base_url(settings)
+
+
+def _configured_base_url(settings) -> str:
     if settings.base_url:
         return _normalize_base_url(settings.base_url)
 
@@ -85,6 +175,236 @@ def _resolve_base_url(settings) -> str:
     return "https://merchantapistaging.leopardscourier.com"
 
 
+# -------------------------------------------------------------------------
+# Pooled HTTP Client (one per worker process)
+# -------------------------------------------------------------------------
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+
+USER_AGENT = "ERPNext-Leopards-Integration"
+
+ENDPOINTS = (
+    "bookPacket",
+    "getAllCities",
+    "printCN",
+    "trackBookedPacket",
+    "getBookedPacketLastStatus",
+)
+
+
+class LeopardsHTTPClient:
+    """
+    Keep-alive HTTP client shared by every Leopards endpoint in a worker.
+
+    - One requests.Session → TCP/TLS connections are reused between calls
+    - Pool size and (connect, read) timeouts come from Leopards Settings
+    - Every request is timed; `stats()` returns per-endpoint totals,
+      including how many requests had to open a new connection
+    """
+
+    def __init__(
+        self,
+        pool_size=DEFAULT_POOL_SIZE,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+    ):
+        self.pool_size = int(pool_size)
+        self.connect_timeout = float(connect_timeout)
+        self.read_timeout = float(read_timeout)
+
+        self._adapter = HTTPAdapter(
+            pool_connections=2,  # staging + production hosts
+            pool_maxsize=self.pool_size,
+            max_retries=0,
+        )
+
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def config(self) -> tuple:
+        return (self.pool_size, self.connect_timeout, self.read_timeout)
+
+    def request(self, method: str, endpoint: str, url: str, breaker=None, **kwargs):
+        """
+        Request through the shared pool.
+
+        With a `breaker` (utils.circuit_breaker), an open circuit raises
+        CircuitOpenError before any I/O, and the outcome is reported back.
+
+        The returned response carries `leopards_timing`:
+          {endpoint, elapsed_ms, new_connection, failed, status}
+        and is recorded in utils.metrics (latency histogram, status class).
+        """
+        if breaker:
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                metrics.inc("leopards_http_requests_total", endpoint=endpoint, status="circuit_open")
+                raise
+
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+
+        opened = self._connections_opened()
+        started = time.perf_counter()
+
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._record(endpoint, started, opened, failed=True)
+            if breaker:
+                breaker.record(False)
+            raise
+
+        resp.leopards_timing = self._record(endpoint, started, opened, status=resp.status_code)
+        if breaker:
+            breaker.record(not is_failure_response(resp), resp.leopards_timing["elapsed_ms"])
+
+        return resp
+
+    def post(self, endpoint: str, url: str, breaker=None, **kwargs):
+        return self.request("POST", endpoint, url, breaker=breaker, **kwargs)
+
+    def get(self, endpoint: str, url: str, breaker=None, **kwargs):
+        return self.request("GET", endpoint, url, breaker=breaker, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for endpoint, s in self._stats.items():
+                row = dict(s)
+                row["avg_ms"] = round(s["total_ms"] / s["requests"], 2) if s["requests"] else 0
+                out[endpoint] = row
+            return out
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {}
+
+    def _connections_opened(self) -> int:
+        pools = self._adapter.poolmanager.pools
+        return sum(
+            pool.num_connections
+            for pool in (pools.get(key) for key in pools.keys())
+            if pool is not None
+        )
+
+    def _record(self, endpoint, started, opened, failed=False, status=None) -> dict:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        new_connection = self._connections_opened() > opened
+
+        with self._lock:
+            s = self._stats.setdefault(endpoint, {
+                "requests": 0,
+                "failures": 0,
+                "new_connections": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+            })
+            s["requests"] += 1
+            s["failures"] += 1 if failed else 0
+            s["new_connections"] += 1 if new_connection else 0
+            s["total_ms"] = round(s["total_ms"] + elapsed_ms, 2)
+            s["max_ms"] = max(s["max_ms"], elapsed_ms)
+
+        timing = {
+            "endpoint": endpoint,
+            "elapsed_ms": elapsed_ms,
+            "new_connection": new_connection,
+            "failed": failed,
+            "status": status,
+        }
+
+        metrics.record_request(timing)
+
+        for listener in list(_timing_listeners):
+            listener(timing)
+
+        return timing
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+# Callables receiving every request's timing dict (benchmarks, metrics)
+_timing_listeners = []
+
+
+def add_timing_listener(fn):
+    _timing_listeners.append(fn)
+
+
+def remove_timing_listener(fn):
+    if fn in _timing_listeners:
+        _timing_listeners.remove(fn)
+
+
+def _http_config(settings=None) -> tuple:
+    def _num(fieldname, default, cast):
+        try:
+            value = cast(settings.get(fieldname) or 0) if settings else 0
+        except (TypeError, ValueError):
+            value = 0
+        return value if value > 0 else default
+
+    return (
+        _num("http_pool_size", DEFAULT_POOL_SIZE, int),
+        _num("http_connect_timeout", DEFAULT_CONNECT_TIMEOUT, float),
+        _num("http_read_timeout", DEFAULT_READ_TIMEOUT, float),
+    )
+
+
+def get_http_client(settings=None) -> LeopardsHTTPClient:
+    """
+    Return this worker's shared client.
+
+    Rebuilt after a fork (sessions must not cross processes) or when
+    pool size / timeouts change in Leopards Settings.
+    """
+    global _client, _client_pid
+
+    config = _http_config(settings)
+    pid = os.getpid()
+
+    with _client_lock:
+        if _client is None or _client_pid != pid or _client.config() != config:
+            if _client is not None and _client_pid == pid:
+                _client.close()
+            _client = LeopardsHTTPClient(*config)
+            _client_pid = pid
+
+        return _client
+
+
+def _post(settings, endpoint: str, url: str, **kwargs):
+    """
+    Shared client + this site's circuit breaker for `endpoint`.
+    """
+    return get_http_client(settings).post(
+        endpoint,
+        url,
+        breaker=get_circuit_breaker(endpoint, settings),
+        **kwargs,
+    )
+
+
+def get_http_stats() -> dict:
+    """
+    Per-endpoint request timing for this worker (see LeopardsHTTPClient.stats).
+    """
+    return _client.stats() if _client is not None and _client_pid == os.getpid() else {}
+
+
 # -------------------------------------------------------------------------
 # Booking API
 # -------------------------------------------------------------------------
@@ -100,23 +420,27 @@ def book_packet(payload: dict) -> dict:
     payload["api_password"] = api_password
 
     try:
-        resp = requests.post(
+        resp = _post(
+            settings,
+            "bookPacket",
             url,
             data=payload,  # FORM-DATA (REQUIRED)
-            timeout=30,
         )
-    except requests.RequestException as e:
+    except CircuitOpenError as e:
         raise LeopardsAPIError(f"Leopards API connection error: {e}") from e
+    except requests.RequestException as e:
+        raise LeopardsTransientError(f"Leopards API connection error: {e}") from e
 
     if resp.status_code != 200:
-        raise LeopardsAPIError(
+        error_cls = LeopardsTransientError if is_failure_response(resp) else LeopardsAPIError
+        raise error_cls(
             f"Leopards HTTP {resp.status_code}: {resp.text}"
         )
 
     try:
         data = resp.json()
     except Exception:
-        raise LeopardsAPIError(
+        raise LeopardsTransientError(
             f"Invalid JSON response from Leopards: {resp.text}"
         )
 
@@ -152,11 +476,12 @@ def get_all_cities() -> dict:
     }
 
     try:
-        resp = requests.post(
+        resp = _post(
+            settings,
+            "getAllCities",
             url,
             json=payload,
             headers={"Content-Type": "application/json"},
-            timeout=30,
         )
     except requests.RequestException as e:
         raise LeopardsAPIError(f"Leopards connection error: {e}") from e
@@ -177,9 +502,10 @@ def get_all_cities() -> dict:
         raise LeopardsAPIError(f"Leopards API error: {data}")
 
     return data
-def print_cn(cn_number: str) -> dict:
+def print_cn(cn_number) -> dict:
     """
     Fetch packing slip / CN print from Leopards.
+    Accepts one CN or a list of CNs (sent comma-separated in ONE call).
 
     Endpoint:
       POST <base_url>/api/printCN/format/json/
@@ -188,9 +514,12 @@ def print_cn(cn_number: str) -> dict:
       {
         api_key,
         api_password,
-        cn_numbers: "CN123456"
+        cn_numbers: "CN123456,CN123457"
       }
     """
+    if isinstance(cn_number, (list, tuple, set)):
+        cn_number = ",".join(str(cn).strip() for cn in cn_number if cn)
+
     settings = _get_settings()
     base_url = _resolve_base_url(settings)
     api_password = _get_api_password(settings)
@@ -204,11 +533,12 @@ def print_cn(cn_number: str) -> dict:
     }
 
     try:
-        resp = requests.post(
+        resp = _post(
+            settings,
+            "printCN",
             url,
             json=payload,
             headers={"Content-Type": "application/json"},
-            timeout=30,
         )
     except requests.RequestException as e:
         raise LeopardsAPIError(f"Leopards printCN connection error: {e}") from e
@@ -249,10 +579,11 @@ def track_packet(track_number: str) -> dict:
     }
 
     try:
-        resp = requests.post(
+        resp = _post(
+            settings,
+            "trackBookedPacket",
             url,
             json=payload,
-            timeout=30,
         )
     except Exception as e:
         raise LeopardsAPIError(f"Tracking API error: {e}")
@@ -268,3 +599,59 @@ def track_packet(track_number: str) -> dict:
         raise LeopardsAPIError(f"Tracking failed: {data}")
 
     return data
+
+
+# -------------------------------------------------------------------------
+# Booked Packets Last Status (date range)
+# -------------------------------------------------------------------------
+
+def get_booked_packets_last_status(from_date, to_date) -> list:
+    """
+    Last status of every packet booked between two dates (YYYY-MM-DD).
+
+    Endpoint:
+      POST <base_url>/api/getBookedPacketLastStatus/format/json/
+
+    Returns `packet_list` (each row carries track_number,
+    booked_packet_order_id and booked_packet_status).
+    """
+    settings = _get_settings()
+    base_url = _resolve_base_url(settings)
+    api_password = _get_api_password(settings)
+
+    url = f"{base_url}/api/getBookedPacketLastStatus/format/json/"
+
+    payload = {
+        "api_key": settings.api_key,
+        "api_password": api_password,
+        "from_date": str(from_date),
+        "to_date": str(to_date),
+    }
+
+    try:
+        resp = _post(
+            settings,
+            "getBookedPacketLastStatus",
+            url,
+            json=payload,
+            headers={"Content-Type": "application/json"},
+        )
+    except requests.RequestException as e:
+        raise LeopardsAPIError(f"Leopards last-status connection error: {e}") from e
+
+    if resp.status_code != 200:
+        raise LeopardsAPIError(
+            f"Leopards last-status HTTP {resp.status_code}: {resp.text}"
+        )
+
+    try:
+        data = resp.json()
+    except Exception:
+        raise LeopardsAPIError(
+            f"Leopards last-status invalid JSON: {resp.text}"
+        )
+
+    if str(data.get("status")) != "1":
+        raise LeopardsAPIError(f"Leopards last-status failed: {data}")
+
+    return data.get("packet_list") or []
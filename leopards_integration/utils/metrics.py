@@ -0,0 +1,474 @@
+import functools
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import frappe
+
+# Upper bounds (le) of the latency histograms, in milliseconds
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Upper bounds of the per-booking DB query histogram
+QUERY_BUCKETS = (10, 25, 50, 100, 250, 500)
+
+# Upper bounds of the token-bucket wait histogram, in seconds
+RATE_WAIT_BUCKETS_S = (0, 0.1, 0.5, 1, 5, 30)
+
+# Upper bounds of the job duration histogram, in seconds
+JOB_BUCKETS_S = (1, 5, 15, 60, 300, 900, 1800, 3600)
+
+METRICS_KEY = "leopards_integration:metrics"
+
+HELP = {
+    "leopards_http_request_duration_ms": ("histogram", "Leopards API request latency per endpoint."),
+    "leopards_http_requests_total": ("counter", "Leopards API requests per endpoint and status class."),
+    "leopards_http_new_connections_total": ("counter", "Requests that had to open a new TCP/TLS connection."),
+    "leopards_retries_total": ("counter", "Retries of Leopards calls per operation."),
+    "leopards_rate_limit_wait_seconds": ("histogram", "Time spent waiting on a token bucket before a call."),
+    "leopards_tracking_pending_total": ("counter", "Tracking lookups answered with a Pending fallback instead of a status."),
+    "leopards_reconcile_changes_total": ("counter", "Stage changes found by date-range reconciliation; each parcel is polled right away."),
+    "leopards_reconcile_windows_failed_total": ("counter", "Reconcile windows skipped because getBookedPacketLastStatus failed."),
+    "leopards_bookings_total": ("counter", "Bookings per outcome."),
+    "leopards_booking_db_queries": ("histogram", "DB queries issued by one booking."),
+    "leopards_job_duration_seconds": ("histogram", "Background job duration."),
+    "leopards_job_runs_total": ("counter", "Background job runs per outcome."),
+    "leopards_job_last_duration_seconds": ("gauge", "Duration of the most recent run of a job."),
+}
+
+_SERIES = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>.*)\})?$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+# =====================================================
+# IN-PROCESS REGISTRY
+# =====================================================
+
+def series_key(name, **labels) -> str:
+    """
+    Prometheus series name, e.g. leopards_http_requests_total{endpoint="bookPacket"}.
+    """
+    if not labels:
+        return name
+
+    rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def parse_series(key):
+    """
+    (name, {label: value}) for a series key.
+    """
+    match = _SERIES.match(key)
+    if not match:
+        return key, {}
+
+    labels = {k: v.replace('\\"', '"').replace("\\\\", "\\") for k, v in _LABEL.findall(match["labels"] or "")}
+    return match["name"], labels
+
+
+_thread_site = threading.local()
+
+
+def bind_site(site):
+    """
+    Attribute metrics recorded on this frappe-free thread (executor
+    initializer) to `site`.
+    """
+    _thread_site.site = site
+
+
+def current_site():
+    return getattr(frappe.local, "site", None) or getattr(_thread_site, "site", None)
+
+
+class MetricsRegistry:
+    """
+    Pending metric deltas for this process, kept per site.
+
+    Recording is a dict update under a lock - no DB or Redis access, so
+    HTTP worker threads and asyncio executors can record too; threads
+    without frappe.local name their site with bind_site(). On a
+    multi-site bench `flush_metrics()` moves only the current site's
+    deltas into that site's Redis hash, where every worker's numbers add
+    up. Deltas recorded outside any site cannot be attributed and are
+    dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+
+    def inc(self, name, value=1, **labels):
+        key = series_key(name, **labels)
+        site = current_site()
+        with self._lock:
+            counters = self._counters.setdefault(site, {})
+            counters[key] = counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        site = current_site()
+        with self._lock:
+            self._gauges.setdefault(site, {})[series_key(name, **labels)] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS_MS, **labels):
+        site = current_site()
+        with self._lock:
+            counters = self._counters.setdefault(site, {})
+
+            for le in buckets:
+                if value <= le:
+                    key = series_key(f"{name}_bucket", le=le, **labels)
+                    counters[key] = counters.get(key, 0) + 1
+
+            for key, delta in (
+                (series_key(f"{name}_bucket", le="+Inf", **labels), 1),
+                (series_key(f"{name}_sum", **labels), value),
+                (series_key(f"{name}_count", **labels), 1),
+            ):
+                counters[key] = counters.get(key, 0) + delta
+
+    def drain(self, site) -> tuple:
+        with self._lock:
+            counters = self._counters.pop(site, {})
+            gauges = self._gauges.pop(site, {})
+            self._counters.pop(None, None)
+            self._gauges.pop(None, None)
+        return counters, gauges
+
+
+_registry = MetricsRegistry()
+
+inc = _registry.inc
+observe = _registry.observe
+set_gauge = _registry.set
+
+
+def status_class(status) -> str:
+    """
+    "2xx" / "4xx" / "5xx" for an HTTP status, "error" when no response came back.
+    """
+    if not status:
+        return "error"
+    return f"{int(status) // 100}xx"
+
+
+def record_request(timing):
+    """
+    Hot path: called by LeopardsHTTPClient for every request.
+    """
+    endpoint = timing["endpoint"]
+
+    observe("leopards_http_request_duration_ms", timing["elapsed_ms"], endpoint=endpoint)
+    inc("leopards_http_requests_total", endpoint=endpoint, status=status_class(timing.get("status")))
+
+    if timing.get("new_connection"):
+        inc("leopards_http_new_connections_total", endpoint=endpoint)
+
+
+# =====================================================
+# REDIS (per site, shared by all workers)
+# =====================================================
+
+def _metrics_key():
+    key = frappe.cache().make_key(METRICS_KEY)
+    return key.decode() if isinstance(key, bytes) else key
+
+
+def flush_metrics(*args, **kwargs):
+    """
+    Push this process's pending deltas to the site's metrics hash.
+    Safe to call often (no-op when nothing was recorded); usable as an
+    after_request hook. Never raises.
+    """
+    site = current_site()
+    if not site:
+        return
+
+    counters, gauges = _registry.drain(site)
+    if not counters and not gauges:
+        return
+
+    try:
+        key = _metrics_key()
+        pipe = frappe.cache().pipeline()
+        for field, delta in counters.items():
+            pipe.hincrbyfloat(key, field, delta)
+        for field, value in gauges.items():
+            pipe.hset(key, field, value)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def read_metrics() -> dict:
+    """
+    {series key: value} for the current site (pending deltas flushed first).
+    """
+    flush_metrics()
+
+    pipe = frappe.cache().pipeline()
+    pipe.hgetall(_metrics_key())
+    raw = pipe.execute()[0] or {}
+
+    values = {}
+    for field, value in raw.items():
+        field = field.decode() if isinstance(field, bytes) else field
+        values[field] = float(value)
+
+    return values
+
+
+def reset_metrics():
+    _registry.drain(current_site())
+    frappe.cache().delete(_metrics_key())
+
+
+def _series_sort_key(key):
+    """
+    Name, then labels, then histogram bound in numeric order (+Inf last).
+    """
+    name, labels = parse_series(key)
+    le = labels.pop("le", None)
+    bound = -1.0 if le is None else float("inf") if le == "+Inf" else float(le)
+    return name, sorted(labels.items()), bound
+
+
+def render_prometheus(values) -> str:
+    """
+    Prometheus text exposition format (0.0.4).
+    """
+    by_metric = {}
+    for key in sorted(values, key=_series_sort_key):
+        name, _labels = parse_series(key)
+        base = name if name in HELP else re.sub(r"_(bucket|sum|count)$", "", name)
+        by_metric.setdefault(base, []).append(key)
+
+    lines = []
+    for base in sorted(by_metric):
+        kind, help_text = HELP.get(base, ("untyped", base))
+        lines.append(f"# HELP {base} {help_text}")
+        lines.append(f"# TYPE {base} {kind}")
+        for key in by_metric[base]:
+            value = values[key]
+            lines.append(f"{key} {int(value) if float(value).is_integer() else round(value, 4)}")
+
+    return "\n".join(lines) + "\n"
+
+
+# =====================================================
+# JOBS
+# =====================================================
+
+@contextmanager
+def timed_job(job):
+    """
+    Record duration + outcome of one job run, then flush.
+    """
+    started = time.monotonic()
+    outcome = "failed"
+
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        seconds = round(time.monotonic() - started, 3)
+        observe("leopards_job_duration_seconds", seconds, buckets=JOB_BUCKETS_S, job=job)
+        set_gauge("leopards_job_last_duration_seconds", seconds, job=job)
+        inc("leopards_job_runs_total", job=job, outcome=outcome)
+        flush_metrics()
+
+
+def job_metrics(job):
+    """
+    Decorator form of timed_job() for scheduler / background job functions.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed_job(job):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def count_queries(all_threads=False):
+    """
+    Count frappe.db.sql calls made on this thread's connection (nestable).
+
+    With all_threads, every connection of the process is counted - worker
+    threads that connect their own site included (benchmarks).
+    """
+    counter = {"queries": 0}
+
+    if all_threads:
+        cls = type(frappe.db)
+        original = cls.sql
+        patched_outside = "sql" in cls.__dict__
+        lock = threading.Lock()
+
+        def sql(self, *args, **kwargs):
+            with lock:
+                counter["queries"] += 1
+            return original(self, *args, **kwargs)
+
+        cls.sql = sql
+        try:
+            yield counter
+        finally:
+            if patched_outside:
+                cls.sql = original
+            else:
+                del cls.sql
+        return
+
+    db = frappe.db
+    original = db.sql
+    patched_outside = "sql" in db.__dict__
+
+    def sql(*args, **kwargs):
+        counter["queries"] += 1
+        return original(*args, **kwargs)
+
+    db.sql = sql
+    try:
+        yield counter
+    finally:
+        if patched_outside:
+            db.sql = original
+        else:
+            db.__dict__.pop("sql", None)
+
+
+# =====================================================
+# SUMMARY
+# =====================================================
+
+def histogram_quantile(buckets, q) -> float:
+    """
+    Upper bound of the bucket holding quantile `q` - {le: cumulative count}.
+    """
+    total = buckets.get("+Inf", 0)
+    if not total:
+        return 0.0
+
+    bounds = sorted((float(le), count) for le, count in buckets.items() if le != "+Inf")
+    for le, count in bounds:
+        if count >= q * total:
+            return le
+
+    return bounds[-1][0] if bounds else 0.0
+
+
+def summarize(values) -> list:
+    """
+    One row per endpoint / job / limiter from raw series values, shaped
+    for the Leopards Metrics Summary table.
+    """
+    hist = {}
+    plain = {}
+
+    for key, value in values.items():
+        name, labels = parse_series(key)
+        le = labels.pop("le", None)
+        group = tuple(sorted(labels.items()))
+
+        if name.endswith("_bucket"):
+            hist.setdefault((name[:-7], group), {})[le] = value
+        else:
+            plain[(name, group)] = value
+
+    def _label(group, label):
+        return dict(group).get(label) or ""
+
+    rows = []
+
+    for (name, group), buckets in sorted(hist.items()):
+        count = plain.get((f"{name}_count", group), 0)
+        total = plain.get((f"{name}_sum", group), 0)
+
+        if name == "leopards_http_request_duration_ms":
+            endpoint = _label(group, "endpoint")
+            statuses = {
+                dict(g).get("status"): v
+                for (n, g), v in plain.items()
+                if n == "leopards_http_requests_total" and dict(g).get("endpoint") == endpoint
+            }
+            rows.append({
+                "metric_type": "Endpoint",
+                "label": endpoint,
+                "samples": int(count),
+                "errors": int(sum(v for s, v in statuses.items() if s != "2xx")),
+                "avg_ms": round(total / count, 2) if count else 0,
+                "p50_ms": histogram_quantile(buckets, 0.5),
+                "p95_ms": histogram_quantile(buckets, 0.95),
+                "detail": ", ".join(f"{s}: {int(v)}" for s, v in sorted(statuses.items())),
+            })
+
+        elif name == "leopards_job_duration_seconds":
+            job = _label(group, "job")
+            rows.append({
+                "metric_type": "Job",
+                "label": job,
+                "samples": int(count),
+                "errors": int(plain.get(("leopards_job_runs_total", (("job", job), ("outcome", "failed"))), 0)),
+                "avg_ms": round(total / count * 1000, 2) if count else 0,
+                "p50_ms": histogram_quantile(buckets, 0.5) * 1000,
+                "p95_ms": histogram_quantile(buckets, 0.95) * 1000,
+                "detail": f"last: {plain.get(('leopards_job_last_duration_seconds', group), 0)}s",
+            })
+
+        elif name == "leopards_booking_db_queries":
+            rows.append({
+                "metric_type": "Booking",
+                "label": "DB queries per booking",
+                "samples": int(count),
+                "errors": 0,
+                "avg_ms": 0,
+                "p50_ms": 0,
+                "p95_ms": 0,
+                "detail": (
+                    f"avg: {round(total / count, 1) if count else 0}, "
+                    f"p95 ≤ {histogram_quantile(buckets, 0.95)}"
+                ),
+            })
+
+        elif name == "leopards_rate_limit_wait_seconds":
+            rows.append({
+                "metric_type": "Rate Limit",
+                "label": _label(group, "limiter"),
+                "samples": int(count),
+                "errors": 0,
+                "avg_ms": round(total / count * 1000, 2) if count else 0,
+                "p50_ms": 0,
+                "p95_ms": 0,
+                "detail": f"total wait: {round(total, 2)}s",
+            })
+
+    for (name, group), value in sorted(plain.items()):
+        if name == "leopards_retries_total":
+            rows.append({
+                "metric_type": "Retry",
+                "label": _label(group, "operation"),
+                "samples": int(value),
+            })
+        elif name == "leopards_tracking_pending_total":
+            rows.append({
+                "metric_type": "Tracking Fallback",
+                "label": _label(group, "reason"),
+                "samples": int(value),
+            })
+        elif name == "leopards_bookings_total":
+            rows.append({
+                "metric_type": "Booking",
+                "label": _label(group, "outcome"),
+                "samples": int(value),
+            })
+
+    return rows
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    - `rate`  : tokens refilled per second (sustained requests/sec)
+    - `burst` : bucket capacity (requests allowed back-to-back)
+
+    acquire() blocks until a token is available and returns the seconds
+    spent waiting, so callers can report rate-limit pressure.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst or rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1) -> float:
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+class AsyncTokenBucket(TokenBucket):
+    """
+    Same bucket for asyncio code: `await acquire()` yields to the event
+    loop instead of blocking the thread.
+    """
+
+    async def acquire(self, tokens: float = 1) -> float:
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+
+            await asyncio.sleep(delay)
+            waited += delay
@@ -0,0 +1,63 @@
+import random
+import time
+
+from leopards_integration.utils import metrics
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 10.0
+
+
+def backoff_delay(attempt: int, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY) -> float:
+    """
+    "Full jitter" exponential backoff: uniform(0, min(max_delay, base * 2^attempt)).
+    Spreads retries from many workers instead of retrying in lock-step.
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_call(
+    fn,
+    *,
+    attempts=DEFAULT_ATTEMPTS,
+    retry_on=(Exception,),
+    base_delay=DEFAULT_BASE_DELAY,
+    max_delay=DEFAULT_MAX_DELAY,
+    before_retry=None,
+    sleep=time.sleep,
+    name=None,
+    limiter=None,
+):
+    """
+    Call fn() up to `attempts` times, retrying only on `retry_on` errors.
+
+    before_retry(attempt, error) runs before every retry; if it returns
+    anything other than None that value is returned instead of retrying
+    (used to adopt a result the failed attempt may already have produced).
+    Every attempt, retries included, first takes a token from `limiter`
+    (TokenBucket) when one is given.
+    Retries and limiter waits are counted in utils.metrics under `name`.
+    """
+    attempts = max(1, int(attempts))
+    name = name or getattr(fn, "__name__", "call")
+
+    for attempt in range(attempts):
+        if limiter:
+            waited = limiter.acquire()
+            metrics.observe(
+                "leopards_rate_limit_wait_seconds", waited, buckets=metrics.RATE_WAIT_BUCKETS_S, limiter=name
+            )
+
+        try:
+            return fn()
+        except retry_on as e:
+            if attempt + 1 >= attempts:
+                raise
+
+            metrics.inc("leopards_retries_total", operation=name)
+            sleep(backoff_delay(attempt, base_delay, max_delay))
+
+            if before_retry:
+                recovered = before_retry(attempt + 1, e)
+                if recovered is not None:
+                    return recovered